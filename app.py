@@ -1,32 +1,120 @@
 import streamlit as st
-from interpreter import Interpreter
 import os
+import time
+import hashlib
+from typing import TYPE_CHECKING
+from utils import load_environment
+load_environment()  # before the lazily imported agent stack reads its settings
+
+# Streamlit re-runs this script on every interaction; the agent stack is only
+# imported once the pool is first needed (see get_interpreter_pool).
+if TYPE_CHECKING:
+    from interpreter import Interpreter
+    from interpreter_pool import InterpreterPool
+    from jobs import JobQueue
 # ------------------------
-# Placeholder agents
+# Agents
 # ------------------------
 
-def summarize_text(bot: Interpreter, raw_text):
+def input_hash(text: str) -> str:
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+def summarize_text(bot: "Interpreter", raw_text):
     """
-    Simulates the Text Summarizer Agent.
-    In practice, you would call your LLM agent here.
+    Runs the Text Summarizer Agent: raw text in, plain-text list of events out.
     """
-    # For demo, just split lines and format
     summary = bot.summarize(raw_text)
-    #events = raw_text.strip().split("\n")
-    #summary = "\n".join([f"{i+1}. {e.strip()}" for i, e in enumerate(events)])
     print(summary)
     return summary
 
 def calendar_update(events_summary):
     """
-    Simulates sending approved events to the calendar.
+    Formats the result of sending approved events to the calendar.
     """
     return f"✅ Events added to calendar:\n{events_summary}"
 
+@st.cache_resource
+def get_interpreter_pool() -> "InterpreterPool":
+    """
+    One warm pool per Streamlit server process, shared across reruns and sessions.
+    Headless: calendar runs happen on background workers nobody can answer on
+    stdin, so the approval policy stands in for the human (the user already
+    confirmed the events in Step 1).
+    """
+    from interpreter_pool import InterpreterPool
+    llm_config = {
+        "model": "gpt-4",  # or "gpt-3.5-turbo"
+        "api_key": os.getenv("OPENAI_API_KEY", "dummy_key"),  # fallback for demo
+    }
+    return InterpreterPool(llm_config=llm_config, headless=True)
+
+@st.cache_resource
+def get_calendar_jobs() -> "JobQueue":
+    """
+    Background workers for Step 2, so the calendar run survives reruns and the
+    page can show progress instead of blocking.
+    """
+    from jobs import JobQueue
+
+    def add_to_calendar(events_text: str) -> str:
+        with get_interpreter_pool().acquire() as agent:
+            result = agent.interpret(events_text)
+        return calendar_update(getattr(result, "summary", result))
+
+    return JobQueue(add_to_calendar, max_workers=2)
+
+@st.cache_data(show_spinner=False, max_entries=256, ttl=3600)
+def summarize_events(raw_text: str) -> str:
+    """Summaries are memoized by input, so the same text never costs a second model call."""
+    with get_interpreter_pool().acquire() as agent:
+        return summarize_text(agent, raw_text)
+
+def submit_calendar_run(events_text: str):
+    """Queues at most one calendar run per distinct events text in this session."""
+    from jobs import QueueFullError
+    key = input_hash(events_text)
+    if key not in state.calendar_jobs:
+        try:
+            state.calendar_jobs[key] = get_calendar_jobs().submit(events_text)
+        except QueueFullError:
+            st.error("The calendar agent is busy, please try again in a moment.")
+            return
+    state.active_calendar_run = key
+
+@st.fragment(run_every="1s")
+def calendar_progress():
+    """Polls the active calendar run without re-running the whole page."""
+    key = state.get("active_calendar_run")
+    if key is None:
+        return
+    if key not in state.calendar_results:
+        job = get_calendar_jobs().get(state.calendar_jobs[key])
+        if job is None:
+            st.warning("This calendar run has expired.")
+            return
+        if job["status"] in ("queued", "running"):
+            started = job["started_at"] or job["submitted_at"]
+            label = "Waiting for a free agent..." if job["status"] == "queued" else "Adding events to your calendar..."
+            with st.status(label, state="running"):
+                st.write(f"{job['status']} for {time.time() - started:.0f}s")
+            return
+        state.calendar_results[key] = job
+    job = state.calendar_results[key]
+    if job["status"] == "done":
+        st.success(job["result"])
+    else:
+        st.error(f"Adding events failed: {job['error']}")
+
 # ------------------------
 # Streamlit UI
 # ------------------------
 
+state = st.session_state
+state.setdefault("summary", None)
+state.setdefault("summary_for", None)      # input hash the summary was made from
+state.setdefault("calendar_jobs", {})      # events-text hash -> job id
+state.setdefault("calendar_results", {})   # events-text hash -> finished job
+
 st.title("Smart Calendar Assistant")
 
 st.header("Step 1: Input raw text")
@@ -39,26 +127,26 @@ if st.button("Summarize Events"):
     if not raw_text.strip():
         st.warning("Please provide some text!")
     else:
-        llm_config = {
-            "model": "gpt-4",  # or "gpt-3.5-turbo"
-            "api_key": os.getenv("OPENAI_API_KEY", "dummy_key"),  # fallback for demo
-        }
-        agent = Interpreter(llm_config=llm_config)
-        summary = summarize_text(agent, raw_text)
-        st.subheader("Suggested Events")
-        st.text(summary)
-
-        st.header("Step 2: Confirm Events")
-        approve = st.radio("Do you want to add these events to your calendar?", ("Yes", "No", "Edit"))
-
-        if approve == "Yes":
-            summary2 = agent.interpret(summary)
-            response = calendar_update(summary2)
-            st.success(response)
-        elif approve == "No":
-            st.info("No events were added to the calendar.")
-        elif approve == "Edit":
-            edited_text = st.text_area("Edit the events before adding:", summary, height=150)
-            if st.button("Submit Edited Events"):
-                response = calendar_update(edited_text)
-                st.success(response)
+        with st.spinner("Summarizing..."):
+            state.summary = summarize_events(raw_text.strip())
+        state.summary_for = input_hash(raw_text)
+
+if state.summary:
+    if state.summary_for != input_hash(raw_text):
+        st.caption("The text has changed since this summary. Click Summarize Events to refresh it.")
+    st.subheader("Suggested Events")
+    st.text(state.summary)
+
+    st.header("Step 2: Confirm Events")
+    approve = st.radio("Do you want to add these events to your calendar?", ("Yes", "No", "Edit"), index=None)
+
+    if approve == "Yes":
+        submit_calendar_run(state.summary)
+    elif approve == "No":
+        st.info("No events were added to the calendar.")
+    elif approve == "Edit":
+        edited_text = st.text_area("Edit the events before adding:", state.summary, height=150)
+        if st.button("Submit Edited Events"):
+            submit_calendar_run(edited_text)
+
+    calendar_progress()
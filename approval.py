@@ -0,0 +1,95 @@
+import os
+import functools
+import threading
+from typing import Callable, Dict, Optional
+from user_context import UserContext
+
+APPROVAL_MAX_EVENTS = int(os.getenv("APPROVAL_MAX_EVENTS", "25"))  # events a single run may create
+APPROVAL_ALLOW_DELETES = os.getenv("APPROVAL_ALLOW_DELETES", "0") == "1"
+APPROVAL_MAX_REPLIES = int(os.getenv("APPROVAL_MAX_REPLIES", "3"))  # times the agents may ask the "human" per run
+
+APPROVE_REPLY = "Approved. Go ahead with the schedule without asking for further confirmation."
+STOP_REPLY = "No further input is available. Stop here and reply \"all tasks complete\"."
+
+
+class ApprovalPolicy:
+    """
+    Stands in for the person at the keyboard when an Interpreter runs headless.
+
+    When an agent hands the conversation to the human, the policy answers instead
+    of stdin: it approves, and after `max_replies` answers it tells the agents to
+    stop, so a run can never wait on input. Calendar writes are gated as well:
+    each run may create at most `max_events` events, and deletes are refused
+    unless `allow_deletes` is set. Denied tool calls return a "❌ Not approved"
+    message to the agent instead of touching the calendar.
+
+    A user's `approval` settings (see user_context.UserContext) override these
+    limits for that user's runs.
+    """
+
+    def __init__(self, max_events: Optional[int] = APPROVAL_MAX_EVENTS, allow_deletes: bool = APPROVAL_ALLOW_DELETES,
+                 max_replies: int = APPROVAL_MAX_REPLIES, auto_approve: bool = True):
+        self.defaults = {
+            "max_events": max_events,
+            "allow_deletes": allow_deletes,
+            "max_replies": max_replies,
+            "auto_approve": auto_approve,
+        }
+        self.limits = dict(self.defaults)
+        self._lock = threading.Lock()
+        self._run = {"created": 0, "deleted": 0, "replies": 0}
+        self.stats = {"approved": 0, "denied": 0, "replies": 0}
+
+    def start_run(self, user: Optional[UserContext] = None):
+        """Resets the per-run counters and applies the user's overrides, if any."""
+        overrides = user.approval if user is not None and user.approval else {}
+        with self._lock:
+            self.limits = {**self.defaults, **{k: v for k, v in overrides.items() if k in self.defaults}}
+            self._run = {"created": 0, "deleted": 0, "replies": 0}
+
+    def review(self, action: str, count: int = 1) -> Optional[str]:
+        """
+        Decides whether a calendar write may go ahead.
+
+        Parameters:
+        - action: str → "create" or "delete"
+        - count: int → number of events the call affects
+
+        Returns:
+        - None if approved (and counted against this run), else the reason it was denied
+        """
+        with self._lock:
+            reason = None
+            if action == "delete" and not self.limits["allow_deletes"]:
+                reason = "deleting events needs a person to confirm it"
+            elif action == "create" and self.limits["max_events"] is not None \
+                    and self._run["created"] + count > self.limits["max_events"]:
+                reason = f"a run may create at most {self.limits['max_events']} events"
+            if reason is None:
+                self._run["created" if action == "create" else "deleted"] += count
+                self.stats["approved"] += 1
+            else:
+                self.stats["denied"] += 1
+            return reason
+
+    def gate(self, func: Callable, action: str, count: Callable[..., int] = lambda *args, **kwargs: 1) -> Callable:
+        """Wraps a calendar tool so every call is reviewed first; the signature is preserved for autogen."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            reason = self.review(action, count(*args, **kwargs))
+            if reason is not None:
+                return f"❌ Not approved: {reason}."
+            return func(*args, **kwargs)
+        return wrapper
+
+    def human_reply(self, recipient, messages=None, sender=None, config=None):
+        """autogen reply function for the headless human agent: answers for the user instead of stdin."""
+        with self._lock:
+            self._run["replies"] += 1
+            self.stats["replies"] += 1
+            approve = self.limits["auto_approve"] and self._run["replies"] <= self.limits["max_replies"]
+        return True, APPROVE_REPLY if approve else STOP_REPLY
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
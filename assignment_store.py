@@ -0,0 +1,221 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+from utils import to_epoch
+from user_context import user_key, user_path
+
+ASSIGNMENT_DB_FILE = os.getenv("CANVAS_ASSIGNMENT_DB", "canvas_assignments.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assignments (
+    course_id INTEGER NOT NULL,
+    assignment_id INTEGER NOT NULL,
+    course TEXT,
+    name TEXT NOT NULL,
+    due_ts REAL NOT NULL,
+    due_at TEXT NOT NULL,
+    html_url TEXT,
+    PRIMARY KEY (course_id, assignment_id)
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_due ON assignments (due_ts);
+CREATE INDEX IF NOT EXISTS idx_assignments_course_due ON assignments (course_id, due_ts);
+CREATE TABLE IF NOT EXISTS courses (
+    course_id INTEGER PRIMARY KEY,
+    name TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS sync_meta (
+    key TEXT PRIMARY KEY,
+    value REAL
+);
+"""
+
+
+class AssignmentStore:
+    """
+    On-disk SQLite store of Canvas assignments keyed by (course_id, assignment_id).
+
+    Due times are kept as UTC epoch seconds (indexed alone and per course) next to
+    the original Canvas `due_at` string, so date-window and course queries run in
+    the store instead of over a parsed JSON file. The per-course ETag/Last-Modified
+    validators used by canvas_api.sync_assignments live here too.
+    """
+
+    def __init__(self, path: str = ASSIGNMENT_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    # -- sync state --------------------------------------------------------
+
+    def get_course_list_synced_at(self) -> Optional[float]:
+        return self.get_synced_at("courses_synced_at")
+
+    def get_synced_at(self, key: str) -> Optional[float]:
+        """When the sync step named `key` (e.g. "planner_synced_at") last succeeded."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_synced_at(self, key: str, synced_at: float):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO sync_meta VALUES (?, ?)", (key, synced_at))
+            self._conn.commit()
+
+    def set_courses(self, courses: List[Dict], synced_at: float):
+        """
+        Records the enrolled course list. Courses no longer listed are removed
+        together with their assignments.
+        """
+        ids = [c["id"] for c in courses]
+        with self._lock:
+            for course in courses:
+                self._conn.execute(
+                    "INSERT INTO courses (course_id, name) VALUES (?, ?) "
+                    "ON CONFLICT(course_id) DO UPDATE SET name = excluded.name",
+                    (course["id"], course.get("name")),
+                )
+            placeholders = ",".join("?" * len(ids)) or "NULL"
+            self._conn.execute(f"DELETE FROM assignments WHERE course_id NOT IN ({placeholders})", ids)
+            self._conn.execute(f"DELETE FROM courses WHERE course_id NOT IN ({placeholders})", ids)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_meta VALUES ('courses_synced_at', ?)", (synced_at,)
+            )
+            self._conn.commit()
+
+    def get_courses(self) -> List[Dict]:
+        """Every known course with its sync entry (etag, last_modified, synced_at)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT course_id, name, etag, last_modified, synced_at FROM courses ORDER BY course_id"
+            ).fetchall()
+        return [
+            {"id": r[0], "name": r[1], "etag": r[2], "last_modified": r[3], "synced_at": r[4]}
+            for r in rows
+        ]
+
+    def mark_course_synced(self, course_id: int, synced_at: float):
+        """Records a successful revalidation (304) without touching the assignments."""
+        with self._lock:
+            self._conn.execute("UPDATE courses SET synced_at = ? WHERE course_id = ?", (synced_at, course_id))
+            self._conn.commit()
+
+    # -- assignments -------------------------------------------------------
+
+    def replace_course_assignments(self, course_id: int, course_name: Optional[str], assignments: Iterable[Dict],
+                                   etag: Optional[str] = None, last_modified: Optional[str] = None,
+                                   synced_at: Optional[float] = None, due_after: Optional[float] = None,
+                                   due_before: Optional[float] = None) -> int:
+        """
+        Upserts one course's assignments (each needs "id", "name", "due_at") and removes
+        the ones Canvas no longer returns, in a single transaction. Rows that did not
+        change are left alone. When the assignments only cover a due-date window
+        (`due_after` <= due < `due_before`, epoch seconds), only rows in that window
+        are removed. Returns the number of assignments stored.
+        """
+        rows = []
+        for a in assignments:
+            if not a.get("due_at"):
+                continue
+            try:
+                due_ts = to_epoch(a["due_at"])
+            except ValueError:
+                continue
+            rows.append((course_id, a["id"], course_name, a["name"], due_ts, a["due_at"], a.get("html_url")))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO assignments VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(course_id, assignment_id) DO UPDATE SET "
+                "course = excluded.course, name = excluded.name, due_ts = excluded.due_ts, "
+                "due_at = excluded.due_at, html_url = excluded.html_url "
+                "WHERE assignments.due_at IS NOT excluded.due_at OR assignments.name IS NOT excluded.name "
+                "OR assignments.course IS NOT excluded.course OR assignments.html_url IS NOT excluded.html_url",
+                rows,
+            )
+            keep = [r[1] for r in rows]
+            placeholders = ",".join("?" * len(keep)) or "NULL"
+            sql = f"DELETE FROM assignments WHERE course_id = ? AND assignment_id NOT IN ({placeholders})"
+            params = [course_id, *keep]
+            if due_after is not None:
+                sql += " AND due_ts >= ?"
+                params.append(due_after)
+            if due_before is not None:
+                sql += " AND due_ts < ?"
+                params.append(due_before)
+            self._conn.execute(sql, params)
+            self._conn.execute(
+                "INSERT INTO courses (course_id, name, etag, last_modified, synced_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(course_id) DO UPDATE SET name = excluded.name, etag = excluded.etag, "
+                "last_modified = excluded.last_modified, synced_at = excluded.synced_at",
+                (course_id, course_name, etag, last_modified, synced_at if synced_at is not None else time.time()),
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def query(self, due_after: Optional[float] = None, due_before: Optional[float] = None,
+              course_ids: Optional[List[int]] = None, course_name: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Dict]:
+        """
+        Assignments ordered by due time. `due_after`/`due_before` are UTC epoch seconds;
+        `course_name` matches case-insensitively as a substring.
+        """
+        sql = "SELECT course, name, due_at, course_id, assignment_id, html_url FROM assignments WHERE 1 = 1"
+        params = []
+        if due_after is not None:
+            sql += " AND due_ts > ?"
+            params.append(due_after)
+        if due_before is not None:
+            sql += " AND due_ts < ?"
+            params.append(due_before)
+        if course_ids:
+            sql += f" AND course_id IN ({','.join('?' * len(course_ids))})"
+            params.extend(course_ids)
+        if course_name:
+            sql += " AND course LIKE ?"
+            params.append(f"%{course_name}%")
+        sql += " ORDER BY due_ts"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {"course": r[0], "name": r[1], "due_at": r[2], "course_id": r[3], "id": r[4], "html_url": r[5]}
+            for r in rows
+        ]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM assignments").fetchone()[0]
+
+    def reset(self):
+        """Forgets everything, forcing a full re-download on the next sync."""
+        with self._lock:
+            self._conn.executescript("DELETE FROM assignments; DELETE FROM courses; DELETE FROM sync_meta;")
+            self._conn.commit()
+
+
+_store = None
+_user_stores: Dict[str, AssignmentStore] = {}
+_store_lock = threading.Lock()
+
+
+def get_assignment_store() -> AssignmentStore:
+    """Returns the assignment store of the current user (the process-wide one in single-user mode)."""
+    global _store
+    key = user_key()
+    with _store_lock:
+        if key is not None:
+            if key not in _user_stores:
+                _user_stores[key] = AssignmentStore(user_path(ASSIGNMENT_DB_FILE))
+            return _user_stores[key]
+        if _store is None:
+            _store = AssignmentStore()
+        return _store
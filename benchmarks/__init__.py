@@ -0,0 +1,10 @@
+"""
+Offline benchmarks for the scheduling pipeline.
+
+Everything runs against local stand-ins, so no API keys are needed:
+- fake_llm: a scripted OpenAI-compatible chat completions server
+- fake_canvas: a Canvas API server with configurable courses, pagination and latency
+- fake_calendar: an in-memory Google Calendar service object
+
+Run `python -m benchmarks.run --help` from the repository root.
+"""
@@ -0,0 +1,204 @@
+import copy
+import json
+import re
+import time
+import uuid
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from recurrence import expand_event
+from utils import event_time_to_epoch, to_epoch
+
+
+class _Request:
+    """Mimics googleapiclient's HttpRequest: nothing happens until execute()."""
+
+    def __init__(self, calendar, handler, **params):
+        self._calendar = calendar
+        self._handler = handler
+        self._params = params
+
+    def execute(self):
+        self._calendar._count_http()
+        response = self._handler(**self._params)
+        self._calendar._count_bytes(response)
+        return response
+
+
+class _Batch:
+    def __init__(self, calendar, callback):
+        self._calendar = calendar
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request: _Request, request_id: Optional[str] = None):
+        self._requests.append((request_id or str(len(self._requests)), request))
+
+    def execute(self):
+        self._calendar._count_http()  # the whole batch is one multipart HTTP request
+        for request_id, request in self._requests:
+            try:
+                response, exception = request._handler(**request._params), None
+            except Exception as e:
+                response, exception = None, e
+            self._calendar._count_bytes(response)
+            self._callback(request_id, response, exception)
+
+
+class _Events:
+    def __init__(self, calendar):
+        self._calendar = calendar
+
+    def insert(self, calendarId: str, body: dict):
+        return _Request(self._calendar, self._calendar._insert, calendar_id=calendarId, body=body)
+
+    def delete(self, calendarId: str, eventId: str):
+        return _Request(self._calendar, self._calendar._delete, calendar_id=calendarId, event_id=eventId)
+
+    def list(self, calendarId: str, **params):
+        return _Request(self._calendar, self._calendar._list, calendar_id=calendarId, **params)
+
+
+class _FreeBusy:
+    def __init__(self, calendar):
+        self._calendar = calendar
+
+    def query(self, body: dict):
+        return _Request(self._calendar, self._calendar._freebusy, body=body)
+
+
+def _project(event: dict, fields: str) -> dict:
+    """Applies the items(...) part of a partial-response `fields` value (top-level properties only)."""
+    match = re.search(r"items\(([^)]*)\)", fields)
+    if not match:
+        return event
+    wanted = set(match.group(1).split(","))
+    return {key: value for key, value in event.items() if key in wanted}
+
+
+class FakeCalendarService:
+    """
+    In-memory stand-in for the Calendar v3 service returned by googleapiclient.
+
+    Supports events().insert/delete/list (with pageToken, syncToken, timeMin/timeMax,
+    q, fields and singleEvents, which expands recurring events into instances),
+    freebusy().query and new_batch_http_request. Every executed request, batch
+    or not, counts as one HTTP request and sleeps `latency` seconds;
+    `response_bytes` adds up the JSON size of every response.
+    Install it with google_calendar_tool.set_calendar_service(service).
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.http_requests = 0
+        self.response_bytes = 0
+        self._events = {}  # event id -> (version, event)
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _count_http(self):
+        with self._lock:
+            self.http_requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _count_bytes(self, response):
+        size = len(json.dumps(response)) if response is not None else 0
+        with self._lock:
+            self.response_bytes += size
+
+    def reset_counts(self):
+        with self._lock:
+            self.http_requests = 0
+            self.response_bytes = 0
+
+    def add_events(self, events: list[dict]):
+        """Seeds events directly, without counting requests."""
+        for event in events:
+            self._insert("primary", event)
+
+    # -- request handlers --------------------------------------------------
+
+    def _insert(self, calendar_id: str, body: dict) -> dict:
+        with self._lock:
+            self._version += 1
+            event = copy.deepcopy(body)
+            event.setdefault("id", uuid.uuid4().hex)
+            event.setdefault("status", "confirmed")
+            event["htmlLink"] = f"https://calendar.example/event?eid={event['id']}"
+            self._events[event["id"]] = (self._version, event)
+            return copy.deepcopy(event)
+
+    def _delete(self, calendar_id: str, event_id: str):
+        with self._lock:
+            if event_id not in self._events:
+                raise KeyError(f"event {event_id} not found")
+            self._version += 1
+            _, event = self._events[event_id]
+            self._events[event_id] = (self._version, {"id": event_id, "status": "cancelled"})
+        return ""
+
+    def _list(self, calendar_id: str, pageToken: Optional[str] = None, syncToken: Optional[str] = None,
+              maxResults: int = 250, timeMin: Optional[str] = None, timeMax: Optional[str] = None,
+              q: Optional[str] = None, singleEvents: bool = False, fields: Optional[str] = None,
+              **_ignored) -> dict:
+        with self._lock:
+            since = int(syncToken) if syncToken else 0
+            items = [(v, e) for v, e in self._events.values() if v > since]
+            version = self._version
+        if not syncToken:
+            items = [(v, e) for v, e in items if e.get("status") != "cancelled"]
+        if singleEvents:
+            items = [(v, instance) for v, e in items for instance in expand_event(e)]
+        if timeMin:
+            items = [(v, e) for v, e in items if "end" in e and event_time_to_epoch(e["end"]) > to_epoch(timeMin)]
+        if timeMax:
+            items = [(v, e) for v, e in items if "start" in e and event_time_to_epoch(e["start"]) < to_epoch(timeMax)]
+        if q:
+            items = [(v, e) for v, e in items if q.lower() in f"{e.get('summary', '')} {e.get('description', '')}".lower()]
+        items.sort(key=lambda item: item[0])
+
+        offset = int(pageToken or 0)
+        page = [copy.deepcopy(_project(e, fields) if fields else e) for _, e in items[offset:offset + maxResults]]
+        result = {"kind": "calendar#events", "items": page}
+        if offset + maxResults < len(items):
+            result["nextPageToken"] = str(offset + maxResults)
+        else:
+            result["nextSyncToken"] = str(version)
+        return result
+
+    def _freebusy(self, body: dict) -> dict:
+        """Busy ranges of "primary" (the only calendar the fake holds); other IDs are notFound."""
+        window_start, window_end = to_epoch(body["timeMin"]), to_epoch(body["timeMax"])
+        with self._lock:
+            events = [e for _, e in self._events.values() if e.get("status") != "cancelled"]
+        busy = []
+        for event in events:
+            for instance in expand_event(event, window_start, window_end):
+                start, end = event_time_to_epoch(instance["start"]), event_time_to_epoch(instance["end"])
+                if start < window_end and end > window_start and event.get("transparency") != "transparent":
+                    busy.append((start, end))
+        calendars = {}
+        for item in body.get("items", []):
+            if item["id"] == "primary":
+                calendars[item["id"]] = {"busy": [
+                    {"start": datetime.fromtimestamp(start, timezone.utc).isoformat().replace("+00:00", "Z"),
+                     "end": datetime.fromtimestamp(end, timezone.utc).isoformat().replace("+00:00", "Z")}
+                    for start, end in sorted(busy)
+                ]}
+            else:
+                calendars[item["id"]] = {"errors": [{"domain": "global", "reason": "notFound"}], "busy": []}
+        return {"kind": "calendar#freeBusy", "timeMin": body["timeMin"], "timeMax": body["timeMax"],
+                "calendars": calendars}
+
+    # -- service surface ---------------------------------------------------
+
+    def events(self) -> _Events:
+        return _Events(self)
+
+    def freebusy(self) -> _FreeBusy:
+        return _FreeBusy(self)
+
+    def new_batch_http_request(self, callback=None) -> _Batch:
+        return _Batch(self, callback)
@@ -0,0 +1,175 @@
+import json
+import time
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+from urllib.parse import urlparse, parse_qs, urlencode
+
+
+class FakeCanvasServer:
+    """
+    Local Canvas LMS API with `courses` courses of `assignments_per_course`
+    assignments each. Half of the assignments (by default) are already past due.
+
+    Supports `per_page`/`page` pagination with `Link: <...>; rel="next"` headers,
+    ETag / If-None-Match revalidation, `bucket=future` on course assignments, the
+    cross-course `/planner/items` endpoint (start_date/end_date; answers 404 when
+    `planner` is False; each course also lists an ungraded discussion whose ID
+    collides with one of its assignments), and a fixed per-request latency. Request counts by
+    endpoint are kept in `requests`.
+    """
+
+    def __init__(self, courses: int = 10, assignments_per_course: int = 40, default_per_page: int = 10,
+                 latency: float = 0.02, past_fraction: float = 0.5, planner: bool = True):
+        self.default_per_page = default_per_page
+        self.planner = planner
+        self.latency = latency
+        self.requests = Counter()
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.version = 1  # bump to invalidate every ETag
+
+        now = datetime.now(timezone.utc)
+        self.courses = [{"id": 1000 + c, "name": f"Course {c}"} for c in range(courses)]
+        self.assignments = {}
+        for course in self.courses:
+            items = []
+            for a in range(assignments_per_course):
+                past = a < assignments_per_course * past_fraction
+                due = now + timedelta(days=(-1 if past else 1) * (1 + a % 60), hours=a % 24)
+                items.append({
+                    "id": course["id"] * 1000 + a,
+                    "course_id": course["id"],
+                    "name": f"{course['name']} assignment {a}",
+                    "due_at": due.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "html_url": f"https://canvas.example/courses/{course['id']}/assignments/{a}",
+                })
+            self.assignments[course["id"]] = items
+
+    # -- server lifecycle --------------------------------------------------
+
+    def __enter__(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._handle(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def api_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/api/v1"
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+            self.not_modified = 0
+
+    @property
+    def total_requests(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
+
+    # -- request handling ----------------------------------------------------
+
+    def _planner_items(self, query: dict) -> list:
+        start = datetime.fromisoformat(query["start_date"].replace("Z", "+00:00")) if "start_date" in query else None
+        end = datetime.fromisoformat(query["end_date"].replace("Z", "+00:00")) if "end_date" in query else None
+        items = []
+        for course in self.courses:
+            for a in self.assignments[course["id"]]:
+                due = datetime.fromisoformat(a["due_at"].replace("Z", "+00:00"))
+                if (start and due < start) or (end and due >= end):
+                    continue
+                items.append({
+                    "context_type": "Course",
+                    "course_id": course["id"],
+                    "context_name": course["name"],
+                    "plannable_id": a["id"],
+                    "plannable_type": "assignment",
+                    "plannable_date": a["due_at"],
+                    "plannable": {"id": a["id"], "title": a["name"], "due_at": a["due_at"]},
+                    "html_url": a["html_url"],
+                })
+            # An ungraded discussion with a to-do date whose ID collides with an assignment's
+            todo = self.assignments[course["id"]][-1]
+            todo_date = datetime.fromisoformat(todo["due_at"].replace("Z", "+00:00"))
+            if not ((start and todo_date < start) or (end and todo_date >= end)):
+                items.append({
+                    "context_type": "Course",
+                    "course_id": course["id"],
+                    "context_name": course["name"],
+                    "plannable_id": todo["id"],
+                    "plannable_type": "discussion_topic",
+                    "plannable_date": todo["due_at"],
+                    "plannable": {"id": todo["id"], "title": f"{course['name']} discussion", "todo_date": todo["due_at"]},
+                    "html_url": f"https://canvas.example/courses/{course['id']}/discussion_topics/{todo['id']}",
+                })
+        items.sort(key=lambda item: item["plannable_date"])
+        return items
+
+    def _route(self, path: str, query: dict) -> Optional[list]:
+        parts = path.removeprefix("/api/v1").strip("/").split("/")
+        if parts == ["courses"]:
+            return self.courses
+        if parts == ["planner", "items"]:
+            return self._planner_items(query) if self.planner else None
+        if len(parts) == 3 and parts[0] == "courses" and parts[2] == "assignments":
+            items = self.assignments.get(int(parts[1]))
+            if items is not None and query.get("bucket") == "future":
+                now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+                items = [a for a in items if a["due_at"] > now]
+            return items
+        return None
+
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(handler.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        endpoint = url.path.removeprefix("/api/v1")
+        for course in self.courses:
+            endpoint = endpoint.replace(f"/{course['id']}/", "/:id/")
+        with self._lock:
+            self.requests[endpoint] += 1
+
+        items = self._route(url.path, query)
+        if items is None:
+            handler.send_response(404)
+            handler.end_headers()
+            return
+
+        per_page = int(query.get("per_page", self.default_per_page))
+        page = int(query.get("page", 1))
+        etag = f'"{url.path}-{query.get("bucket", "")}-{self.version}-{per_page}-{page}"'
+        if handler.headers.get("If-None-Match") == etag:
+            with self._lock:
+                self.not_modified += 1
+            handler.send_response(304)
+            handler.send_header("ETag", etag)
+            handler.end_headers()
+            return
+
+        body = json.dumps(items[(page - 1) * per_page:page * per_page]).encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.send_header("ETag", etag)
+        if page * per_page < len(items):
+            next_query = urlencode({**query, "page": page + 1, "per_page": per_page})
+            handler.send_header("Link", f'<http://{handler.headers["Host"]}{url.path}?{next_query}>; rel="next"')
+        handler.end_headers()
+        handler.wfile.write(body)
@@ -0,0 +1,157 @@
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Optional
+
+from fast_path import extract_event
+
+# Next speaker after each agent's text reply on the normal scheduling path
+NEXT_SPEAKER = {
+    "human": "data_interpreter",
+    "data_interpreter": "schedule_checker",
+    "goal_planner": "schedule_checker",
+    "schedule_checker": "calendar_agent",
+    "calendar_agent": "calendar_agent",
+}
+
+FALLBACK_EVENT = {
+    "summary": "Benchmark event",
+    "description": "",
+    "location": "",
+    "start": {"dateTime": "2030-01-15T15:00:00-08:00", "timeZone": "America/Los_Angeles"},
+    "end": {"dateTime": "2030-01-15T16:00:00-08:00", "timeZone": "America/Los_Angeles"},
+}
+
+
+def _tool_call(name: str, arguments: dict) -> dict:
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{"id": f"call_{name}_{time.monotonic_ns()}", "type": "function",
+                        "function": {"name": name, "arguments": json.dumps(arguments)}}],
+    }
+
+
+def _text(content: str) -> dict:
+    return {"role": "assistant", "content": content}
+
+
+def _user_event(messages: list) -> dict:
+    for message in messages:
+        content = message.get("content") or ""
+        if message.get("role") == "user" and "User request:" in content:
+            request = content.split("User request:", 1)[1].split("\n", 1)[0]
+            extraction = extract_event(request)
+            if extraction["event"]:
+                return extraction["event"]
+    return FALLBACK_EVENT
+
+
+def _goal_events(messages: list) -> list:
+    """Two sessions for the goal in the last user message, on a day derived from its text."""
+    goal = (messages[-1].get("content") or "").split("\n", 1)[0].removeprefix("Goal: ")
+    day = 1 + sum(map(ord, goal)) % 27
+    return [{
+        "summary": f"{goal[:40]} session {n + 1}",
+        "description": goal,
+        "location": "",
+        "start": {"dateTime": f"2030-03-{day:02d}T{9 + 3 * n:02d}:00:00-08:00", "timeZone": "America/Los_Angeles"},
+        "end": {"dateTime": f"2030-03-{day:02d}T{10 + 3 * n:02d}:00:00-08:00", "timeZone": "America/Los_Angeles"},
+    } for n in range(2)]
+
+
+def scheduling_script(request: dict) -> dict:
+    """
+    Plays every agent on the data_interpreter -> schedule_checker -> calendar_agent
+    path, including the group manager's speaker selection.
+    """
+    messages = request["messages"]
+    system = (messages[0].get("content") or "") if messages else ""
+    last = messages[-1] if messages else {}
+    after_tool = last.get("role") == "tool"
+
+    if system.startswith("You are in a role play game"):
+        speakers = [m.get("name") for m in messages if m.get("name") in NEXT_SPEAKER]
+        return _text(NEXT_SPEAKER.get(speakers[-1] if speakers else "human", "data_interpreter"))
+    if "planning ONE personal or work goal" in system:
+        return _text(json.dumps(_goal_events(messages)))
+    if "receive raw text data" in system:
+        event = _user_event(messages)
+        return _text(f"1. **Title**: {event['summary']}\n2. **Date/Time**: {event['start']['dateTime']} to {event['end']['dateTime']}\n"
+                     f"3. **Location**: {event['location']}")
+    if "calendar conflict checker" in system:
+        if not after_tool:
+            return _tool_call("find_conflicts", {"proposed_events": [_user_event(messages)]})
+        return _text("No conflicts found. The schedule is clear, calendar_agent please create it.")
+    if "smart scheduling agent" in system:
+        if not after_tool:
+            return _tool_call("send_event_to_google_calendar", _user_event(messages))
+        return _text("all tasks complete")
+    return _text("all tasks complete")
+
+
+class FakeLLMServer:
+    """
+    Local OpenAI-compatible `/v1/chat/completions` endpoint driven by a script
+    function (request JSON -> assistant message). Point an llm_config at
+    `base_url` to run the real agents offline.
+    """
+
+    def __init__(self, script: Callable[[dict], dict] = scheduling_script, latency: float = 0.0):
+        self.script = script
+        self.latency = latency
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def __enter__(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests.append(request)
+                if fake.latency:
+                    time.sleep(fake.latency)
+                message = fake.script(request)
+                prompt_tokens = len(json.dumps(request["messages"])) // 4
+                completion_tokens = len(json.dumps(message)) // 4
+                body = json.dumps({
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request["model"],
+                    "choices": [{"index": 0, "message": message,
+                                 "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def llm_config(self, model: str = "gpt-4") -> dict:
+        return {"config_list": [{"model": model, "api_key": "sk-fake-benchmark", "base_url": self.base_url}]}
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
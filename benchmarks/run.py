@@ -0,0 +1,544 @@
+"""
+Runs the offline benchmark scenarios and saves the results as JSON.
+
+    python -m benchmarks.run                         # all scenarios
+    python -m benchmarks.run -s canvas_cold_sync -n 10
+    python -m benchmarks.run --compare benchmarks/results/<earlier>.json
+"""
+import os
+import io
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+import contextlib
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("TRACING", "0")  # scenarios use their own in-memory tracers
+
+import assignment_store
+import calendar_mirror
+import google_calendar_tool
+from benchmarks.fake_calendar import FakeCalendarService
+from benchmarks.fake_canvas import FakeCanvasServer
+from benchmarks.fake_llm import FakeLLMServer
+from tracing import Tracer
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+EXAMPLE_INPUT = "soccer game september 24th 2030, from 3pm-5pm at UW IMA in Seattle, use google calendar."
+
+SCENARIOS = {}
+
+
+def scenario(func: Callable) -> Callable:
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@contextlib.contextmanager
+def _sandbox():
+    """Runs in a scratch directory so caches, mirrors and sync files start empty."""
+    previous = os.getcwd()
+    directory = tempfile.mkdtemp(prefix="adulter-bench-")
+    os.chdir(directory)
+    calendar_mirror._mirror = None  # reopen the local stores inside the sandbox
+    assignment_store._store = None
+    calendar_mirror._user_mirrors.clear()
+    assignment_store._user_stores.clear()
+    try:
+        yield directory
+    finally:
+        calendar_mirror._mirror = None
+        assignment_store._store = None
+        calendar_mirror._user_mirrors.clear()
+        assignment_store._user_stores.clear()
+        os.chdir(previous)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _quiet(func, *args, **kwargs):
+    """Calls func with stdout captured (the tools and agents print a lot)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def _measure(setup: Callable, step: Callable, counters: Callable, iterations: int) -> dict:
+    """
+    Times `step` over `iterations` runs (each after `setup`), then runs it once more
+    under tracemalloc for peak memory. `counters()` returns per-run request counts.
+    """
+    latencies, totals = [], {}
+    for _ in range(iterations):
+        state = setup()
+        started = time.perf_counter()
+        _quiet(step, state)
+        latencies.append(time.perf_counter() - started)
+        for name, value in counters(state).items():
+            totals[name] = totals.get(name, 0) + value
+
+    state = setup()
+    tracemalloc.start()
+    _quiet(step, state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "iterations": iterations,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+    result.update({name: round(value / iterations, 2) for name, value in totals.items()})
+    return result
+
+
+def _sample_events(count: int, start: datetime, spacing_hours: int = 5) -> list[dict]:
+    events = []
+    for i in range(count):
+        begin = start + timedelta(hours=spacing_hours * i)
+        events.append({
+            "summary": f"Study block {i}",
+            "description": "benchmark",
+            "location": "Library",
+            "start": {"dateTime": begin.isoformat(), "timeZone": "America/Los_Angeles"},
+            "end": {"dateTime": (begin + timedelta(hours=1)).isoformat(), "timeZone": "America/Los_Angeles"},
+        })
+    return events
+
+
+# -- Canvas ------------------------------------------------------------------
+
+def _canvas_cold_sync(iterations: int, args, mode: str) -> dict:
+    import canvas_api
+    with FakeCanvasServer(courses=args.courses, assignments_per_course=args.assignments, latency=args.http_latency) as canvas:
+        os.environ["CANVAS_API_URL"] = canvas.api_url
+        previous_mode, canvas_api.CANVAS_FETCH_MODE = canvas_api.CANVAS_FETCH_MODE, mode
+        try:
+            with _sandbox():
+                def setup():
+                    assignment_store.get_assignment_store().reset()
+                    canvas.reset_counts()
+
+                return _measure(setup, lambda _: canvas_api.get_future_assignments(),
+                                lambda _: {"http_requests": canvas.total_requests}, iterations)
+        finally:
+            canvas_api.CANVAS_FETCH_MODE = previous_mode
+
+
+@scenario
+def canvas_cold_sync(iterations: int, args) -> dict:
+    """get_future_assignments with an empty assignment store (full per-course crawl)."""
+    return _canvas_cold_sync(iterations, args, mode="courses")
+
+
+@scenario
+def canvas_cold_sync_planner(iterations: int, args) -> dict:
+    """get_future_assignments with an empty assignment store, synced from the planner endpoint."""
+    return _canvas_cold_sync(iterations, args, mode="planner")
+
+
+@scenario
+def canvas_revalidate(iterations: int, args) -> dict:
+    """sync_assignments with every entry expired but unchanged upstream (conditional requests)."""
+    import canvas_api
+    with FakeCanvasServer(courses=args.courses, assignments_per_course=args.assignments, latency=args.http_latency) as canvas:
+        os.environ["CANVAS_API_URL"] = canvas.api_url
+        with _sandbox():
+            _quiet(canvas_api.sync_assignments, force=True, mode="courses")
+
+            def setup():
+                canvas.reset_counts()
+
+            return _measure(setup, lambda _: canvas_api.sync_assignments(ttl=0, mode="courses"),
+                            lambda _: {"http_requests": canvas.total_requests, "not_modified": canvas.not_modified},
+                            iterations)
+
+
+def _canvas_upcoming(iterations: int, args, mode: str, planner: bool = True) -> dict:
+    import canvas_api
+    with FakeCanvasServer(courses=args.courses, assignments_per_course=args.assignments, latency=args.http_latency,
+                          planner=planner) as canvas:
+        os.environ["CANVAS_API_URL"] = canvas.api_url
+        found = []
+
+        def setup():
+            canvas_api._planner_unavailable.clear()
+            canvas.reset_counts()
+
+        def step(_):
+            found[:] = canvas_api.get_upcoming_assignments(-1, mode=mode)
+
+        return _measure(setup, step, lambda _: {"http_requests": canvas.total_requests, "assignments": len(found)},
+                        iterations)
+
+
+@scenario
+def canvas_upcoming_crawl(iterations: int, args) -> dict:
+    """get_upcoming_assignments crawling every course (bucket=future)."""
+    return _canvas_upcoming(iterations, args, mode="courses")
+
+
+@scenario
+def canvas_upcoming_planner(iterations: int, args) -> dict:
+    """get_upcoming_assignments from the cross-course planner endpoint."""
+    return _canvas_upcoming(iterations, args, mode="planner")
+
+
+@scenario
+def canvas_upcoming_fallback(iterations: int, args) -> dict:
+    """get_upcoming_assignments in planner mode against a Canvas without the planner (404, then crawl)."""
+    return _canvas_upcoming(iterations, args, mode="planner", planner=False)
+
+
+# -- Google Calendar -----------------------------------------------------------
+
+def _with_fake_calendar(args, seed_events: int = 0, rich: bool = False):
+    """
+    Installs a fresh fake calendar (and an empty local mirror) seeded with `seed_events` events.
+    `rich` events carry the attendees, reminders and long descriptions real meetings have.
+    """
+    service = FakeCalendarService(latency=args.http_latency)
+    events = _sample_events(seed_events, datetime(2030, 1, 1, 8, tzinfo=timezone.utc), spacing_hours=3)
+    if rich:
+        for i, event in enumerate(events):
+            event["description"] = f"Agenda for meeting {i}: " + "discussion notes and links. " * 20
+            event["attendees"] = [{"email": f"person{j}@example.com", "responseStatus": "accepted"} for j in range(8)]
+            event["reminders"] = {"useDefault": False, "overrides": [{"method": "popup", "minutes": 10}]}
+            event["conferenceData"] = {"entryPoints": [{"entryPointType": "video", "uri": f"https://meet.example/{i}"}]}
+    service.add_events(events)
+    google_calendar_tool.set_calendar_service(service)
+    calendar_mirror._mirror = None
+    calendar_mirror._user_mirrors.clear()
+    root, ext = os.path.splitext(calendar_mirror.MIRROR_DB_FILE)
+    for path in glob.glob(f"{root}*{ext}"):  # the shared mirror and any per-user ones
+        os.remove(path)
+    return service
+
+
+@scenario
+def calendar_single_inserts(iterations: int, args) -> dict:
+    """One send_event_to_google_calendar call per event."""
+    events = _sample_events(args.events, datetime(2030, 2, 1, 16, tzinfo=timezone.utc))
+    with _sandbox():
+        service = _with_fake_calendar(args)
+
+        def step(_):
+            for event in events:
+                google_calendar_tool.send_event_to_google_calendar(**event)
+
+        try:
+            return _measure(service.reset_counts, step, lambda _: {"http_requests": service.http_requests}, iterations)
+        finally:
+            google_calendar_tool.set_calendar_service(None)
+
+
+@scenario
+def calendar_recurring_insert(iterations: int, args) -> dict:
+    """The --events occurrences of a weekly habit as one recurring send_event_to_google_calendar call."""
+    event = _sample_events(1, datetime(2030, 2, 1, 16, tzinfo=timezone.utc))[0]
+    event["recurrence"] = [f"RRULE:FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT={args.events}"]
+    with _sandbox():
+        service = _with_fake_calendar(args)
+        try:
+            return _measure(service.reset_counts, lambda _: google_calendar_tool.send_event_to_google_calendar(**event),
+                            lambda _: {"http_requests": service.http_requests}, iterations)
+        finally:
+            google_calendar_tool.set_calendar_service(None)
+
+
+@scenario
+def calendar_batch_insert(iterations: int, args) -> dict:
+    """send_events_batch with all events in one call."""
+    events = _sample_events(args.events, datetime(2030, 2, 1, 16, tzinfo=timezone.utc))
+    with _sandbox():
+        service = _with_fake_calendar(args)
+        try:
+            return _measure(service.reset_counts, lambda _: google_calendar_tool.send_events_batch(events),
+                            lambda _: {"http_requests": service.http_requests}, iterations)
+        finally:
+            google_calendar_tool.set_calendar_service(None)
+
+
+@scenario
+def calendar_window_query(iterations: int, args) -> dict:
+    """get_calendar_events for a month-long window against a populated calendar."""
+    with _sandbox():
+        service = _with_fake_calendar(args, seed_events=args.calendar_size)
+        _quiet(google_calendar_tool.sync_calendar_mirror, force=True)
+
+        def step(_):
+            google_calendar_tool.get_calendar_events(time_min="2030-01-10T00:00:00-08:00",
+                                                     time_max="2030-02-10T00:00:00-08:00")
+
+        try:
+            return _measure(service.reset_counts, step, lambda _: {"http_requests": service.http_requests}, iterations)
+        finally:
+            google_calendar_tool.set_calendar_service(None)
+
+
+def _month_window_scenario(iterations: int, args, query: Callable, sync_fields=None) -> dict:
+    """Cold query of a month-long window against a calendar of --calendar-size rich events."""
+    with _sandbox():
+        previous_fields = google_calendar_tool.SYNC_FIELDS
+        google_calendar_tool.SYNC_FIELDS = sync_fields
+
+        def setup():
+            return {"service": _with_fake_calendar(args, seed_events=args.calendar_size, rich=True)}
+
+        def step(state):
+            state["result"] = query()
+
+        def counters(state):
+            return {
+                "http_requests": state["service"].http_requests,
+                "response_kb": state["service"].response_bytes / 1024,
+                "result_kb": len(json.dumps(state["result"])) / 1024,
+            }
+
+        try:
+            return _measure(setup, step, counters, iterations)
+        finally:
+            google_calendar_tool.SYNC_FIELDS = previous_fields
+            google_calendar_tool.set_calendar_service(None)
+
+
+MONTH_WINDOW = {"time_min": "2030-01-10T00:00:00-08:00", "time_max": "2030-02-10T00:00:00-08:00"}
+
+
+@scenario
+def calendar_month_events_full(iterations: int, args) -> dict:
+    """get_calendar_events for a month on a cold mirror, full event resources."""
+    return _month_window_scenario(
+        iterations, args, lambda: google_calendar_tool.get_calendar_events(**MONTH_WINDOW, max_results=0, fields=["*"]))
+
+
+@scenario
+def calendar_month_events_fields(iterations: int, args) -> dict:
+    """get_calendar_events for a month on a cold mirror, with the sync and result field projections."""
+    return _month_window_scenario(
+        iterations, args, lambda: google_calendar_tool.get_calendar_events(**MONTH_WINDOW, max_results=0),
+        sync_fields=google_calendar_tool.SYNC_FIELDS)
+
+
+@scenario
+def calendar_month_busy(iterations: int, args) -> dict:
+    """get_busy_intervals for the same month (one FreeBusy request, no mirror sync)."""
+    return _month_window_scenario(
+        iterations, args, lambda: google_calendar_tool.get_busy_intervals(["primary"], **MONTH_WINDOW))
+
+
+# -- Interpreter ---------------------------------------------------------------
+
+def _interpret_scenario(iterations: int, args, fast_path: bool, pattern: str = "auto") -> dict:
+    from interpreter import Interpreter
+    with FakeLLMServer(latency=args.llm_latency) as llm, _sandbox():
+        tracer = Tracer(path=None, enabled=True)
+        agent = _quiet(Interpreter, llm.llm_config(), fast_path_threshold=0.85 if fast_path else None,
+                       tracer=tracer, pattern=pattern)
+
+        def setup():
+            agent.reset()
+            llm.reset_counts()
+            tracer.reset()
+            return _with_fake_calendar(args, seed_events=args.calendar_size)
+
+        def counters(service):
+            summary = tracer.summary()
+            return {
+                "llm_requests": len(llm.requests),
+                "rounds": sum(v["count"] for k, v in summary.items() if k.startswith("agent_turn/")),
+                "tool_calls": sum(v["count"] for k, v in summary.items() if k.startswith("tool/")),
+                "http_requests": service.http_requests,
+            }
+
+        try:
+            return _measure(setup, lambda _: agent.interpret(EXAMPLE_INPUT), counters, iterations)
+        finally:
+            google_calendar_tool.set_calendar_service(None)
+
+
+@scenario
+def interpret_agents(iterations: int, args) -> dict:
+    """Interpreter.interpret through the full group chat with a scripted model."""
+    return _interpret_scenario(iterations, args, fast_path=False)
+
+
+@scenario
+def interpret_pipeline(iterations: int, args) -> dict:
+    """Interpreter.interpret through the group chat with rule-based speaker selection."""
+    return _interpret_scenario(iterations, args, fast_path=False, pattern="pipeline")
+
+
+@scenario
+def interpret_fast_path(iterations: int, args) -> dict:
+    """Interpreter.interpret on well-formed input handled by the rule-based fast path."""
+    return _interpret_scenario(iterations, args, fast_path=True)
+
+
+# -- service mode --------------------------------------------------------------
+
+def _service_scenario(iterations: int, args, workers: int) -> dict:
+    from interpreter_pool import InterpreterPool
+    from jobs import JobQueue
+    from user_context import UserContext, use_user
+    users = [UserContext(f"user{i}") for i in range(args.users)]
+    with FakeLLMServer(latency=args.llm_latency) as llm, _sandbox():
+        pool = _quiet(InterpreterPool, llm.llm_config(), size=workers, headless=True, fast_path_threshold=None)
+
+        def run(text):
+            with pool.acquire() as agent:
+                return agent.interpret(text)
+
+        queue = JobQueue(run, max_workers=workers)
+
+        def setup():
+            llm.reset_counts()
+            return _with_fake_calendar(args, seed_events=args.calendar_size)
+
+        def step(_):
+            job_ids = []
+            for user in users:
+                with use_user(user):
+                    job_ids.append(queue.submit(EXAMPLE_INPUT, owner=user.user_id))
+            for job_id in job_ids:
+                queue.wait(job_id, timeout=300)
+
+        try:
+            result = _measure(setup, step, lambda _: {"llm_requests": len(llm.requests)}, iterations)
+            result["failed_jobs"] = queue.stats()["failed"]
+            return result
+        finally:
+            google_calendar_tool.set_calendar_service(None)
+
+
+@scenario
+def service_serial(iterations: int, args) -> dict:
+    """One headless run per --users user, one at a time."""
+    return _service_scenario(iterations, args, workers=1)
+
+
+@scenario
+def service_concurrent(iterations: int, args) -> dict:
+    """One headless run per --users user on the fair job queue with --workers workers."""
+    return _service_scenario(iterations, args, workers=args.workers)
+
+
+# -- goal planning -------------------------------------------------------------
+
+@scenario
+def find_slots_large(iterations: int, args) -> dict:
+    """find_slots placing --goals x 5 tasks around --calendar-size busy intervals over four weeks."""
+    import random
+    from slot_finder import find_slots
+    rng = random.Random(11)
+    base = datetime(2030, 3, 4, 8, tzinfo=timezone.utc)
+    busy = []
+    for _ in range(args.calendar_size):
+        start = base + timedelta(minutes=15 * rng.randrange(0, 28 * 24 * 4))
+        busy.append({"start": start.isoformat(), "end": (start + timedelta(minutes=rng.choice([30, 60, 90]))).isoformat()})
+    tasks = []
+    for i in range(args.goals * 5):
+        task = {"summary": f"Block {i}", "duration_minutes": rng.choice([30, 60, 90, 120]),
+                "sessions": rng.choice([1, 2, 3]), "preferred": rng.choice([None, "morning", "afternoon", "evening"])}
+        if i % 3 == 0:
+            task["due_at"] = (base + timedelta(days=rng.randrange(3, 28))).isoformat()
+        tasks.append(task)
+    constraints = {"start": base.isoformat(), "horizon_days": 28, "day_end": "23:00"}
+
+    def step(state):
+        state.update(find_slots(tasks, busy, constraints)["stats"])
+
+    return _measure(dict, step, lambda state: {"placed": state["placed"], "unplaced": state["unplaced"]}, iterations)
+
+
+def _goal_planning_scenario(iterations: int, args, max_workers: int) -> dict:
+    import goal_planning
+    goals = [f"Benchmark goal {i}: practice skill {i}" for i in range(args.goals)]
+    with FakeLLMServer(latency=args.llm_latency) as llm, _sandbox():
+        def step(_):
+            goal_planning.plan_goals(goals, llm.llm_config(), max_workers=max_workers, research=False,
+                                     existing_events=[], tracer=Tracer(path=None, enabled=False))
+
+        return _measure(llm.reset_counts, step, lambda _: {"llm_requests": len(llm.requests)}, iterations)
+
+
+@scenario
+def goal_planning_serial(iterations: int, args) -> dict:
+    """plan_goals over --goals goals, one at a time."""
+    return _goal_planning_scenario(iterations, args, max_workers=1)
+
+
+@scenario
+def goal_planning_parallel(iterations: int, args) -> dict:
+    """plan_goals over --goals goals with the default concurrency limit."""
+    import goal_planning
+    return _goal_planning_scenario(iterations, args, max_workers=goal_planning.GOAL_PLANNING_MAX_WORKERS)
+
+
+# -- driver ----------------------------------------------------------------------
+
+def _compare(current: dict, previous: dict):
+    print(f"\nCompared with {previous['timestamp']}:")
+    for name, metrics in current["scenarios"].items():
+        before = previous["scenarios"].get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms", "llm_requests", "http_requests", "peak_memory_kb"):
+            if key in metrics and key in before and before[key]:
+                changes.append(f"{key} {(metrics[key] - before[key]) / before[key] * 100:+.0f}%")
+        print(f"  {name}: {', '.join(changes) or 'no comparable metrics'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS), help="scenario to run (repeatable)")
+    parser.add_argument("-n", "--iterations", type=int, default=5)
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--assignments", type=int, default=40, help="assignments per course")
+    parser.add_argument("--events", type=int, default=20, help="events per insert scenario")
+    parser.add_argument("--goals", type=int, default=10, help="goals per goal planning scenario")
+    parser.add_argument("--users", type=int, default=12, help="users per service scenario")
+    parser.add_argument("--workers", type=int, default=8, help="job workers for service_concurrent")
+    parser.add_argument("--calendar-size", type=int, default=500, help="events already on the fake calendar")
+    parser.add_argument("--http-latency", type=float, default=0.02, help="seconds per fake Canvas/Calendar request")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake model request")
+    parser.add_argument("--output", default=None, help="results file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = {"timestamp": datetime.now().isoformat(timespec="seconds"), "config": vars(args), "scenarios": {}}
+    for name in args.scenario or list(SCENARIOS):
+        print(f"▶ {name}: {SCENARIOS[name].__doc__.strip()}")
+        metrics = SCENARIOS[name](args.iterations, args)
+        results["scenarios"][name] = metrics
+        print("   " + ", ".join(f"{k}={v}" for k, v in metrics.items()))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Saved results to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            _compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
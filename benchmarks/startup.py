@@ -0,0 +1,109 @@
+"""
+Import-time profiler and startup budget check for the entry points.
+
+    python -m benchmarks.startup                 # profile main, app and test
+    python -m benchmarks.startup -m interpreter  # profile any module
+    python -m benchmarks.startup --check         # exit 1 if an entry point is over budget
+
+Each module is imported in a fresh interpreter (python -X importtime) from a
+scratch directory, so caches and databases in the repo are not touched.
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds to import each entry point (median of --runs). main and test import the
+# agent stack up front; app defers it until the first request needs the pool.
+IMPORT_BUDGETS = {
+    "main": 2.0,
+    "test": 2.5,
+    "app": 1.0,
+}
+
+
+def import_profile(module: str) -> list[tuple]:
+    """Imports `module` in a subprocess and returns [(name, self_us, cumulative_us, depth)] in import order."""
+    directory = tempfile.mkdtemp(prefix="adulter-startup-")
+    env = {**os.environ, "PYTHONPATH": ROOT, "TRACING": "0", "PYTHONDONTWRITEBYTECODE": "1"}
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=directory, env=env, capture_output=True, text=True, timeout=120,
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # two spaces of indent per nesting level
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def summarize(rows: list[tuple], top: int = 12) -> dict:
+    """Total import time plus the most expensive packages (by self time) and direct imports (cumulative)."""
+    total_us = rows[-1][2] if rows else 0
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    direct = [(name, cumulative) for name, _, cumulative, depth in rows if depth == 1]
+    return {
+        "total_s": total_us / 1e6,
+        "packages": sorted(by_package.items(), key=lambda item: -item[1])[:top],
+        "direct_imports": sorted(direct, key=lambda item: -item[1])[:top],
+    }
+
+
+def profile(module: str, runs: int = 3, top: int = 12) -> dict:
+    """Profiles `module` `runs` times; the reported total is the median."""
+    summaries = [summarize(import_profile(module), top) for _ in range(runs)]
+    result = summaries[-1]
+    result["total_s"] = statistics.median(s["total_s"] for s in summaries)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-m", "--module", action="append", help="module to profile (repeatable; default: entry points)")
+    parser.add_argument("-n", "--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--check", action="store_true", help="fail when an entry point exceeds its budget")
+    args = parser.parse_args(argv)
+
+    over_budget = []
+    for module in args.module or list(IMPORT_BUDGETS):
+        result = profile(module, args.runs, args.top)
+        budget = IMPORT_BUDGETS.get(module)
+        status = ""
+        if budget is not None:
+            ok = result["total_s"] <= budget
+            status = f" (budget {budget:.1f}s {'✅' if ok else '❌'})"
+            if not ok:
+                over_budget.append(module)
+        print(f"\n▶ {module}: {result['total_s']:.3f}s{status}")
+        print("   direct imports (cumulative):")
+        for name, us in result["direct_imports"]:
+            print(f"     {us / 1000:9.1f} ms  {name}")
+        print("   packages (self time):")
+        for name, us in result["packages"]:
+            print(f"     {us / 1000:9.1f} ms  {name}")
+
+    if args.check and over_budget:
+        print(f"\n❌ Over import budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
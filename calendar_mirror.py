@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Optional, List, Dict
+from utils import event_time_to_epoch, to_epoch
+from user_context import user_key, user_path
+
+MIRROR_DB_FILE = os.getenv("CALENDAR_MIRROR_DB", "calendar_mirror.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    recurring_event_id TEXT,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    summary TEXT,
+    description TEXT,
+    body TEXT NOT NULL,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS idx_events_start ON events (calendar_id, start_ts);
+CREATE INDEX IF NOT EXISTS idx_events_end ON events (calendar_id, end_ts);
+CREATE INDEX IF NOT EXISTS idx_events_series ON events (calendar_id, recurring_event_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at REAL
+);
+"""
+
+
+class CalendarMirror:
+    """
+    On-disk SQLite copy of Google Calendar events, indexed by start/end time.
+
+    The mirror is kept current by the Calendar API's incremental sync tokens
+    (see google_calendar_tool.sync_calendar_mirror) and by our own inserts and
+    deletes, so window and keyword queries never need a live API call.
+    """
+
+    def __init__(self, path: str = MIRROR_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _upsert(self, calendar_id: str, event: Dict):
+        start, end = event.get("start"), event.get("end")
+        if not start or not end:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                calendar_id,
+                event["id"],
+                event.get("recurringEventId"),
+                event_time_to_epoch(start),
+                event_time_to_epoch(end),
+                event.get("summary"),
+                event.get("description"),
+                json.dumps(event),
+            ),
+        )
+
+    def _remove(self, calendar_id: str, event_id: str):
+        # Removing a recurring series also removes its expanded instances
+        self._conn.execute(
+            "DELETE FROM events WHERE calendar_id = ? AND (event_id = ? OR recurring_event_id = ?)",
+            (calendar_id, event_id, event_id),
+        )
+
+    def upsert_event(self, calendar_id: str, event: Dict):
+        """Inserts or replaces one event resource."""
+        with self._lock:
+            self._upsert(calendar_id, event)
+            self._conn.commit()
+
+    def remove_event(self, calendar_id: str, event_id: str):
+        """Removes one event (or a whole recurring series) by ID."""
+        with self._lock:
+            self._remove(calendar_id, event_id)
+            self._conn.commit()
+
+    def apply_changes(self, calendar_id: str, events: List[Dict]):
+        """Applies a page of events from a sync response; cancelled events are removed."""
+        with self._lock:
+            for event in events:
+                if event.get("status") == "cancelled":
+                    self._remove(calendar_id, event["id"])
+                else:
+                    self._upsert(calendar_id, event)
+            self._conn.commit()
+
+    def reset(self, calendar_id: str):
+        """Drops every mirrored event and the sync token for a calendar."""
+        with self._lock:
+            self._conn.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+            self._conn.execute("DELETE FROM sync_state WHERE calendar_id = ?", (calendar_id,))
+            self._conn.commit()
+
+    def get_sync_state(self, calendar_id: str) -> Dict:
+        """Returns {"sync_token", "synced_at"} for a calendar (both None if never synced)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token, synced_at FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+            ).fetchone()
+        if row is None:
+            return {"sync_token": None, "synced_at": None}
+        return {"sync_token": row[0], "synced_at": row[1]}
+
+    def set_sync_token(self, calendar_id: str, sync_token: Optional[str]):
+        """Records the token to use for the next incremental sync."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)", (calendar_id, sync_token, time.time())
+            )
+            self._conn.commit()
+
+    def query(
+        self,
+        calendar_id: str,
+        time_min: Optional[str] = None,
+        time_max: Optional[str] = None,
+        query: Optional[str] = None,
+        max_results: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        Returns mirrored events overlapping [time_min, time_max), ordered by start time.
+        Like the Calendar API, time_min bounds the event end and time_max bounds the start.
+        """
+        sql = "SELECT body FROM events WHERE calendar_id = ?"
+        params = [calendar_id]
+        if time_min:
+            sql += " AND end_ts > ?"
+            params.append(to_epoch(time_min))
+        if time_max:
+            sql += " AND start_ts < ?"
+            params.append(to_epoch(time_max))
+        if query:
+            sql += " AND (summary LIKE ? OR description LIKE ?)"
+            params.extend([f"%{query}%", f"%{query}%"])
+        sql += " ORDER BY start_ts"
+        if max_results:
+            sql += " LIMIT ?"
+            params.append(max_results)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+_mirror = None
+_user_mirrors: Dict[str, CalendarMirror] = {}
+_mirror_lock = threading.Lock()
+
+
+def get_calendar_mirror() -> CalendarMirror:
+    """Returns the calendar mirror of the current user (the process-wide one in single-user mode)."""
+    global _mirror
+    key = user_key()
+    with _mirror_lock:
+        if key is not None:
+            if key not in _user_mirrors:
+                _user_mirrors[key] = CalendarMirror(user_path(MIRROR_DB_FILE))
+            return _user_mirrors[key]
+        if _mirror is None:
+            _mirror = CalendarMirror()
+        return _mirror
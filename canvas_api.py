@@ -1,33 +1,56 @@
 import os
+import time
+import threading
 import requests
-import json
-from utils import get_todays_date
-from typing import Annotated, List, Dict
-def save_assignments(assignments, filename="assignments.json"):
-    """
-    Saves assignments to a local JSON file.
-    """
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(assignments, f, indent=2)
-    print(f"✅ Saved {len(assignments)} assignments to {filename}")
-def load_assignments(filename="assignments.json"):
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from utils import epoch_to_iso, to_epoch
+from user_context import get_setting, user_key
+from tracing import get_tracer
+from assignment_store import get_assignment_store
+from typing import Annotated, List, Dict, Optional
+
+CANVAS_MAX_WORKERS = int(os.getenv("CANVAS_MAX_WORKERS", "8"))
+CANVAS_PER_PAGE = 100
+CANVAS_SYNC_TTL = float(os.getenv("CANVAS_SYNC_TTL", "900"))  # seconds
+# "planner": one cross-course /planner/items query for future work; "courses": the per-course crawl
+CANVAS_FETCH_MODE = os.getenv("CANVAS_FETCH_MODE", "planner")
+CANVAS_PLANNER_DAYS = int(os.getenv("CANVAS_PLANNER_DAYS", "180"))  # how far ahead the planner is read
+PLANNER_TYPES = ("assignment", "quiz", "discussion_topic")  # planner items that are graded assignments
+
+_session = None
+_session_lock = threading.Lock()
+_sync_locks: Dict[Optional[str], threading.Lock] = {}  # one per user, so users sync concurrently
+_planner_unavailable = set()  # user keys whose Canvas refused the planner endpoint
+
+# Per-course timings (seconds) from the most recent get_upcoming_assignments call.
+last_fetch_timings: Dict[str, float] = {}
+
+
+def get_canvas_session() -> requests.Session:
     """
-    Loads assignments from a local JSON file.
-    Returns an empty list if file does not exist.
+    Returns the shared keep-alive session used for all Canvas requests.
+    The connection pool is sized to the fetch concurrency so worker threads
+    never wait on a free connection.
     """
-    import os
-    if not os.path.exists(filename):
-        return []
-    with open(filename, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def canvas_get_all(url, headers, params=None):
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=CANVAS_MAX_WORKERS, pool_maxsize=CANVAS_MAX_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.hooks["response"].append(get_tracer().requests_hook)
+            _session = session
+        return _session
+def canvas_get_all(url, headers, params=None, session: Optional[requests.Session] = None):
     """
-    Fetch all pages from a Canvas API endpoint.
+    Fetch all pages from a Canvas API endpoint, following `Link: next` headers.
     """
+    session = session or get_canvas_session()
     results = []
     while url:
-        response = requests.get(url, headers=headers, params=params)
+        response = session.get(url, headers=headers, params=params)
         response.raise_for_status()
         results.extend(response.json())
 
@@ -36,51 +59,296 @@ def canvas_get_all(url, headers, params=None):
         url = links.get("next", {}).get("url")
         params = None  # Only needed on first request
     return results
-def get_upcoming_assignments(max_courses: Annotated[int, "Maximum number of courses to check"] = 10)-> List[Dict]:
+def _canvas_request_context():
+    """
+    Returns the Canvas base URL and auth headers for the current user
+    (from the environment in single-user mode).
+    """
+    API_URL = get_setting("CANVAS_API_URL")
+    TOKEN = get_setting("CANVAS_API_TOKEN")
+    headers = {
+        "Authorization": f"Bearer {TOKEN}"
+    }
+    return API_URL, headers
+
+
+def _to_assignment(course: Dict, assignment: Dict) -> Dict:
+    return {
+        "course": course.get("name"),
+        "name": assignment["name"],
+        "due_at": assignment.get("due_at"),
+        "id": assignment.get("id"),
+        "html_url": assignment.get("html_url"),
+    }
+
+
+def fetch_course_assignments(course: Dict, api_url: str, headers: Dict, sync_entry: Optional[Dict] = None,
+                             bucket: Optional[str] = None) -> Dict:
+    """
+    Fetches every page of one course's assignments.
+
+    When a previous sync entry is given, the first page is requested conditionally
+    (If-None-Match / If-Modified-Since). A 304 means the course is unchanged: no body
+    is downloaded and "assignments" is None. Validators are only kept for courses
+    that fit on one page, since they say nothing about later pages.
+
+    Args:
+        course (Dict): A course object from the Canvas `/courses` endpoint.
+        api_url (str): Base Canvas API URL.
+        headers (Dict): Request headers including the bearer token.
+        sync_entry (Optional[Dict]): The course's previous sync entry (etag, last_modified), if any.
+        bucket (Optional[str]): Canvas assignment bucket to filter on server-side (e.g. "future").
+
+    Returns:
+        Dict: A sync entry with "course", "assignments", "etag", "last_modified" and "synced_at".
+    """
+    assignments_url = f"{api_url}/courses/{course['id']}/assignments"
+    request_headers = dict(headers)
+    if sync_entry:
+        if sync_entry.get("etag"):
+            request_headers["If-None-Match"] = sync_entry["etag"]
+        if sync_entry.get("last_modified"):
+            request_headers["If-Modified-Since"] = sync_entry["last_modified"]
+
+    params = {"per_page": CANVAS_PER_PAGE}
+    if bucket:
+        params["bucket"] = bucket
+    session = get_canvas_session()
+    response = session.get(assignments_url, headers=request_headers, params=params)
+    if response.status_code == 304 and sync_entry:
+        return {**sync_entry, "course": course.get("name"), "assignments": None, "synced_at": time.time()}
+    response.raise_for_status()
+
+    raw_assignments = list(response.json())
+    next_url = response.links.get("next", {}).get("url")
+    if next_url:
+        raw_assignments.extend(canvas_get_all(next_url, headers, session=session))
+
+    # The validators only cover the first page, so a multi-page course keeps none
+    # and is downloaded in full next time instead of missing later-page changes.
+    validated = not next_url
+    return {
+        "course": course.get("name"),
+        "assignments": [_to_assignment(course, a) for a in raw_assignments if a.get("due_at")], # only assignments with due dates
+        "etag": response.headers.get("ETag") if validated else None,
+        "last_modified": response.headers.get("Last-Modified") if validated else None,
+        "synced_at": time.time(),
+    }
+
+
+def _fetch_courses_concurrently(courses: List[Dict], fetch) -> List[Optional[Dict]]:
+    """
+    Runs `fetch(course)` for every course on a bounded thread pool, recording
+    per-course timings in last_fetch_timings. Failed courses yield None.
+    """
+    def timed_fetch(course):
+        started = time.perf_counter()
+        try:
+            return fetch(course)
+        except requests.RequestException as e:
+            print(f"⚠️ Failed to fetch assignments for {course.get('name')}: {e}")
+            return None
+        finally:
+            last_fetch_timings[str(course.get("name", course["id"]))] = time.perf_counter() - started
+
+    last_fetch_timings.clear()
+    if not courses:
+        return []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(CANVAS_MAX_WORKERS, len(courses)))) as executor:
+        results = list(executor.map(timed_fetch, courses))
+    elapsed = time.perf_counter() - started
+
+    for name, seconds in last_fetch_timings.items():
+        print(f"{name}: {seconds:.2f}s")
+    print(f"Fetched {len(courses)} courses in {elapsed:.2f}s")
+    return results
+
+
+def fetch_planner_assignments(api_url: str, headers: Dict, start: Optional[float] = None,
+                              end: Optional[float] = None) -> Optional[List[Dict]]:
+    """
+    Fetches the assignments due in [start, end) across all courses from the
+    Canvas planner (`/planner/items`), a few paginated requests instead of one
+    crawl per course. Quizzes and discussions count when they are graded.
+
+    Args:
+        api_url (str): Base Canvas API URL.
+        headers (Dict): Request headers including the bearer token.
+        start (Optional[float]): UTC epoch seconds (default now).
+        end (Optional[float]): UTC epoch seconds (default CANVAS_PLANNER_DAYS after start).
+
+    Returns:
+        Optional[List[Dict]]: Assignments with "course", "course_id", "name", "due_at", "id"
+        and "html_url", or None if this Canvas (or account) does not serve the planner.
+    """
+    if user_key() in _planner_unavailable:
+        return None
+    start = time.time() if start is None else start
+    end = start + CANVAS_PLANNER_DAYS * 86400 if end is None else end
+    params = {"start_date": epoch_to_iso(start, "UTC"), "end_date": epoch_to_iso(end, "UTC"), "per_page": CANVAS_PER_PAGE}
+    try:
+        items = canvas_get_all(f"{api_url}/planner/items", headers, params=params)
+    except requests.HTTPError as e:
+        # 403/404 mean this Canvas (or account) has no planner; anything else, such as
+        # a 401 from a bad or rotated token, is not about the endpoint and is raised.
+        if e.response is None or e.response.status_code not in (403, 404):
+            raise
+        print(f"⚠️ Canvas planner unavailable ({e.response.status_code}), crawling courses instead")
+        _planner_unavailable.add(user_key())
+        return None
+
+    assignments = []
+    for item in items:
+        plannable = item.get("plannable") or {}
+        if item.get("plannable_type") not in PLANNER_TYPES or not item.get("course_id"):
+            continue
+        due_at = plannable.get("due_at") or item.get("plannable_date")
+        # Quizzes and discussions are graded only when they carry an assignment_id; their
+        # own IDs come from another ID space and must not reach the assignment store.
+        if item["plannable_type"] == "assignment":
+            assignment_id = item.get("plannable_id") or plannable.get("id")
+        else:
+            assignment_id = plannable.get("assignment_id")
+        if not due_at or assignment_id is None:
+            continue
+        assignments.append({
+            "course": item.get("context_name"),
+            "course_id": item["course_id"],
+            "name": plannable.get("title") or plannable.get("name"),
+            "due_at": due_at,
+            "id": assignment_id,
+            "html_url": item.get("html_url"),
+        })
+    return assignments
+
+
+def get_upcoming_assignments(max_courses: Annotated[int, "Maximum number of courses to check"] = 10,
+                             mode: Optional[str] = None) -> List[Dict]:
     """
     Fetches upcoming assignments from Canvas LMS.
 
+    In "planner" mode (CANVAS_FETCH_MODE, the default) one cross-course planner
+    query returns only future work, whatever the number of courses; max_courses
+    does not apply. In "courses" mode, or when the planner is unavailable, courses
+    are crawled concurrently (bounded by CANVAS_MAX_WORKERS) over one pooled
+    session, asking Canvas for the "future" bucket only.
+
     Args:
-        max_courses (int): Maximum number of courses to check (default=10).
+        max_courses (int): Maximum number of courses to crawl (default=10, negative for all).
+        mode (Optional[str]): "planner" or "courses" (default CANVAS_FETCH_MODE).
 
     Returns:
         List[Dict]: A list of assignments with course name, assignment name, and due date.
     """
-    API_URL = os.getenv("CANVAS_API_URL")
-    TOKEN = os.getenv("CANVAS_API_TOKEN")
-    headers = {
-        "Authorization": f"Bearer {TOKEN}"
-    }
-    #url = f"{API_URL}/courses"
-    #response = requests.get(url, headers=headers)
-    #response.raise_for_status()
-    #courses = response.json()
+    API_URL, headers = _canvas_request_context()
+    if (mode or CANVAS_FETCH_MODE) == "planner":
+        assignments = fetch_planner_assignments(API_URL, headers)
+        if assignments is not None:
+            return [{k: a[k] for k in ("course", "name", "due_at", "id", "html_url")} for a in assignments]
+
     url = f"{API_URL}/courses"
-    courses = canvas_get_all(url, headers)
+    courses = canvas_get_all(url, headers, params={"per_page": CANVAS_PER_PAGE})
+    if max_courses >= 0:
+        courses = courses[:max_courses]
+
+    results = _fetch_courses_concurrently(
+        courses, lambda course: fetch_course_assignments(course, API_URL, headers, bucket="future")
+    )
 
     assignments = []
-    for course in courses[:max_courses]:
-        course_id = course["id"]
-        assignments_url = f"{API_URL}/courses/{course_id}/assignments"
-        try:
-            print(course["name"])
-        except Exception as e:
-            print(f"exception thrown: {e}")
-        r = requests.get(assignments_url, headers=headers)
-        if r.status_code == 200:
-            for assignment in r.json():
-                if assignment.get("due_at"): # only assignments with due dates
-                    assignments.append({
-                        "course": course["name"],
-                        "name": assignment["name"],
-                        "due_at": assignment.get("due_at")
-                    })
+    for entry in results:
+        if entry:
+            assignments.extend(entry["assignments"])
     return assignments
 
 
+def _sync_from_planner(store, api_url: str, headers: Dict, now: float) -> Optional[int]:
+    """
+    Refreshes the store from one planner query over [now, now + CANVAS_PLANNER_DAYS):
+    each course's assignments in that window are replaced, so known courses with
+    nothing upcoming are emptied there while rows due later are kept. Returns the
+    number of courses updated, or None if the planner is unavailable.
+    """
+    end = now + CANVAS_PLANNER_DAYS * 86400
+    assignments = fetch_planner_assignments(api_url, headers, start=now, end=end)
+    if assignments is None:
+        return None
+    by_course = {c["id"]: (c["name"], []) for c in store.get_courses()}
+    for a in assignments:
+        by_course.setdefault(a["course_id"], (a["course"], []))[1].append(a)
+    for course_id, (name, items) in by_course.items():
+        # No validators: a later per-course crawl downloads these courses in full
+        store.replace_course_assignments(course_id, name, items, synced_at=now, due_after=now, due_before=end)
+    store.set_synced_at("planner_synced_at", now)
+    return len(by_course)
+
+
+def sync_assignments(ttl: Optional[float] = None, force: bool = False, mode: Optional[str] = None) -> int:
+    """
+    Incrementally syncs assignments from Canvas into the local assignment store.
+
+    In "planner" mode (CANVAS_FETCH_MODE, the default) an expired store is refreshed
+    from one cross-course planner query holding only future work. Otherwise, or
+    when the planner is unavailable, courses synced within the TTL are skipped
+    without any request and expired ones are revalidated with conditional
+    requests, so only courses that actually changed transfer a body, and only
+    their rows are upserted.
+
+    Args:
+        ttl (Optional[float]): Seconds a course stays fresh (default CANVAS_SYNC_TTL).
+        force (bool): Revalidate every course regardless of age.
+        mode (Optional[str]): "planner" or "courses" (default CANVAS_FETCH_MODE).
+
+    Returns:
+        int: The number of courses that were fetched or revalidated.
+    """
+    ttl = CANVAS_SYNC_TTL if ttl is None else ttl
+    now = time.time()
+    store = get_assignment_store()
+    API_URL, headers = _canvas_request_context()
+
+    def is_fresh(synced_at):
+        return not force and synced_at is not None and now - synced_at < ttl
+
+    with _session_lock:
+        sync_lock = _sync_locks.setdefault(user_key(), threading.Lock())
+    with sync_lock:
+        if (mode or CANVAS_FETCH_MODE) == "planner":
+            if is_fresh(store.get_synced_at("planner_synced_at")):
+                return 0
+            updated = _sync_from_planner(store, API_URL, headers, now)
+            if updated is not None:
+                return updated
+
+        if not is_fresh(store.get_course_list_synced_at()):
+            courses = canvas_get_all(f"{API_URL}/courses", headers, params={"per_page": CANVAS_PER_PAGE})
+            store.set_courses([{"id": c["id"], "name": c.get("name")} for c in courses], now)
+
+        def fetch(course):
+            # The stored course row doubles as the sync entry once it has validators
+            sync_entry = course if course["etag"] or course["last_modified"] else None
+            return fetch_course_assignments(course, API_URL, headers, sync_entry)
+
+        stale = [c for c in store.get_courses() if not is_fresh(c["synced_at"])]
+        results = _fetch_courses_concurrently(stale, fetch)
+        for course, entry in zip(stale, results):
+            if entry is None:
+                continue
+            if entry["assignments"] is None:
+                store.mark_course_synced(course["id"], entry["synced_at"])
+            else:
+                store.replace_course_assignments(
+                    course["id"], course["name"], entry["assignments"],
+                    etag=entry["etag"], last_modified=entry["last_modified"], synced_at=entry["synced_at"],
+                )
+    return len(stale)
+
+
 def filter_future_assignments(assignments: List[Dict]) -> List[Dict]:
     """
-    Filters a list of assignments to only include those due after today's date.
+    Filters a list of assignments to only include those due after the current moment.
+    Due times are compared as UTC instants, so time zones and time of day count.
 
     Args:
         assignments (List[Dict]): A list of assignments, each with at least "due_at".
@@ -88,29 +356,42 @@ def filter_future_assignments(assignments: List[Dict]) -> List[Dict]:
     Returns:
         List[Dict]: A filtered list containing only future assignments.
     """
-    today = get_todays_date()
-    return [a for a in assignments if a.get("due_at") and a["due_at"] > today]
-def get_future_assignments() -> list[dict]:
+    now = time.time()
+    future = []
+    for a in assignments:
+        try:
+            if a.get("due_at") and to_epoch(a["due_at"]) > now:
+                future.append(a)
+        except ValueError:
+            continue
+    return future
+def get_future_assignments(
+    days_ahead: Annotated[Optional[int], "Only assignments due within this many days (default: all)"] = None,
+    course: Annotated[Optional[str], "Only assignments from courses whose name contains this text"] = None,
+) -> list[dict]:
     """
-    Retrieve and filter upcoming assignments to only include those
-    due after today's date.
+    Retrieve upcoming assignments (due after now), soonest first.
+    Canvas is synced incrementally into the local assignment store first,
+    then the date window and course filter run as an indexed query.
 
     Returns:
         list[dict]: A list of assignment objects with due dates in the future.
     """
-    filtered_assignments = load_assignments(filename="assignments.json")
-    print(filtered_assignments)
-    if len(filtered_assignments) != 0:
-        return filtered_assignments
-    assignments = get_upcoming_assignments(-1)
-    filtered_assignments = filter_future_assignments(assignments)
-    save_assignments(filtered_assignments)
-    return filtered_assignments
+    try:
+        sync_assignments()
+    except requests.RequestException as e:
+        print(f"⚠️ Canvas sync failed, using stored assignments: {e}")
+    now = time.time()
+    due_before = now + days_ahead * 86400 if days_ahead is not None else None
+    return [
+        {"course": a["course"], "name": a["name"], "due_at": a["due_at"]}
+        for a in get_assignment_store().query(due_after=now, due_before=due_before, course_name=course)
+    ]
 def test_canvas_api():
 
     assignments = get_upcoming_assignments(-1)
     print(assignments)
     filtered_assignments = filter_future_assignments(assignments)
     print(filtered_assignments)
-    save_assignments(filtered_assignments)
+    print(f"✅ {sync_assignments(force=True)} courses synced into the assignment store")
 
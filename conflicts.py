@@ -0,0 +1,150 @@
+import heapq
+import random
+import time
+from typing import Optional
+from utils import event_time_to_epoch, epoch_to_iso
+from recurrence import expand_event
+
+
+def _to_intervals(events: list[dict], proposed: bool, window_start: Optional[float] = None,
+                  window_end: Optional[float] = None) -> list[tuple]:
+    """
+    One interval per event, or per occurrence of a recurring event ("recurrence"),
+    expanded locally over [window_start, window_end) or the default horizon.
+    Occurrences keep the index of the event they came from.
+    """
+    intervals = []
+    for index, event in enumerate(events):
+        try:
+            occurrences = expand_event(event, window_start, window_end)
+        except (KeyError, TypeError, ValueError, OverflowError):
+            continue  # an unusable recurrence cannot be checked
+        for occurrence in occurrences:
+            try:
+                start = event_time_to_epoch(occurrence["start"])
+                end = event_time_to_epoch(occurrence["end"])
+            except (KeyError, TypeError, ValueError):
+                continue  # events without a usable start/end cannot conflict
+            intervals.append((start, end, proposed, index, occurrence))
+    return intervals
+
+
+def _describe(interval: tuple) -> dict:
+    start, end, proposed, index, event = interval
+    return {
+        "summary": event.get("summary"),
+        "id": event.get("id"),
+        "proposed": proposed,
+        "index": index,
+        "start": epoch_to_iso(start),
+        "end": epoch_to_iso(end),
+    }
+
+
+def find_conflicts(
+    proposed_events: list[dict],
+    existing_events: Optional[list[dict]] = None,
+    min_gap_minutes: int = 0,
+    calendar_id: str = "primary",
+) -> dict:
+    """
+    Finds exact overlaps and near-misses between proposed events and the calendar.
+
+    Every event uses the calendar JSON format ("start"/"end" with "dateTime" or
+    "date", optionally "timeZone"); times are compared in UTC so mixed time zones
+    are handled correctly. Recurring events ("recurrence": ["RRULE:..."]) are
+    expanded locally into their occurrences, up to RECURRENCE_HORIZON_DAYS past
+    the first one. Uses a sort-and-sweep, O(n log n + number of pairs).
+
+    Parameters:
+    - proposed_events: list[dict] → events you want to schedule
+    - existing_events: list[dict] → events already on the calendar; if omitted they are
+      read from get_calendar_events for the window spanned by the proposed events
+    - min_gap_minutes: int → events closer together than this are reported as near-misses
+    - calendar_id: str → calendar to read existing events from when they are omitted
+
+    Returns:
+    - {"conflicts": [...], "near_misses": [...]} where each entry names both events,
+      and includes "overlap_minutes" or "gap_minutes". Pairs of two existing events are not reported.
+    """
+    gap_seconds = min_gap_minutes * 60
+    proposed = _to_intervals(proposed_events, proposed=True)
+    window_start = window_end = None
+    if proposed:  # existing events (and their recurrences) only matter around the proposals
+        window_start = min(i[0] for i in proposed) - gap_seconds
+        window_end = max(i[1] for i in proposed) + gap_seconds
+    if existing_events is None:
+        existing_events = []
+        if proposed:
+            from google_calendar_tool import get_calendar_events
+            existing_events = get_calendar_events(
+                calendar_id=calendar_id,
+                time_min=epoch_to_iso(window_start),
+                time_max=epoch_to_iso(window_end),
+                max_results=0,  # no limit: every event in the window matters
+            )
+    intervals = proposed + _to_intervals(existing_events, False, window_start, window_end)
+    intervals.sort(key=lambda i: (i[0], i[1]))
+
+    conflicts, near_misses = [], []
+    active = []  # min-heap of (end, order, interval) still within reach of later starts
+    for order, current in enumerate(intervals):
+        start = current[0]
+        while active and active[0][0] + gap_seconds <= start:
+            heapq.heappop(active)
+        for end, _, other in active:
+            if not (current[2] or other[2]):
+                continue
+            pair = {"first": _describe(other), "second": _describe(current)}
+            if end > start:
+                pair["overlap_minutes"] = round((min(end, current[1]) - start) / 60, 1)
+                conflicts.append(pair)
+            elif end + gap_seconds > start:
+                pair["gap_minutes"] = round((start - end) / 60, 1)
+                near_misses.append(pair)
+        heapq.heappush(active, (current[1], order, current))
+
+    return {"conflicts": conflicts, "near_misses": near_misses}
+
+
+def test_find_conflicts(n_events: int = 3000, min_gap_minutes: int = 15):
+    """
+    Checks find_conflicts against a brute-force pairwise scan on synthetic
+    events spread over a few months, and times the sweep.
+    """
+    rng = random.Random(42)
+    base = 1758700800  # 2025-09-24T08:00:00Z
+    zones = ["America/Los_Angeles", "America/New_York", "UTC"]
+
+    def make_event(i):
+        start = base + rng.randrange(0, 90 * 24 * 60) * 60
+        end = start + rng.choice([30, 60, 90, 120]) * 60
+        zone = rng.choice(zones)
+        return {
+            "summary": f"event {i}",
+            "start": {"dateTime": epoch_to_iso(start, zone), "timeZone": zone},
+            "end": {"dateTime": epoch_to_iso(end, zone), "timeZone": zone},
+        }
+
+    existing = [make_event(i) for i in range(n_events)]
+    proposed = [make_event(n_events + i) for i in range(n_events // 10)]
+
+    started = time.perf_counter()
+    result = find_conflicts(proposed, existing, min_gap_minutes)
+    elapsed = time.perf_counter() - started
+
+    gap = min_gap_minutes * 60
+    expected_conflicts = expected_near = 0
+    intervals = _to_intervals(proposed, True) + _to_intervals(existing, False)
+    for i, a in enumerate(intervals):
+        for b in intervals[i + 1:]:
+            if not (a[2] or b[2]):
+                continue
+            if a[0] < b[1] and b[0] < a[1]:
+                expected_conflicts += 1
+            elif max(a[0], b[0]) - min(a[1], b[1]) < gap:
+                expected_near += 1
+
+    assert len(result["conflicts"]) == expected_conflicts, (len(result["conflicts"]), expected_conflicts)
+    assert len(result["near_misses"]) == expected_near, (len(result["near_misses"]), expected_near)
+    print(f"✅ {len(intervals)} events: {expected_conflicts} conflicts, {expected_near} near-misses in {elapsed * 1000:.1f} ms")
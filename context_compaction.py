@@ -0,0 +1,273 @@
+import os
+import ast
+import copy
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))  # hard budget per turn
+TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "1500"))
+DEFAULT_HISTORY_WINDOW = 20
+
+# Messages each agent keeps (besides the first task message). The interpreter only
+# needs the request; the others need their own tool round trips plus a little context.
+HISTORY_WINDOWS = {
+    "data_interpreter": 8,
+    "goal_planner": 16,
+    "schedule_checker": 12,
+    "calendar_agent": 12,
+}
+
+# Preferred columns when a list of records is compacted into a table
+_TABLE_COLUMNS = ("summary", "name", "title", "course", "start", "end", "due_at", "location", "id")
+_MAX_TABLE_COLUMNS = 5
+
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    """
+    Rough prompt size in tokens (about 4 characters per token). Counts message
+    text, tool call arguments and tool responses; avoids a tokenizer download.
+    """
+    chars = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(len(part.get("text", "")) for part in content if isinstance(part, dict))
+        for call in message.get("tool_calls") or []:
+            chars += len(call.get("function", {}).get("arguments") or "")
+        for response in message.get("tool_responses") or []:
+            chars += len(response.get("content") or "")
+    return chars // 4 + 4 * len(messages)
+
+
+def _parse(text: str) -> Any:
+    """Tool results arrive as JSON or as a Python repr (autogen str()s dicts and lists)."""
+    for loader in (json.loads, ast.literal_eval):
+        try:
+            return loader(text)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            continue
+    return None
+
+
+def _cell(value: Any) -> str:
+    if isinstance(value, dict):  # calendar start/end: {"dateTime": ..., "timeZone": ...}
+        value = value.get("dateTime") or value.get("date") or value
+    text = str(value) if value is not None else ""
+    return text if len(text) <= 60 else text[:57] + "..."
+
+
+def _table(rows: List[Dict], max_chars: int) -> str:
+    """Renders records as a pipe table with the most useful columns, cut off at max_chars."""
+    keys = []
+    for row in rows[:20]:
+        keys.extend(k for k in row if k not in keys)
+    columns = [k for k in _TABLE_COLUMNS if k in keys][:_MAX_TABLE_COLUMNS]
+    columns += [k for k in keys if k not in columns][:_MAX_TABLE_COLUMNS - len(columns)]
+
+    lines = [" | ".join(columns)]
+    used = len(lines[0])
+    for i, row in enumerate(rows):
+        line = " | ".join(_cell(row.get(k)) for k in columns)
+        if used + len(line) + 1 > max_chars:
+            lines.append(f"... and {len(rows) - i} more rows ({len(rows)} total)")
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
+
+
+def _shorten_text(text: str, max_chars: int) -> str:
+    """Keeps the opening of a long text, cut at a sentence or line boundary."""
+    head = text[:max_chars]
+    cut = max(head.rfind(". "), head.rfind("\n"))
+    if cut > max_chars // 2:
+        head = head[:cut + 1]
+    return f"{head.rstrip()}\n[... {len(text) - len(head)} more characters trimmed]"
+
+
+def compact_tool_result(text: str, max_chars: int = TOOL_RESULT_MAX_CHARS) -> str:
+    """
+    Shrinks one tool result to about max_chars.
+
+    Lists of records (assignments, calendar events) become a compact table; dicts of
+    lists (e.g. find_conflicts) are compacted key by key; anything else is trimmed.
+    """
+    if not isinstance(text, str) or len(text) <= max_chars:
+        return text
+    data = _parse(text)
+    if isinstance(data, list) and data and all(isinstance(row, dict) for row in data):
+        return _table(data, max_chars)
+    if isinstance(data, dict) and any(isinstance(v, list) for v in data.values()):
+        share = max_chars // max(1, len(data))
+        parts = []
+        for key, value in data.items():
+            if isinstance(value, list) and value and all(isinstance(row, dict) for row in value):
+                parts.append(f"{key}:\n{_table(value, share)}")
+            else:
+                parts.append(f"{key}: {_cell(value) if not isinstance(value, list) else value[:5]}")
+        return "\n".join(parts)
+    return _shorten_text(text, max_chars)
+
+
+class ToolResultCompactor:
+    """Message transform: compacts tool results larger than max_chars."""
+
+    def __init__(self, max_chars: int = TOOL_RESULT_MAX_CHARS):
+        self.max_chars = max_chars
+
+    def apply_transform(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        for message in messages:
+            if message.get("role") not in ("tool", "function"):
+                continue
+            for response in message.get("tool_responses") or []:
+                response["content"] = compact_tool_result(response.get("content"), self.max_chars)
+            message["content"] = compact_tool_result(message.get("content"), self.max_chars)
+        return messages
+
+    def get_logs(self, pre_transform_messages, post_transform_messages) -> tuple:
+        before, after = estimate_tokens(pre_transform_messages), estimate_tokens(post_transform_messages)
+        return f"Compacted tool results from ~{before} to ~{after} tokens.", after < before
+
+
+class HistoryWindow:
+    """Message transform: keeps the first (task) message plus the last `max_messages`."""
+
+    def __init__(self, max_messages: int = DEFAULT_HISTORY_WINDOW):
+        self.max_messages = max_messages
+
+    def apply_transform(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if len(messages) <= self.max_messages + 1:
+            return messages
+        return _drop_orphaned_tool_results(messages[:1] + messages[-self.max_messages:])
+
+    def get_logs(self, pre_transform_messages, post_transform_messages) -> tuple:
+        dropped = len(pre_transform_messages) - len(post_transform_messages)
+        return f"Dropped {dropped} old messages.", dropped > 0
+
+
+class TokenBudget:
+    """
+    Message transform: hard per-turn token budget. Evicts the oldest messages
+    (never the first task message or the newest one) until the estimate fits.
+    """
+
+    def __init__(self, max_tokens: int = CONTEXT_MAX_TOKENS):
+        self.max_tokens = max_tokens
+
+    def apply_transform(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if len(messages) <= 2 or estimate_tokens(messages) <= self.max_tokens:
+            return messages
+        first, rest = messages[:1], messages[1:]
+        budget = self.max_tokens - estimate_tokens(first)
+        kept = []
+        for message in reversed(rest):
+            cost = estimate_tokens([message])
+            if kept and cost > budget:
+                break
+            kept.insert(0, message)
+            budget -= cost
+        return _drop_orphaned_tool_results(first + kept)
+
+    def get_logs(self, pre_transform_messages, post_transform_messages) -> tuple:
+        dropped = len(pre_transform_messages) - len(post_transform_messages)
+        return f"Evicted {dropped} messages to fit {self.max_tokens} tokens.", dropped > 0
+
+
+def _drop_orphaned_tool_results(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Removes tool results whose tool call was evicted; the API rejects a tool
+    message that does not follow its assistant tool_calls message.
+    """
+    call_ids = set()
+    kept = []
+    for message in messages:
+        for call in message.get("tool_calls") or []:
+            call_ids.add(call.get("id"))
+        if message.get("role") == "tool":
+            ids = [r.get("tool_call_id") for r in message.get("tool_responses") or []] or [message.get("tool_call_id")]
+            if not any(i in call_ids for i in ids):
+                continue
+        kept.append(message)
+    return kept
+
+
+class ContextCompactor:
+    """
+    Context management for the interpreter's agents, applied just before each model call:
+
+    1. Large tool results are compacted into tables or trimmed summaries.
+    2. Each agent sees only a window of recent history (HISTORY_WINDOWS).
+    3. A hard token budget evicts the oldest remaining messages.
+
+    Prompt size before and after compaction is recorded per agent turn in `rounds`
+    (and as a "context" tracer span when a tracer is given).
+    """
+
+    def __init__(self, max_tokens: int = CONTEXT_MAX_TOKENS, tool_result_max_chars: int = TOOL_RESULT_MAX_CHARS,
+                 history_windows: Optional[Dict[str, int]] = None, default_window: int = DEFAULT_HISTORY_WINDOW,
+                 tracer=None, max_recorded_rounds: int = 1000):
+        self.max_tokens = max_tokens
+        self.tool_result_max_chars = tool_result_max_chars
+        self.history_windows = HISTORY_WINDOWS if history_windows is None else history_windows
+        self.default_window = default_window
+        self.tracer = tracer
+        self.max_recorded_rounds = max_recorded_rounds
+        self.rounds = []  # {"agent", "messages_before", "messages_after", "tokens_before", "tokens_after"}
+        self._lock = threading.Lock()
+
+    def transforms_for(self, agent_name: str) -> list:
+        return [
+            ToolResultCompactor(self.tool_result_max_chars),
+            HistoryWindow(self.history_windows.get(agent_name, self.default_window)),
+            TokenBudget(self.max_tokens),
+        ]
+
+    def add_to_agent(self, agent):
+        """Registers the compaction hook on a ConversableAgent."""
+        transforms = self.transforms_for(agent.name)
+
+        def compact(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            return self.compact(agent.name, messages, transforms)
+
+        agent.register_hook(hookable_method="process_all_messages_before_reply", hook=compact)
+
+    def compact(self, agent_name: str, messages: List[Dict[str, Any]], transforms: Optional[list] = None) -> List[Dict[str, Any]]:
+        """Applies the transforms to a copy of `messages`; a leading system message is left alone."""
+        if not messages:
+            return messages
+        transforms = transforms or self.transforms_for(agent_name)
+        compacted = copy.deepcopy(messages)
+        system = compacted.pop(0) if compacted[0].get("role") == "system" else None
+        for transform in transforms:
+            compacted = transform.apply_transform(compacted)
+        if system is not None:
+            compacted.insert(0, system)
+
+        entry = {
+            "agent": agent_name,
+            "messages_before": len(messages),
+            "messages_after": len(compacted),
+            "tokens_before": estimate_tokens(messages),
+            "tokens_after": estimate_tokens(compacted),
+        }
+        with self._lock:
+            self.rounds.append(entry)
+            del self.rounds[:-self.max_recorded_rounds]
+        if self.tracer is not None:
+            self.tracer.record("context", agent_name, 0.0, **{k: v for k, v in entry.items() if k != "agent"})
+        return compacted
+
+    def report(self) -> str:
+        """One line per recorded agent turn: prompt tokens before -> after compaction."""
+        with self._lock:
+            rounds = list(self.rounds)
+        lines = [f"{i + 1:>3}. {r['agent']:<17} ~{r['tokens_before']:>6} -> ~{r['tokens_after']:>6} tokens "
+                 f"({r['messages_before']} -> {r['messages_after']} messages)" for i, r in enumerate(rounds)]
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self.rounds = []
@@ -0,0 +1,212 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+from utils import DEFAULT_TIME_ZONE
+
+FAST_PATH_THRESHOLD = 0.85
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+TIME_ZONES = {
+    "pst": "America/Los_Angeles", "pdt": "America/Los_Angeles", "pt": "America/Los_Angeles", "pacific": "America/Los_Angeles",
+    "mst": "America/Denver", "mdt": "America/Denver", "mountain": "America/Denver",
+    "cst": "America/Chicago", "cdt": "America/Chicago", "central": "America/Chicago",
+    "est": "America/New_York", "edt": "America/New_York", "et": "America/New_York", "eastern": "America/New_York",
+    "utc": "UTC", "gmt": "UTC",
+}
+# Words that mean the text is about goals or several events, which the agents handle better
+AMBIGUOUS_WORDS = re.compile(r"\b(goals?|habits?|every|each|weekly|daily|recurring|schedule me|sometime|maybe|or)\b", re.I)
+# Words that mean the text changes or removes an existing event rather than adding one
+EDIT_WORDS = re.compile(r"\b(delete|cancel|remove|move|reschedule|change)\b", re.I)
+
+_MONTH_DATE = re.compile(
+    r"\b(?P<month>jan|feb|mar|apr|may|jun|jul|aug|sept?|oct|nov|dec)[a-z]*\.?\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s+(?P<year>\d{4}))?",
+    re.I,
+)
+_NUMERIC_DATE = re.compile(r"\b(?:(?P<iso_year>\d{4})-(?P<iso_month>\d{1,2})-(?P<iso_day>\d{1,2})|(?P<month>\d{1,2})/(?P<day>\d{1,2})(?:/(?P<year>\d{2,4}))?)\b")
+_TIME = r"(?P<{0}h>\d{{1,2}})(?::(?P<{0}m>\d{{2}}))?\s*(?P<{0}ap>[ap]\.?m\.?)?"
+_TIME_RANGE = re.compile(r"(?:\bfrom\s+)?\b" + _TIME.format("s") + r"\s*(?:-|–|to|until)\s*" + _TIME.format("e") + r"(?![\w:])", re.I)
+_SINGLE_TIME = re.compile(r"\b(?:at\s+)?" + _TIME.format("s") + r"(?![\w:/])", re.I)
+_DURATION = re.compile(r"\bfor\s+(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>hours?|hrs?|h|minutes?|mins?|m)\b", re.I)
+_LOCATION = re.compile(r"\b(?:at|in|@)\s+(?P<location>[^,.;\n]+)", re.I)
+_TIME_ZONE = re.compile(r"\b(" + "|".join(TIME_ZONES) + r")\b(?:\s+time)?", re.I)
+_INSTRUCTIONS = re.compile(r"\b(?:use|add (?:it )?to|put (?:it )?on|on my)\s+(?:google\s+)?calendar\b.*", re.I)
+
+
+def _to_24h(hour: str, minute: Optional[str], meridiem: Optional[str]) -> Optional[tuple]:
+    h, m = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= h <= 12:
+            return None
+        pm = meridiem.lower().startswith("p")
+        h = (h % 12) + (12 if pm else 0)
+    if not (0 <= h <= 23 and 0 <= m <= 59):
+        return None
+    return h, m
+
+
+def _find_date(text: str, today: date) -> tuple[Optional[date], Optional[re.Match], int]:
+    matches = list(_MONTH_DATE.finditer(text)) + list(_NUMERIC_DATE.finditer(text))
+    if not matches:
+        return None, None, 0
+    match = matches[0]
+    groups = match.groupdict()
+    try:
+        if groups.get("iso_year"):
+            return date(int(groups["iso_year"]), int(groups["iso_month"]), int(groups["iso_day"])), match, len(matches)
+        month = int(groups["month"]) if groups["month"].isdigit() else MONTHS[groups["month"].lower()]
+        day = int(groups["day"])
+        if groups.get("year"):
+            year = int(groups["year"])
+            year += 2000 if year < 100 else 0
+            return date(year, month, day), match, len(matches)
+        candidate = date(today.year, month, day)
+        if candidate < today:  # no year given: the next occurrence
+            candidate = date(today.year + 1, month, day)
+        return candidate, match, len(matches)
+    except (KeyError, ValueError):
+        return None, None, len(matches)
+
+
+def extract_event(text: str, default_time_zone: str = DEFAULT_TIME_ZONE, today: Optional[date] = None) -> dict:
+    """
+    Deterministically extracts a single calendar event from well-formed text.
+
+    Pulls out the title (text before the date), date, time range or start time
+    plus duration, location ("at ..."/"in ...") and time zone (Pacific unless
+    stated), and builds the event JSON the calendar_agent prompt specifies.
+
+    Args:
+        text (str): Raw user text, e.g. "soccer game september 24th 2025, from 3pm-5pm at UW IMA".
+        default_time_zone (str): IANA time zone used when the text names none.
+        today (Optional[date]): Reference date for inferring a missing year.
+
+    Returns:
+        dict: {"event": dict or None, "confidence": float (0-1), "reasons": list[str]}
+    """
+    today = today or date.today()
+    reasons = []
+    confidence = 0.0
+
+    instructions = _INSTRUCTIONS.search(text)
+    body = text[:instructions.start()] if instructions else text
+    body = body.strip().rstrip(".,; ")
+
+    event_date, date_match, date_count = _find_date(body, today)
+    if event_date is None:
+        return {"event": None, "confidence": 0.0, "reasons": ["no date found"]}
+    confidence += 0.35
+    if date_count > 1:
+        reasons.append("several dates mentioned")
+
+    zone_match = _TIME_ZONE.search(body)
+    time_zone = TIME_ZONES[zone_match.group(1).lower()] if zone_match else default_time_zone
+
+    def outside_date(match):
+        return not (date_match.start() <= match.start() < date_match.end() or date_match.start() < match.end() <= date_match.end())
+
+    ranges = [m for m in _TIME_RANGE.finditer(body) if outside_date(m)]
+    singles = [m for m in _SINGLE_TIME.finditer(body) if outside_date(m) and m.group("sap")
+               and not any(r.start() <= m.start() < r.end() for r in ranges)]
+    time_count = len(ranges) + len(singles)
+    if time_count > 1:
+        reasons.append("several times mentioned")
+
+    start = end = None
+    time_match = ranges[0] if ranges else None
+    if time_match:
+        g = time_match.groupdict()
+        end_meridiem = g["eap"]
+        start_meridiem = g["sap"] or end_meridiem  # "3-5pm" means 3pm-5pm
+        start = _to_24h(g["sh"], g["sm"], start_meridiem)
+        end = _to_24h(g["eh"], g["em"], end_meridiem)
+        if start and end and start_meridiem and not g["sap"] and start > end:
+            start = _to_24h(g["sh"], g["sm"], "am" if end_meridiem.lower().startswith("p") else "pm")  # "11-1pm"
+        if start and end and (g["sap"] or g["eap"]):
+            confidence += 0.35
+        else:
+            reasons.append("time range without am/pm")
+            confidence += 0.1
+    else:
+        for candidate in _SINGLE_TIME.finditer(body):
+            if not outside_date(candidate):
+                continue
+            if candidate.group("sap"):
+                time_match = candidate
+                start = _to_24h(candidate.group("sh"), candidate.group("sm"), candidate.group("sap"))
+                break
+        duration = _DURATION.search(body)
+        if start and duration:
+            minutes = float(duration.group("amount")) * (1 if duration.group("unit").lower().startswith("m") else 60)
+            end_time = datetime(2000, 1, 1, *start) + timedelta(minutes=minutes)
+            end = (end_time.hour, end_time.minute)
+            confidence += 0.3
+        elif start:
+            end_time = datetime(2000, 1, 1, *start) + timedelta(hours=1)
+            end = (end_time.hour, end_time.minute)
+            reasons.append("no end time or duration, assumed 1 hour")
+            confidence += 0.15
+    if not start or not end:
+        return {"event": None, "confidence": confidence, "reasons": reasons + ["no usable time found"]}
+
+    title = body[:date_match.start()].strip(" ,.-–:;") if date_match else ""
+    title = re.sub(r"\b(on|this|next)$", "", title, flags=re.I).strip(" ,.-–:;")
+    if title:
+        confidence += 0.2
+    else:
+        reasons.append("no title before the date")
+
+    location = ""
+    tail_start = max(date_match.end(), time_match.end() if time_match else 0)
+    location_match = _LOCATION.search(body, tail_start)
+    if location_match:
+        location = location_match.group("location").strip()
+        if zone_match:
+            location = _TIME_ZONE.sub("", location).strip()
+        confidence += 0.1
+
+    if AMBIGUOUS_WORDS.search(body):
+        reasons.append("text suggests goals, recurrence or alternatives")
+        confidence = min(confidence, 0.3)
+    if EDIT_WORDS.search(body):
+        reasons.append("text changes or removes an event")
+        confidence = min(confidence, 0.3)
+    if date_count > 1 or time_count > 1:
+        confidence = min(confidence, 0.3)
+
+    zone = ZoneInfo(time_zone)
+    start_dt = datetime(event_date.year, event_date.month, event_date.day, *start, tzinfo=zone)
+    end_dt = datetime(event_date.year, event_date.month, event_date.day, *end, tzinfo=zone)
+    if end_dt <= start_dt:
+        end_dt += timedelta(days=1)  # ends after midnight
+
+    event = {
+        "summary": title[:1].upper() + title[1:] if title else "Event",
+        "description": text.strip(),
+        "location": location,
+        "start": {"dateTime": start_dt.isoformat(), "timeZone": time_zone},
+        "end": {"dateTime": end_dt.isoformat(), "timeZone": time_zone},
+    }
+    return {"event": event, "confidence": round(min(confidence, 1.0), 2), "reasons": reasons}
+
+
+def test_extract_event():
+    """Checks well-formed input passes the threshold and edits or multi-event lines do not."""
+    today = date(2025, 9, 1)
+    ok = extract_event("soccer game september 24th 2030, from 3pm-5pm at UW IMA in Seattle, use google calendar.", today=today)
+    assert ok["confidence"] >= FAST_PATH_THRESHOLD and ok["event"]["summary"] == "Soccer game", ok
+    assert ok["event"]["start"]["dateTime"] == "2030-09-24T15:00:00-07:00", ok
+    for text in (
+        "Delete the soccer game september 24th from 3pm-5pm",
+        "Cancel soccer game sept 24 3pm-5pm",
+        "Move soccer game sept 24 3pm-5pm to 6pm-8pm",
+        "Reschedule dentist 9/24 at 2pm for 1 hour",
+        "soccer game 9/24 from 3pm-5pm, then dinner with Alex 7pm-9pm at Joe's",
+        "soccer game 9/24 from 3pm-5pm, dinner at 7pm",
+    ):
+        result = extract_event(text, today=today)
+        assert result["confidence"] < FAST_PATH_THRESHOLD, (text, result)
+    print("✅ extract_event keeps edits and multi-event lines off the fast path")
@@ -0,0 +1,154 @@
+import os
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from autogen import ConversableAgent
+
+from conflicts import find_conflicts
+from research_bot import research_online
+from tracing import Tracer, get_tracer
+from utils import get_goals, get_todays_date, event_time_to_epoch, DEFAULT_TIME_ZONE
+
+GOAL_PLANNING_MAX_WORKERS = int(os.getenv("GOAL_PLANNING_MAX_WORKERS", "4"))
+
+GOAL_PLANNER_MESSAGE = """You are a smart scheduling assistant planning ONE personal or work goal.
+Turn the goal into a short list of concrete calendar events over the next two weeks that help reach it.
+Today is {today}. Assume the {time_zone} time zone unless the goal says otherwise.
+Default to 1 hour sessions, at reasonable times of day, and avoid stacking them on the same hour.
+A habit that repeats is ONE event with a "recurrence" (start/end are the first session), not one event per session.
+
+Respond with ONLY a JSON list, no prose, where each item is:
+{{"summary": str, "description": str, "location": str,
+  "start": {{"dateTime": "<ISO 8601 with offset>", "timeZone": "{time_zone}"}},
+  "end": {{"dateTime": "<ISO 8601 with offset>", "timeZone": "{time_zone}"}},
+  "recurrence": ["RRULE:FREQ=WEEKLY;BYDAY=MO,WE;COUNT=4"]  (optional, only for repeating events)}}
+"""
+
+
+def _parse_events(reply) -> List[Dict]:
+    """Pulls the JSON list of events out of a model reply (tolerates code fences and prose)."""
+    text = reply.get("content") if isinstance(reply, dict) else reply
+    if not text:
+        return []
+    match = re.search(r"\[.*\]", text, re.DOTALL)
+    if not match:
+        return []
+    try:
+        events = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return []
+    return [e for e in events if isinstance(e, dict) and e.get("summary") and e.get("start") and e.get("end")]
+
+
+def plan_goal(goal: str, llm_config, llm_cache=None, research: bool = True, tracer: Optional[Tracer] = None) -> List[Dict]:
+    """
+    Plans a single goal in its own lightweight sub-run: one (cached) research call
+    and one planning call, with no group chat.
+
+    Parameters:
+    - goal: str → the goal text, e.g. a line from goals.txt
+    - llm_config → model config for the planning call
+    - llm_cache → optional LLMCache shared with the interpreter
+    - research: bool → whether to research the goal first
+
+    Returns:
+    - list of calendar event dicts (summary, description, location, start, end)
+    """
+    tracer = tracer or get_tracer()
+    with tracer.span("goal_plan", goal[:60]) as span:
+        notes = research_online(goal) if research else None
+        planner = ConversableAgent(
+            name="goal_planner",
+            llm_config=llm_config,
+            system_message=GOAL_PLANNER_MESSAGE.format(today=get_todays_date(), time_zone=DEFAULT_TIME_ZONE),
+            human_input_mode="NEVER",
+        )
+        planner.client_cache = llm_cache
+        prompt = f"Goal: {goal}"
+        if notes:
+            prompt += f"\n\nResearch notes:\n{notes}"
+        reply = planner.generate_reply(messages=[{"role": "user", "content": prompt}])
+        events = _parse_events(reply)
+        for event in events:
+            event.setdefault("description", f"Goal: {goal}")
+            event.setdefault("location", "")
+        span["events"] = len(events)
+        return events
+
+
+def iter_goal_plans(goals: List[str], llm_config, llm_cache=None, max_workers: int = GOAL_PLANNING_MAX_WORKERS,
+                    research: bool = True, tracer: Optional[Tracer] = None) -> Iterator[Tuple[str, List[Dict]]]:
+    """
+    Plans every goal in parallel (at most `max_workers` at a time) and yields
+    (goal, events) as each one finishes, fastest first. A goal whose planning
+    fails yields an empty list.
+    """
+    goals = list(dict.fromkeys(g for g in goals if g.strip()))
+    if not goals:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(goals))) as executor:
+        futures = {executor.submit(plan_goal, goal, llm_config, llm_cache, research, tracer): goal for goal in goals}
+        for future in as_completed(futures):
+            goal = futures[future]
+            try:
+                yield goal, future.result()
+            except Exception as e:
+                print(f"⚠️ Planning failed for goal '{goal}': {e}")
+                yield goal, []
+
+
+def merge_goal_events(plans: Dict[str, List[Dict]]) -> List[Dict]:
+    """Merges per-goal events into one schedule sorted by start time, dropping exact duplicates."""
+    merged, seen = [], set()
+    for events in plans.values():
+        for event in events:
+            key = (event.get("summary"), json.dumps(event.get("start"), sort_keys=True))
+            if key not in seen:
+                seen.add(key)
+                merged.append(event)
+
+    def start_of(event):
+        try:
+            return event_time_to_epoch(event["start"])
+        except (KeyError, TypeError, ValueError):
+            return float("inf")
+
+    return sorted(merged, key=start_of)
+
+
+def plan_goals(goals: Optional[List[str]] = None, llm_config=None, llm_cache=None,
+               max_workers: int = GOAL_PLANNING_MAX_WORKERS, research: bool = True,
+               on_goal_planned: Optional[Callable[[str, List[Dict]], None]] = None,
+               existing_events: Optional[List[Dict]] = None, tracer: Optional[Tracer] = None) -> Dict:
+    """
+    Plans all goals in parallel, merges them into one schedule and runs a single
+    conflict pass over the result.
+
+    Parameters:
+    - goals: list[str] → goals to plan (default: goals.txt via get_goals)
+    - llm_config → model config for the per-goal planning calls
+    - on_goal_planned: callable → called with (goal, events) as soon as each goal finishes
+    - existing_events: list → calendar events to check against (default: fetched from the calendar)
+
+    Returns:
+    - dict with "plans" (events per goal), "events" (merged schedule) and
+      "conflicts" (find_conflicts output for the merged schedule; if the calendar
+      could not be read it is empty and carries an "error" instead)
+    """
+    goals = get_goals() if goals is None else goals
+    plans = {}
+    for goal, events in iter_goal_plans(goals, llm_config, llm_cache, max_workers, research, tracer):
+        plans[goal] = events
+        if on_goal_planned is not None:
+            on_goal_planned(goal, events)
+    events = merge_goal_events(plans)
+    conflicts = {"conflicts": [], "near_misses": []}
+    if events:
+        try:
+            conflicts = find_conflicts(events, existing_events)
+        except Exception as e:  # keep the plans even when the calendar cannot be read
+            print(f"⚠️ Conflict check failed, returning plans unchecked: {e}")
+            conflicts["error"] = f"❌ Conflict check failed: {e}"
+    return {"plans": plans, "events": events, "conflicts": conflicts}
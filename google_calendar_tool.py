@@ -1,131 +1,476 @@
 import os
-from typing import Optional
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from dotenv import load_dotenv
-load_dotenv()  # Load environment variables from .env
+import json
+import time
+import threading
+from typing import TYPE_CHECKING, Optional
+from calendar_mirror import get_calendar_mirror
+from recurrence import RECURRENCE_HORIZON_DAYS, expand_event, normalize_recurrence, occurrence_starts
+from tracing import get_tracer
+from user_context import get_setting, user_key
+from utils import DEFAULT_TIME_ZONE, epoch_to_iso, to_epoch
+
+# The Google client libraries are imported on first use, not at import time,
+# so the interpreter and the servers start without paying for them.
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+DISCOVERY_CACHE_FILE = os.getenv("CALENDAR_DISCOVERY_CACHE", "calendar_discovery.json")
+CALENDAR_BATCH_LIMIT = 50  # maximum calls per Calendar API batch request
+MIRROR_SYNC_INTERVAL = float(os.getenv("CALENDAR_MIRROR_SYNC_INTERVAL", "30"))  # seconds between incremental syncs
+# Partial response for mirror syncs: attendees, reminders, conference data etc. never come over the wire
+SYNC_FIELDS = ("items(id,status,summary,description,location,start,end,recurringEventId,htmlLink),"
+               "nextPageToken,nextSyncToken")
+EVENT_FIELDS = ("id", "summary", "start", "end", "location", "recurringEventId")  # returned by get_calendar_events
+FREEBUSY_CALENDAR_LIMIT = 50  # calendars per FreeBusy request
+
+_credentials = {}  # user key (None in single-user mode) -> Credentials
+_credentials_lock = threading.Lock()
+_discovery_document = None
+_discovery_lock = threading.Lock()
+_thread_local = threading.local()  # httplib2.Http is not thread-safe, so each thread gets its own services
+_service_override = None
+
+
+def _new_credentials() -> "Credentials":
+    from google.oauth2.credentials import Credentials
+    return Credentials(
+        None,  # access token is automatically refreshed
+        refresh_token=get_setting("GOOGLE_REFRESH_TOKEN"),
+        client_id=get_setting("GOOGLE_CLIENT_ID"),
+        client_secret=get_setting("GOOGLE_CLIENT_SECRET"),
+        token_uri="https://oauth2.googleapis.com/token"
+    )
+
+
+def get_credentials() -> "Credentials":
+    """
+    Returns the current user's OAuth credentials (shared by all threads),
+    refreshing the access token only when it is missing or expired.
+    """
+    from google.auth.transport.requests import Request
+    key = user_key()
+    with _credentials_lock:
+        credentials = _credentials.get(key)
+        if credentials is None:
+            credentials = _credentials[key] = _new_credentials()
+        if not credentials.valid:
+            credentials.refresh(Request())
+        return credentials
+
+
+def _get_discovery_document() -> dict:
+    """
+    Loads the Calendar v3 discovery document from the local cache file,
+    building it once from the client library's bundled copy if missing.
+    """
+    global _discovery_document
+    with _discovery_lock:
+        if _discovery_document is not None:
+            return _discovery_document
+        if os.path.exists(DISCOVERY_CACHE_FILE):
+            with open(DISCOVERY_CACHE_FILE, "r", encoding="utf-8") as f:
+                _discovery_document = json.load(f)
+            return _discovery_document
+        import httplib2
+        from googleapiclient.discovery import build
+        service = build("calendar", "v3", http=httplib2.Http(), static_discovery=True)
+        _discovery_document = service._rootDesc
+        try:
+            with open(DISCOVERY_CACHE_FILE, "w", encoding="utf-8") as f:
+                json.dump(_discovery_document, f)
+        except OSError as e:
+            print(f"⚠️ Could not cache calendar discovery document: {e}")
+        return _discovery_document
+
+
+def set_calendar_service(service):
+    """
+    Routes every calendar call to `service` (e.g. an offline stand-in used by the
+    benchmarks). Pass None to go back to the real Calendar API.
+    """
+    global _service_override
+    _service_override = service
+
+
+def get_calendar_service():
+    """
+    Returns a Calendar API service for the current thread and user.
+
+    The service is built once per thread and user from the cached discovery
+    document and talks over a keep-alive connection authorized with that
+    user's credentials.
+    """
+    if _service_override is not None:
+        return _service_override
+    services = getattr(_thread_local, "services", None)
+    if services is None:
+        services = _thread_local.services = {}
+    key = user_key()
+    service = services.get(key)
+    if service is None:
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build_from_document
+        http = AuthorizedHttp(get_credentials(), http=get_tracer().instrument_httplib2(httplib2.Http()))
+        service = build_from_document(_get_discovery_document(), http=http)
+        services[key] = service
+    else:
+        get_credentials()  # refresh the user's token before it expires mid-request
+    return service
+def _event_body(summary, description, location, start, end, recurrence=None) -> dict:
+    """
+    Builds an insert body. Recurring events get a normalized recurrence list and an
+    explicit timeZone on start/end, which the Calendar API requires for them.
+    Raises ValueError for a recurrence rule we cannot expand locally or that
+    produces no occurrence within RECURRENCE_HORIZON_DAYS.
+    """
+    body = {
+        "summary": summary,
+        "description": description,
+        "location": location,
+        "start": start,
+        "end": end
+    }
+    recurrence = normalize_recurrence(recurrence)
+    if recurrence:
+        if not isinstance(start, dict) or not isinstance(end, dict):
+            raise ValueError("recurring events need start and end objects")
+        body["recurrence"] = recurrence
+        body["start"] = {"timeZone": DEFAULT_TIME_ZONE, **start}
+        body["end"] = {"timeZone": body["start"]["timeZone"], **end}
+        try:
+            occurs = occurrence_starts(body)
+        except (KeyError, OverflowError) as e:
+            raise ValueError(f"unusable recurring event: {e}")
+        if not occurs:
+            raise ValueError(f"recurrence {recurrence} has no occurrence in the next {RECURRENCE_HORIZON_DAYS} days")
+    return body
+
+
+def _mirror_inserted(calendar_id: str, event: dict):
+    """Adds an inserted event to the mirror; a recurring series is stored as its expanded instances."""
+    get_calendar_mirror().apply_changes(calendar_id, expand_event(event))
+
+
 def send_event_to_google_calendar(
     summary: str,
     description: str,  # <-- new field
     location: str,
     start: dict,
-    end: dict
+    end: dict,
+    recurrence: Optional[list[str]] = None
 ):
 
     """
     Creates a Google Calendar event using OAuth credentials and refresh token.
+    A repeating event is created once, as a recurring series.
 
     Parameters:
     - summary: str → Event title
     - description: str → Event description
     - location: str → Event location
     - start: dict → {"dateTime": "YYYY-MM-DDTHH:MM:SS", "timeZone": "Your/Timezone"}
-    - end: dict → Same format as start
+    - end: dict → Same format as start (the end of the first occurrence)
+    - recurrence: list[str] → optional RFC 5545 rules, e.g. ["RRULE:FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=12"]
 
     Returns:
     - Success/failure message with Google Calendar event link
     """
-    # print(os.getenv("GOOGLE_REFRESH_TOKEN"))
-    # print(os.getenv("GOOGLE_CLIENT_ID"))
-    # print(os.getenv("GOOGLE_CLIENT_SECRET"))
-    # print("https://oauth2.googleapis.com/token")
-    creds = Credentials(
-        None,  # access token is automatically refreshed
-        refresh_token=os.getenv("GOOGLE_REFRESH_TOKEN"),
-        client_id=os.getenv("GOOGLE_CLIENT_ID"),
-        client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-        token_uri="https://oauth2.googleapis.com/token"
-    )
-
     try:
-        service = build("calendar", "v3", credentials=creds)
-
-        event_body = {
-            "summary": summary,
-            "description": description,
-            "location": location,
-            "start": start,
-            "end": end
-        }
+        event_body = _event_body(summary, description, location, start, end, recurrence)
+    except ValueError as e:
+        return f"❌ Invalid recurrence: {str(e)}"
+    try:
+        service = get_calendar_service()
 
         event_result = service.events().insert(
             calendarId="primary",
             body=event_body
         ).execute()
+        _mirror_inserted("primary", event_result)
 
+        if event_result.get("recurrence"):
+            return f"✅ Success! Recurring event created (ID {event_result.get('id')}): {event_result.get('htmlLink')}"
         return f"✅ Success! Event created: {event_result.get('htmlLink')}"
 
     except Exception as e:
         return f"❌ Failed to create Google Calendar event: {str(e)}"
 
+def sync_calendar_mirror(calendar_id: str = "primary", force: bool = False):
+    """
+    Brings the local calendar mirror up to date using the Calendar API's
+    incremental sync tokens. Only changes since the last sync are downloaded,
+    every page is followed, and only the SYNC_FIELDS properties are requested.
+    A full sync happens on first use or when Google expires the token (410 Gone).
+
+    Parameters:
+    - calendar_id: str → the calendar to sync (default "primary")
+    - force: bool → sync even if the last sync is newer than MIRROR_SYNC_INTERVAL
+    """
+    mirror = get_calendar_mirror()
+    state = mirror.get_sync_state(calendar_id)
+    if not force and state["synced_at"] and time.time() - state["synced_at"] < MIRROR_SYNC_INTERVAL:
+        return
+
+    from googleapiclient.errors import HttpError
+    service = get_calendar_service()
+    sync_token = state["sync_token"]
+    if sync_token is None:
+        mirror.reset(calendar_id)
+    page_token = None
+    while True:
+        params = {"calendarId": calendar_id, "singleEvents": True, "maxResults": 2500, "pageToken": page_token}
+        if SYNC_FIELDS:
+            params["fields"] = SYNC_FIELDS
+        if sync_token:
+            params["syncToken"] = sync_token
+        try:
+            events_result = service.events().list(**params).execute()
+        except HttpError as e:
+            if e.resp.status == 410 and sync_token:  # sync token expired, start over
+                mirror.reset(calendar_id)
+                sync_token, page_token = None, None
+                continue
+            raise
+        mirror.apply_changes(calendar_id, events_result.get("items", []))
+        page_token = events_result.get("nextPageToken")
+        if not page_token:
+            mirror.set_sync_token(calendar_id, events_result.get("nextSyncToken"))
+            return
+
 def get_calendar_events(
     calendar_id: str = "primary",
     time_min: Optional[str] = None,       # RFC3339 timestamp, e.g. "2025-09-20T00:00:00-07:00"
     time_max: Optional[str] = None,       # RFC3339 timestamp
     query: Optional[str] = None,          # Keyword to search in summary/description
-    max_results: int = 10 
+    max_results: int = 250,
+    fields: Optional[list[str]] = None    # Event properties to return
 ):
     """
     Lists events from a Google Calendar with optional filters.
+    Answers from the local calendar mirror, which is incrementally synced first.
+    To only check when the calendar is busy, get_busy_intervals is cheaper.
 
     Parameters:
     - calendar_id: str → the calendar to query (default "primary")
     - time_min: str → RFC3339 timestamp, e.g., "2025-09-20T00:00:00-07:00"
     - time_max: str → RFC3339 timestamp
     - query: str → keyword to search in summary/description
-    - max_results: int → maximum number of events to return
+    - max_results: int → maximum number of events to return (0 for no limit)
+    - fields: list[str] → properties to return per event (default id, summary, start, end,
+      location, recurringEventId); ["*"] returns everything stored, e.g. description
 
     Returns:
     - List of matching events
     """
-    
-    creds = Credentials(
-        None,
-        refresh_token=os.getenv("GOOGLE_REFRESH_TOKEN"),
-        client_id=os.getenv("GOOGLE_CLIENT_ID"),
-        client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-        token_uri="https://oauth2.googleapis.com/token"
-    )
+    try:
+        sync_calendar_mirror(calendar_id)
+    except Exception as e:
+        if get_calendar_mirror().get_sync_state(calendar_id)["synced_at"] is None:
+            raise
+        print(f"⚠️ Calendar sync failed, answering from the local mirror: {e}")
+
+    events = get_calendar_mirror().query(calendar_id, time_min, time_max, query, max_results)
+    fields = fields or EVENT_FIELDS
+    if "*" in fields:
+        return events
+    return [{key: event[key] for key in fields if key in event} for event in events]
+
 
-    service = build("calendar", "v3", credentials=creds)
+def _merge_intervals(intervals: list[tuple]) -> list[tuple]:
+    """Unions overlapping or touching (start, end) epoch intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
 
-    events_result = service.events().list(
-        calendarId=calendar_id,
-        timeMin=time_min,
-        timeMax=time_max,
-        q=query,
-        maxResults=max_results,
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
 
-    events = events_result.get("items", [])
-    return events
+def get_busy_intervals(
+    calendars: Optional[list[str]] = None,
+    time_min: Optional[str] = None,
+    time_max: Optional[str] = None,
+):
+    """
+    Returns when one or more calendars are busy, using the FreeBusy endpoint:
+    one request covers up to 50 calendars, and only start/end times come back
+    (no titles or details), so it is the cheapest way to check wide windows.
+
+    Parameters:
+    - calendars: list[str] → calendar IDs (default ["primary"])
+    - time_min: str → RFC3339 start of the window (default now)
+    - time_max: str → RFC3339 end of the window (default 30 days after time_min)
+
+    Returns:
+    - {"busy": [{"start", "end"}] merged across all calendars and sorted,
+       "calendars": {calendar_id: [{"start", "end"}]}, "errors": {calendar_id: reason}}
+    """
+    calendars = list(dict.fromkeys(calendars or ["primary"]))
+    try:
+        window_start = to_epoch(time_min) if time_min else time.time()
+        window_end = to_epoch(time_max) if time_max else window_start + 30 * 86400
+    except ValueError as e:
+        return f"❌ Invalid time window: {str(e)}"
+
+    per_calendar, errors, everything = {}, {}, []
+    try:
+        service = get_calendar_service()
+        for offset in range(0, len(calendars), FREEBUSY_CALENDAR_LIMIT):
+            chunk = calendars[offset:offset + FREEBUSY_CALENDAR_LIMIT]
+            response = service.freebusy().query(body={
+                "timeMin": epoch_to_iso(window_start, "UTC"),
+                "timeMax": epoch_to_iso(window_end, "UTC"),
+                "items": [{"id": calendar_id} for calendar_id in chunk],
+            }).execute()
+            for calendar_id, info in response.get("calendars", {}).items():
+                if info.get("errors"):
+                    errors[calendar_id] = ", ".join(e.get("reason", "unknown") for e in info["errors"])
+                intervals = [(to_epoch(b["start"]), to_epoch(b["end"])) for b in info.get("busy", [])]
+                everything.extend(intervals)
+                per_calendar[calendar_id] = [
+                    {"start": epoch_to_iso(start), "end": epoch_to_iso(end)} for start, end in _merge_intervals(intervals)
+                ]
+    except Exception as e:
+        return f"❌ Failed to query free/busy: {str(e)}"
+
+    return {
+        "busy": [{"start": epoch_to_iso(start), "end": epoch_to_iso(end)} for start, end in _merge_intervals(everything)],
+        "calendars": per_calendar,
+        "errors": errors,
+    }
 
 def delete_event_from_google_calendar(event_id: str, calendar_id :str = "primary"):
     """
-    Deletes a Google Calendar event by event ID.
+    Deletes a Google Calendar event by event ID. Deleting a recurring event's ID
+    removes the whole series.
 
     Parameters:
-    - event_id: str → The unique ID of the event to delete
+    - event_id: str → The unique ID of the event (or recurring series) to delete
     - calendar_id: str → The calendar ID (default is 'primary')
 
     Returns:
     - Success/failure message
     """
+    try:
+        service = get_calendar_service()
+        service.events().delete(calendarId=calendar_id, eventId=event_id).execute()
+        get_calendar_mirror().remove_event(calendar_id, event_id)
+        return f"✅ Success! Event {event_id} deleted."
 
-    creds = Credentials(
-        None,  # access token auto-refreshed
-        refresh_token=os.getenv("GOOGLE_REFRESH_TOKEN"),
-        client_id=os.getenv("GOOGLE_CLIENT_ID"),
-        client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-        token_uri="https://oauth2.googleapis.com/token"
-    )
+    except Exception as e:
+        return f"❌ Failed to delete event {event_id}: {str(e)}"
+
+
+def _execute_in_batches(service, items, make_request, describe):
+    """
+    Runs one API request per item using multipart batch requests of up to
+    CALENDAR_BATCH_LIMIT calls each. Returns one result message per item, in order.
+    """
+    results = [None] * len(items)
+
+    def callback(request_id, response, exception):
+        index = int(request_id)
+        results[index] = describe(items[index], response, exception)
+
+    for offset in range(0, len(items), CALENDAR_BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=callback)
+        for index in range(offset, min(offset + CALENDAR_BATCH_LIMIT, len(items))):
+            batch.add(make_request(items[index]), request_id=str(index))
+        batch.execute()
+    return results
+
+
+def send_events_batch(events: list[dict], calendar_id: str = "primary") -> list[str]:
+    """
+    Creates several Google Calendar events with batch requests
+    (up to 50 events per HTTP request).
+
+    Parameters:
+    - events: list[dict] → events, each with summary, description, location, start, end
+      and optionally recurrence, in the same format as send_event_to_google_calendar
+    - calendar_id: str → The calendar ID (default is 'primary')
+
+    Returns:
+    - One success/failure message per event, in the same order as `events`
+    """
+    bodies, invalid = {}, {}  # event index -> insert body / error message
+    for index, event in enumerate(events):
+        try:
+            bodies[index] = _event_body(event.get("summary"), event.get("description"), event.get("location"),
+                                        event.get("start"), event.get("end"), event.get("recurrence"))
+        except ValueError as e:
+            invalid[index] = f"❌ Invalid recurrence for '{event.get('summary')}': {str(e)}"
+    valid = list(bodies)
+
+    def make_request(index):
+        return service.events().insert(calendarId=calendar_id, body=bodies[index])
+
+    def describe(index, response, exception):
+        if exception is not None:
+            return f"❌ Failed to create Google Calendar event '{events[index].get('summary')}': {str(exception)}"
+        _mirror_inserted(calendar_id, response)
+        if response.get("recurrence"):
+            return f"✅ Success! Recurring event created (ID {response.get('id')}): {response.get('htmlLink')}"
+        return f"✅ Success! Event created: {response.get('htmlLink')}"
 
     try:
-        service = build("calendar", "v3", credentials=creds)
-        service.events().delete(calendarId=calendar_id, eventId=event_id).execute()
+        service = get_calendar_service()
+        results = _execute_in_batches(service, valid, make_request, describe) if valid else []
+    except Exception as e:
+        return [f"❌ Failed to create Google Calendar events: {str(e)}"]
+    by_index = dict(zip(valid, results))
+    by_index.update(invalid)
+    return [by_index[i] for i in range(len(events))]
+
+
+def delete_events_batch(event_ids: list[str], calendar_id: str = "primary") -> list[str]:
+    """
+    Deletes several Google Calendar events with batch requests
+    (up to 50 events per HTTP request).
+
+    Parameters:
+    - event_ids: list[str] → The unique IDs of the events to delete
+    - calendar_id: str → The calendar ID (default is 'primary')
+
+    Returns:
+    - One success/failure message per event ID, in the same order as `event_ids`
+    """
+    def make_request(event_id):
+        return service.events().delete(calendarId=calendar_id, eventId=event_id)
+
+    def describe(event_id, response, exception):
+        if exception is not None:
+            return f"❌ Failed to delete event {event_id}: {str(exception)}"
+        get_calendar_mirror().remove_event(calendar_id, event_id)
         return f"✅ Success! Event {event_id} deleted."
 
+    try:
+        service = get_calendar_service()
+        return _execute_in_batches(service, event_ids, make_request, describe)
     except Exception as e:
-        return f"❌ Failed to delete event {event_id}: {str(e)}"
\ No newline at end of file
+        return [f"❌ Failed to delete events: {str(e)}"]
+
+
+def benchmark_calendar_client(calls: int = 10):
+    """
+    Compares per-call latency of rebuilding credentials and the service on
+    every call against the shared client. Requires real Google credentials.
+    """
+    def timed(make_service):
+        timings = []
+        for _ in range(calls):
+            started = time.perf_counter()
+            make_service().events().list(calendarId="primary", maxResults=1).execute()
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    def per_call_service():
+        from googleapiclient.discovery import build
+        return build("calendar", "v3", credentials=_new_credentials())
+
+    for label, make_service in (("rebuild per call", per_call_service), ("shared client", get_calendar_service)):
+        timings = timed(make_service)
+        print(f"{label}: avg {sum(timings) / len(timings) * 1000:.0f} ms, "
+              f"first {timings[0] * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms over {calls} calls")
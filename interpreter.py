@@ -1,18 +1,52 @@
 
-from typing import Any
-from autogen import ConversableAgent
+from typing import Any, Optional
+from autogen import Agent, ChatResult, ConversableAgent, GroupChatManager
 from autogen.agentchat import initiate_group_chat
 from autogen.agentchat.group.patterns import RoundRobinPattern, AutoPattern
 
-from google_calendar_tool import send_event_to_google_calendar, get_calendar_events, delete_event_from_google_calendar
+from google_calendar_tool import (
+    send_event_to_google_calendar,
+    get_calendar_events,
+    get_busy_intervals,
+    delete_event_from_google_calendar,
+    send_events_batch,
+    delete_events_batch,
+)
 from webhook_tool import send_event_to_webhook
 from utils import get_goals, get_todays_date
 from canvas_api import get_future_assignments
-from research_bot import research_online
+from research_bot import research_online, research_many
+from conflicts import find_conflicts
+from slot_finder import find_slots
+from llm_cache import LLMCache
+from fast_path import extract_event, FAST_PATH_THRESHOLD
+from tracing import Tracer, get_tracer
+from pipeline import PipelineSelector, make_pipeline_groupchat
+from context_compaction import ContextCompactor, CONTEXT_MAX_TOKENS
+from approval import ApprovalPolicy
+from user_context import current_user
+import goal_planning
 
 from collections import deque
 class Interpreter:
-    def __init__(self, llm_config):
+    def __init__(self, llm_config, llm_cache: Optional[LLMCache] = None,
+                 fast_path_threshold: Optional[float] = FAST_PATH_THRESHOLD,
+                 tracer: Optional[Tracer] = None, pattern: str = "auto",
+                 context_max_tokens: Optional[int] = CONTEXT_MAX_TOKENS,
+                 headless: bool = False, approval: Optional[dict] = None):
+        if pattern not in ("auto", "pipeline"):
+            raise ValueError(f"Unknown pattern {pattern!r}; expected 'auto' or 'pipeline'")
+        self.tracer = tracer or get_tracer()
+        self.llm_config = llm_config
+        traced = self.tracer.trace_tool
+
+        # Headless (service) mode: nobody is at stdin, so an approval policy answers
+        # for the human agent and reviews every calendar write. `approval` holds
+        # ApprovalPolicy settings (max_events, allow_deletes, max_replies, auto_approve).
+        self.headless = headless
+        self.approval = ApprovalPolicy(**(approval or {})) if headless else None
+        gated = self.approval.gate if self.approval else (lambda func, action, count=None: func)
+        self._insert_event = gated(send_event_to_google_calendar, "create")
         
         calendar_agent_message = """
             You are a smart scheduling agent that receives natural language about calendar events.
@@ -32,8 +66,18 @@ class Interpreter:
                 end: dict with keys:
                     - dateTime: str (ISO 8601 format)
                     - timeZone: str
+                recurrence: Optional[list[str]] (RFC 5545 rules for a repeating event,
+                    e.g. ["RRULE:FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=12"] or ["RRULE:FREQ=DAILY;UNTIL=20251231T235959Z"];
+                    start/end describe the first occurrence)
+
+            A repeating event (a habit, a weekly class, "every day at 11pm") is ONE event
+            with a recurrence, never one event per occurrence. To remove a whole series,
+            delete the series' event ID once.
             
             Then call the provided `send_event_to_webhook` function with this JSON. 
+            When you have more than one event to create, put all of them in a single
+            `send_events_batch` call instead of calling `send_event_to_google_calendar` per event.
+            Likewise use `delete_events_batch` to remove several events at once.
 
             When all events have been scheduled respond "all tasks complete"
         """
@@ -64,11 +108,19 @@ Your job is to convert these goals into a clear, concise list of schedulable eve
 
 For each goal:
 - Summarize it into a short event title, or multiple event titles
-- Suggest reasonable days and times of day (morning, afternoon, evening) or a specific time if obvious.  
+- Decide how many sessions it needs, how long each is, and the preferred time of day (morning, afternoon, evening).
+- Do not guess days and times yourself: call `find_slots` once with every block
+  (summary, duration_minutes, sessions, preferred, due_at for anything with a deadline such as an
+  assignment's due_at) and use the times it returns. It reads the calendar's busy times itself and
+  takes hard rules as constraints, e.g. {"day_end": "23:00"} for "bed by 11pm".
 - Suggest an estimated duration (default 1 hour if unclear).  
 - Add location if mentioned.  
 - Add any extra notes if relevant.  
 - assume pacific standard time unless otherwise implied
+- for repeating habits (e.g. "go to the gym", "bed by 11pm") write ONE line with the repetition
+  (e.g. "every Mon/Wed/Fri for 8 weeks", "daily") instead of one line per occurrence
+When you need research for several goals, call `research_many` once with all of them
+instead of calling `research_online` per goal.
 Output in plain text, one event per line, formatted like this:
 [Event Title] — [Day/Date] — [Time/Time of Day] — [Duration] — [Notes if any]  
 
@@ -83,7 +135,11 @@ You are a calendar conflict checker and priority evaluator.
 
 You will be given a list of events with their date, time, and duration.  
 Your job is to:
-1. Check if any events overlap or are too close together.  
+1. Check if any events overlap or are too close together. Always use `find_conflicts` for this
+   instead of comparing times yourself: pass the proposed events in calendar JSON format
+   and it returns the exact overlapping pairs and near-misses against the calendar.
+   To see when the user (or several calendars) is free over a wide window, use
+   `get_busy_intervals` rather than listing every event with `get_calendar_events`.
 2. Identify potential conflicts (e.g., two events at the same time).  
 3. Suggest which event should take priority based on common sense, urgency, and importance.  
    - Deadlines and exams are higher priority than flexible tasks.  
@@ -97,6 +153,11 @@ Output format:
 - Suggest a possible resolution schedule.  
 
 if schedule is ready to execute and clear beckon the calendar_agent
+"""
+        summarizer_message = """You are a smart scheduling assistant. Summarize the raw text you are given
+(emails, documents, assignments, notes) into a numbered list of clear, schedulable events.
+For each event give: Title, Date, Time (start and end if known, Pacific time unless stated), Location,
+and a short note. Do not invent events and do not use JSON; plain, human-readable text only.
 """
         #self.event_queue = deque()  # stores individual events
         def is_termination_msg(msg: dict[str, Any]) -> bool:
@@ -108,53 +169,176 @@ if schedule is ready to execute and clear beckon the calendar_agent
             name="calendar_agent",
             llm_config=llm_config,
             system_message=calendar_agent_message,
-            functions=[send_event_to_google_calendar, delete_event_from_google_calendar],
+            functions=[
+                traced(self._insert_event),
+                traced(gated(delete_event_from_google_calendar, "delete")),
+                traced(gated(send_events_batch, "create", lambda events, *args, **kwargs: len(events))),
+                traced(gated(delete_events_batch, "delete", lambda event_ids, *args, **kwargs: len(event_ids))),
+            ],
         )
         self.dataInterpreter = ConversableAgent(
             name="data_interpreter",
             llm_config=llm_config,
             system_message=text_interpreter_message,
-            functions=[get_todays_date, get_future_assignments],
+            functions=[traced(get_todays_date), traced(get_future_assignments)],
         )
         self.goal_planner = ConversableAgent(
             name="goal_planner",
             llm_config=llm_config,
             system_message=goal_planner_message,
-            functions=[get_goals, research_online],
+            functions=[traced(get_goals), traced(research_online), traced(research_many), traced(find_slots)],
         )
         self.schedule_checker = ConversableAgent(
             name="schedule_checker",
             llm_config=llm_config,
             system_message=schedule_checker_message,
-            functions=[get_calendar_events],
+            functions=[traced(get_calendar_events), traced(get_busy_intervals), traced(find_conflicts)],
         )
         
+        # Tool-free agent for the "summarize, then confirm" flow (one model call, no group chat)
+        self.summarizer = ConversableAgent(
+            name="summarizer",
+            llm_config=llm_config,
+            system_message=summarizer_message,
+            human_input_mode="NEVER",
+        )
+
         # Human agent (for oversight / interactive debugging)
         self.human = ConversableAgent(
             name="human",
-            human_input_mode="ALWAYS",
+            human_input_mode="NEVER" if headless else "ALWAYS",
         )
-        
-        self.pattern = AutoPattern(
-            initial_agent=self.dataInterpreter,
-            agents=[self.calendar_bot, self.dataInterpreter, self.schedule_checker, self.goal_planner],
-            user_agent=self.human,
-            group_manager_args={
-                "llm_config": llm_config,
-                "is_termination_msg": is_termination_msg,
-            },
+        if self.approval is not None:
+            self.human.register_reply([Agent, None], self.approval.human_reply, position=0)
+
+        # Opt-in response cache: replays identical model requests from disk
+        self.llm_cache = llm_cache
+        # Per-agent history windows, compacted tool results and a per-turn token budget (None disables)
+        self.context = ContextCompactor(max_tokens=context_max_tokens, tracer=self.tracer) if context_max_tokens else None
+        for agent in (self.calendar_bot, self.dataInterpreter, self.goal_planner, self.schedule_checker, self.summarizer):
+            agent.client_cache = llm_cache
+            self.tracer.instrument_agent(agent)
+            if self.context is not None:
+                self.context.add_to_agent(agent)
+
+        # Well-formed single events skip the group chat entirely (None disables the fast path)
+        self.fast_path_threshold = fast_path_threshold
+        self.fast_path_stats = {"attempts": 0, "taken": 0, "low_confidence": 0, "conflicts": 0, "errors": 0}
+
+        # "auto": the group manager's LLM picks every speaker.
+        # "pipeline": fixed handoff rules, with the LLM only picking in unexpected states.
+        self.pattern_name = pattern
+        self.selector = None
+        if pattern == "pipeline":
+            self.selector = PipelineSelector()
+            self.groupchat = make_pipeline_groupchat(
+                [self.human, self.dataInterpreter, self.goal_planner, self.schedule_checker, self.calendar_bot],
+                self.selector,
+            )
+            self.manager = GroupChatManager(
+                groupchat=self.groupchat,
+                llm_config=llm_config,
+                is_termination_msg=is_termination_msg,
+            )
+            self.pattern = None
+        else:
+            self.pattern = AutoPattern(
+                initial_agent=self.dataInterpreter,
+                agents=[self.calendar_bot, self.dataInterpreter, self.schedule_checker, self.goal_planner],
+                user_agent=self.human,
+                group_manager_args={
+                    "llm_config": llm_config,
+                    "is_termination_msg": is_termination_msg,
+                },
+            )
+
+
+    def reset(self):
+        """Clear every agent's conversation state so the next run starts fresh."""
+        for agent in (self.calendar_bot, self.dataInterpreter, self.goal_planner, self.schedule_checker,
+                      self.summarizer, self.human):
+            agent.reset()
+        if self.pattern_name == "pipeline":
+            self.groupchat.reset()
+            self.manager.reset()
+
+    def _try_fast_path(self, user_input: str) -> Optional[ChatResult]:
+        """
+        Parse the input deterministically and, when confident and conflict-free,
+        insert the event directly. Returns None to fall back to the agents.
+        """
+        self.fast_path_stats["attempts"] += 1
+        extraction = extract_event(user_input)
+        if extraction["event"] is None or extraction["confidence"] < self.fast_path_threshold:
+            self.fast_path_stats["low_confidence"] += 1
+            return None
+        event = extraction["event"]
+        try:
+            if find_conflicts([event])["conflicts"]:
+                self.fast_path_stats["conflicts"] += 1  # let schedule_checker weigh priorities
+                return None
+            message = self._insert_event(**event)
+        except Exception as e:
+            print(f"⚠️ Fast path failed, falling back to agents: {e}")
+            self.fast_path_stats["errors"] += 1
+            return None
+        if not message.startswith("✅"):
+            self.fast_path_stats["errors"] += 1
+            return None
+        self.fast_path_stats["taken"] += 1
+        return ChatResult(
+            chat_history=[
+                {"role": "user", "name": "human", "content": user_input},
+                {"role": "assistant", "name": "fast_path", "content": message},
+            ],
+            summary=message,
         )
-        
+
+    def summarize(self, raw_text: str) -> str:
+        """
+        Turns raw text into a plain-text list of schedulable events for the user to
+        confirm, without touching any calendar. Costs a single model call.
+        """
+        with self.tracer.run("summarize", request_bytes=len(raw_text)):
+            reply = self.summarizer.generate_reply(messages=[{"role": "user", "content": raw_text}])
+        if isinstance(reply, dict):
+            reply = reply.get("content")
+        return reply or ""
+
+    def plan_goals(self, goals: Optional[list[str]] = None, on_goal_planned=None, research: bool = True) -> dict:
+        """
+        Plans each goal (default: goals.txt) in its own parallel sub-run instead of one
+        serial goal_planner conversation, then merges and conflict-checks the result.
+        `on_goal_planned(goal, events)` is called as each goal finishes.
+        """
+        with self.tracer.run("plan_goals"):
+            return goal_planning.plan_goals(
+                goals, self.llm_config, llm_cache=self.llm_cache, research=research,
+                on_goal_planned=on_goal_planned, tracer=self.tracer,
+            )
 
     def interpret(self, user_input: str):
         """Run a single scheduling request through the LLM agents and return the result."""
-        task_prompt = f"User request: {user_input}\nCreate a structured calendar event JSON."
-        result, _, _ = initiate_group_chat(
-            pattern=self.pattern,
-            messages=task_prompt,
-            max_rounds=50
-        )
-        return result
+        with self.tracer.run("interpret", request_bytes=len(user_input)) as run:
+            if self.approval is not None:
+                self.approval.start_run(current_user())
+            if self.fast_path_threshold is not None:
+                with self.tracer.span("fast_path", "extract_and_insert"):
+                    fast_result = self._try_fast_path(user_input)
+                if fast_result is not None:
+                    run["path"] = "fast"
+                    return fast_result
+            run["path"] = "agents"
+            task_prompt = f"User request: {user_input}\nCreate a structured calendar event JSON."
+            if self.pattern_name == "pipeline":
+                self.groupchat.reset()
+                return self.human.initiate_chat(self.manager, message=task_prompt, max_turns=1)
+            result, _, _ = initiate_group_chat(
+                pattern=self.pattern,
+                messages=task_prompt,
+                max_rounds=50
+            )
+            return result
     # def enqueue_events(self, raw_events_text: str):
     #     """
     #     Convert raw text from goal planner or data interpreter into individual events
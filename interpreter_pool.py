@@ -0,0 +1,110 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Optional
+from interpreter import Interpreter
+from llm_cache import LLMCache
+
+INTERPRETER_POOL_SIZE = int(os.getenv("INTERPRETER_POOL_SIZE", "2"))
+
+
+class InterpreterPool:
+    """
+    A fixed-size pool of pre-built Interpreters.
+
+    Building an Interpreter constructs five agents and a group pattern, so
+    servers borrow a warm instance per request instead. Each instance is reset
+    on return, so no conversation history leaks between requests.
+
+    Extra keyword arguments (e.g. headless=True) are passed to every Interpreter.
+
+    Usage:
+        with pool.acquire() as agent:
+            result = agent.interpret(text)
+    """
+
+    def __init__(self, llm_config: dict, size: int = INTERPRETER_POOL_SIZE, prewarm: bool = True,
+                 llm_cache: Optional[LLMCache] = None, background: bool = False, **interpreter_kwargs):
+        self.llm_config = llm_config
+        self.llm_cache = llm_cache
+        self.interpreter_kwargs = interpreter_kwargs
+        self.size = max(1, size)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {"hits": 0, "waits": 0, "created": 0, "resets": 0, "reset_failures": 0}
+        if prewarm and background:
+            # Servers start immediately; requests that arrive first wait for (or build) an instance
+            threading.Thread(target=self._prewarm, name="interpreter-prewarm", daemon=True).start()
+        elif prewarm:
+            self._prewarm()
+
+    def _prewarm(self):
+        while True:
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            self._idle.put(self._build())
+
+    def _create(self) -> Interpreter:
+        self._count("created")
+        return Interpreter(llm_config=self.llm_config, llm_cache=self.llm_cache, **self.interpreter_kwargs)
+
+    def _build(self) -> Interpreter:
+        """Builds an instance for an already reserved slot, giving the slot back if the build fails."""
+        try:
+            return self._create()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _take(self, timeout: Optional[float]) -> Interpreter:
+        try:
+            interpreter = self._idle.get_nowait()
+            self._count("hits")
+            return interpreter
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1  # reserve the slot before building outside the lock
+        if can_create:
+            return self._build()
+        self._count("waits")
+        return self._idle.get(timeout=timeout)  # raises queue.Empty on timeout
+
+    def _release(self, interpreter: Interpreter):
+        try:
+            interpreter.reset()
+            self._count("resets")
+        except Exception as e:
+            # A half-reset instance must not serve another request; replace it
+            print(f"⚠️ Interpreter reset failed, rebuilding: {e}")
+            self._count("reset_failures")
+            interpreter = self._build()  # the broken instance's slot is reused
+        self._idle.put(interpreter)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        """Borrow an Interpreter, waiting up to `timeout` seconds if all are busy."""
+        interpreter = self._take(timeout)
+        try:
+            yield interpreter
+        finally:
+            self._release(interpreter)
+
+    def metrics(self) -> dict:
+        """Pool counters plus current size and idle count."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+        stats["idle"] = self._idle.qsize()
+        return stats
@@ -0,0 +1,191 @@
+import os
+import time
+import uuid
+import threading
+import contextvars
+from collections import Counter, OrderedDict, deque
+from typing import Callable, Optional
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+JOB_MAX_RUNNING_PER_USER = int(os.getenv("JOB_MAX_RUNNING_PER_USER", "2"))
+JOB_MAX_PENDING_PER_USER = int(os.getenv("JOB_MAX_PENDING_PER_USER", "20"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "600"))
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while JOB_MAX_PENDING jobs (or JOB_MAX_PENDING_PER_USER for its owner) are already waiting."""
+
+
+class ChunkBuffer:
+    """
+    Accumulates streamed text chunks per session ID until the final chunk arrives.
+    Sessions that stop sending for SESSION_IDLE_SECONDS are discarded.
+    """
+
+    def __init__(self, idle_seconds: float = SESSION_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def append(self, session_id: str, chunk: str) -> int:
+        """Adds a chunk and returns the number of characters buffered for the session."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            chunks, _ = self._sessions.get(session_id, ([], now))
+            chunks.append(chunk)
+            self._sessions[session_id] = (chunks, now)
+            return sum(len(c) for c in chunks)
+
+    def pop(self, session_id: str) -> str:
+        """Returns the full text for a session and forgets it."""
+        with self._lock:
+            chunks, _ = self._sessions.pop(session_id, ([], None))
+        return "".join(chunks)
+
+    def _expire(self, now: float):
+        for session_id in [s for s, (_, seen) in self._sessions.items() if now - seen > self.idle_seconds]:
+            del self._sessions[session_id]
+
+
+class JobQueue:
+    """
+    Runs submitted jobs on a bounded pool of background workers.
+
+    Callers get a job ID right away and poll or long-poll `wait` for the status
+    ("queued", "running", "done" or "failed") and the result.
+
+    Jobs are scheduled fairly between owners (e.g. user IDs): workers take the
+    next job from each owner with queued work in turn, and one owner never has
+    more than `max_running_per_owner` jobs running, so a user who submits a burst
+    cannot starve everyone else. Handlers run in the submitter's contextvars
+    context, so the submitting user's credentials (user_context) follow the job.
+    """
+
+    def __init__(self, handler: Callable[[str], object], max_workers: int = JOB_WORKERS,
+                 max_pending: int = JOB_MAX_PENDING, retention_seconds: float = JOB_RETENTION_SECONDS,
+                 max_running_per_owner: int = JOB_MAX_RUNNING_PER_USER,
+                 max_pending_per_owner: int = JOB_MAX_PENDING_PER_USER):
+        self.handler = handler
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.max_running_per_owner = max(1, max_running_per_owner)
+        self.max_pending_per_owner = max_pending_per_owner
+        self._jobs = {}
+        self._queued = OrderedDict()  # owner -> deque of (job_id, payload, context), in round-robin order
+        self._running = Counter()     # owner -> jobs running
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._work = threading.Condition(self._lock)
+        for i in range(max(1, max_workers)):
+            threading.Thread(target=self._worker, name=f"job-{i}", daemon=True).start()
+
+    def submit(self, payload: str, owner: Optional[str] = None) -> str:
+        """
+        Queues a job for `owner` and returns its ID. Raises QueueFullError if too
+        many jobs are waiting, overall or for this owner.
+        """
+        job_id = uuid.uuid4().hex
+        owner = "default" if owner is None else str(owner)
+        with self._lock:
+            self._expire(time.time())
+            pending = sum(len(jobs) for jobs in self._queued.values())
+            if pending >= self.max_pending:
+                raise QueueFullError(f"{pending} jobs already queued")
+            owner_pending = len(self._queued.get(owner, ()))
+            if self.max_pending_per_owner and owner_pending >= self.max_pending_per_owner:
+                raise QueueFullError(f"{owner_pending} jobs already queued for {owner}")
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "owner": owner,
+                "status": "queued",
+                "result": None,
+                "error": None,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            self._queued.setdefault(owner, deque()).append((job_id, payload, contextvars.copy_context()))
+            self._work.notify()
+        return job_id
+
+    def _next_job(self) -> Optional[tuple]:
+        """Pops the next job in round-robin owner order, skipping owners at their running limit."""
+        for owner in list(self._queued):
+            self._queued.move_to_end(owner)
+            if self._running[owner] >= self.max_running_per_owner:
+                continue
+            jobs = self._queued[owner]
+            job = jobs.popleft()
+            if not jobs:
+                del self._queued[owner]
+            self._running[owner] += 1
+            return owner, job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._work:
+                next_job = self._next_job()
+                while next_job is None:
+                    self._work.wait()
+                    next_job = self._next_job()
+            owner, (job_id, payload, context) = next_job
+            try:
+                context.run(self._run, job_id, payload)
+            finally:
+                with self._work:
+                    self._running[owner] -= 1
+                    if not self._running[owner]:
+                        del self._running[owner]
+                    self._work.notify()  # the owner may have queued jobs that were held back
+
+    def _run(self, job_id: str, payload: str):
+        self._update(job_id, status="running", started_at=time.time())
+        try:
+            result = self.handler(payload)
+            self._update(job_id, status="done", result=result, finished_at=time.time())
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+
+    def _update(self, job_id: str, **fields):
+        with self._changed:
+            self._jobs[job_id].update(fields)
+            self._changed.notify_all()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Returns a snapshot of the job, or None if it is unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait(self, job_id: str, timeout: float = 0) -> Optional[dict]:
+        """Long-polls up to `timeout` seconds for the job to finish, then returns its snapshot."""
+        deadline = time.time() + timeout
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] in ("done", "failed"):
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            return dict(job) if job else None
+
+    def _expire(self, now: float):
+        for job_id in [j for j, job in self._jobs.items()
+                       if job["finished_at"] and now - job["finished_at"] > self.retention_seconds]:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        """Number of known jobs by status, plus how many owners have work queued or running."""
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            counts["owners_waiting"] = len(self._queued)
+            counts["owners_running"] = len(self._running)
+        return counts
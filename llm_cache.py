@@ -0,0 +1,156 @@
+import os
+import copy
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Optional
+
+LLM_CACHE_FILE = os.getenv("LLM_CACHE_FILE", "llm_cache.db")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+
+# Responses that call these tools are never stored, so a replayed conversation
+# cannot silently repeat a calendar write or webhook delivery from cache.
+SIDE_EFFECT_TOOLS = {
+    "send_event_to_google_calendar",
+    "delete_event_from_google_calendar",
+    "send_events_batch",
+    "delete_events_batch",
+    "send_event_to_webhook",
+}
+
+
+def _called_tools(response: Any) -> set:
+    names = set()
+    for choice in getattr(response, "choices", None) or []:
+        message = getattr(choice, "message", None)
+        for call in getattr(message, "tool_calls", None) or []:
+            names.add(call.function.name)
+        function_call = getattr(message, "function_call", None)
+        if function_call is not None:
+            names.add(function_call.name)
+    return names
+
+
+class LLMCache:
+    """
+    Disk-backed, size-bounded LRU cache for model responses with a TTL.
+
+    Implements autogen's AbstractCache protocol and is attached to each agent's
+    client_cache. autogen keys every request on the model, messages (system
+    message and history included) and tool schema, so repeated or partially
+    repeated conversations replay from disk.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_FILE,
+        max_mb: float = LLM_CACHE_MAX_MB,
+        ttl_seconds: float = LLM_CACHE_TTL,
+        cache_side_effect_turns: bool = False,
+        side_effect_tools: Optional[set] = None,
+    ):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self.cache_side_effect_turns = cache_side_effect_turns
+        self.side_effect_tools = SIDE_EFFECT_TOOLS if side_effect_tools is None else side_effect_tools
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+            """
+        )
+        self._conn.commit()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "skipped_side_effects": 0, "evictions": 0, "expired": 0}
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        hashed = self._hash(key)
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (hashed,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (hashed,))
+                self._conn.commit()
+                self._stats["expired"] += 1
+                row = None
+            if row is None:
+                self._stats["misses"] += 1
+                return default
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, hashed))
+            self._conn.commit()
+            self._stats["hits"] += 1
+        return pickle.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        if not self.cache_side_effect_turns and _called_tools(value) & self.side_effect_tools:
+            with self._lock:
+                self._stats["skipped_side_effects"] += 1
+            return
+        stored = copy.copy(value)
+        if hasattr(stored, "message_retrieval_function"):
+            delattr(stored, "message_retrieval_function")  # bound to a live client, re-attached on hit
+        try:
+            blob = pickle.dumps(stored)
+        except Exception as e:
+            print(f"⚠️ Response not cacheable: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (self._hash(key), blob, len(blob), now, now),
+            )
+            self._stats["stores"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._stats["evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        """Hit/miss counters plus the current entry count and size on disk."""
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(entries=entries, bytes=size, hit_rate=stats["hits"] / lookups if lookups else 0.0)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # autogen enters the cache around every request; keep the connection open
+        # across requests and only close on an explicit close().
+        pass
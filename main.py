@@ -1,5 +1,9 @@
 import os
+from utils import load_environment
+load_environment()  # before anything below reads its settings
+
 from interpreter import Interpreter
+from llm_cache import LLMCache
 
 # Fake minimal LLM config (adapt to your provider: OpenAI, Claude, local, etc.)
 llm_config = {
@@ -11,17 +15,31 @@ llm_config = {
 
 def main():
     print("=== Calendar Scheduling Agent ===")
-    print("Type 'quit' to exit.\n")
+    print("Type 'goals' to plan goals.txt, 'quit' to exit.\n")
 
-    # Initialize Interpreter
-    agent = Interpreter(llm_config=llm_config)
+    # Initialize Interpreter (set LLM_CACHE=1 to replay repeated requests from disk)
+    llm_cache = LLMCache() if os.getenv("LLM_CACHE") else None
+    agent = Interpreter(llm_config=llm_config, llm_cache=llm_cache)
 
     while True:
         user_input = input("Describe your event: ")
 
         if user_input.lower() in ["quit", "exit"]:
+            if llm_cache:
+                print(f"LLM cache: {llm_cache.stats()}")
             print("Goodbye!")
             break
+        elif user_input.lower() in ["goals"]:
+            def show(goal, events):
+                print(f"\n🎯 {goal}")
+                for event in events:
+                    print(f"   - {event['summary']} ({event['start'].get('dateTime')})")
+
+            plan = agent.plan_goals(on_goal_planned=show)
+            print(f"\n{len(plan['events'])} events planned, {len(plan['conflicts']['conflicts'])} conflicts.\n")
+            if plan["conflicts"].get("error"):
+                print(f"{plan['conflicts']['error']} (events were not checked against the calendar)\n")
+            continue
         elif user_input.lower() in ["example"]:
             user_input = "soccer game september 24th 2025, from 3pm-5pm at UW IMA in Seattle, use google calendar."
 
@@ -35,6 +53,11 @@ def main():
         print("\n--- Result ---")
         print(result)
         print("--------------\n")
+        if agent.context is not None:
+            print("Prompt tokens per round (before -> after compaction):")
+            print(agent.context.report())
+            agent.context.reset()
+        agent.reset()
 
 
 if __name__ == "__main__":
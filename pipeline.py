@@ -0,0 +1,60 @@
+from typing import Optional, Union
+
+from autogen import Agent, GroupChat
+
+# Ordered handoff rules: speaker -> [(keyword in its reply, next speaker)].
+# An empty keyword is the default for that speaker; a speaker with no matching
+# rule falls back to LLM speaker selection.
+PIPELINE_TRANSITIONS = {
+    "human": [("", "data_interpreter")],
+    "data_interpreter": [("goal_planner", "goal_planner"), ("", "schedule_checker")],
+    "goal_planner": [("", "schedule_checker")],
+    "schedule_checker": [("calendar_agent", "calendar_agent"), ("no conflicts", "calendar_agent")],
+}
+
+
+class PipelineSelector:
+    """
+    Deterministic speaker selection for a classic GroupChat.
+
+    After a tool call or tool result the same agent keeps the floor, so it can run
+    its tool and then read the result. After a text reply the speaker's rules are
+    checked in order. Anything unexpected (unknown speaker, empty reply, no
+    matching rule) returns "auto" and the group manager's LLM picks instead.
+    """
+
+    def __init__(self, transitions: Optional[dict] = None):
+        self.transitions = transitions if transitions is not None else PIPELINE_TRANSITIONS
+        self.stats = {"rule": 0, "tool": 0, "fallback": 0}
+
+    def __call__(self, last_speaker: Agent, groupchat: GroupChat) -> Union[Agent, str]:
+        message = groupchat.messages[-1] if groupchat.messages else {}
+        if message.get("tool_calls") or message.get("function_call") or message.get("role") in ("tool", "function"):
+            self.stats["tool"] += 1
+            return last_speaker
+
+        content = (message.get("content") or "").lower() if isinstance(message.get("content"), str) else ""
+        for keyword, target in self.transitions.get(last_speaker.name, []):
+            if content and keyword.lower() in content:
+                self.stats["rule"] += 1
+                return groupchat.agent_by_name(target)
+
+        self.stats["fallback"] += 1
+        return "auto"
+
+
+def make_pipeline_groupchat(agents: list, selector: PipelineSelector, max_round: int = 50) -> GroupChat:
+    """
+    Builds a GroupChat driven by `selector`. Tools are registered for execution on the
+    agent that calls them, since a plain GroupChat has no separate tool executor.
+    """
+    for agent in agents:
+        for tool in getattr(agent, "tools", []):
+            if tool.name not in agent.function_map:
+                tool.register_for_execution(agent)
+    return GroupChat(
+        agents=agents,
+        messages=[],
+        max_round=max_round,
+        speaker_selection_method=selector,
+    )
@@ -0,0 +1,280 @@
+import os
+import calendar
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Union
+from zoneinfo import ZoneInfo
+from utils import DEFAULT_TIME_ZONE, parse_datetime
+
+# Recurring events without an end are expanded this far past their first occurrence
+RECURRENCE_HORIZON_DAYS = int(os.getenv("RECURRENCE_HORIZON_DAYS", "180"))
+MAX_OCCURRENCES = 2000  # hard cap per series, whatever the rule says
+
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+
+
+def normalize_recurrence(recurrence: Union[str, List[str], None]) -> Optional[List[str]]:
+    """
+    Cleans up a recurrence value from the model into the list of RFC 5545 lines
+    the Calendar API expects, e.g. "FREQ=WEEKLY;BYDAY=MO" -> ["RRULE:FREQ=WEEKLY;BYDAY=MO"].
+    Returns None for an empty value.
+    """
+    if not recurrence:
+        return None
+    lines = [recurrence] if isinstance(recurrence, str) else list(recurrence)
+    normalized = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if ":" not in line.split(";")[0] and line.upper().startswith("FREQ="):
+            line = f"RRULE:{line}"
+        normalized.append(line)
+    return normalized or None
+
+
+def parse_rrule(rule: str) -> Dict:
+    """
+    Parses an RRULE line ("RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;COUNT=10") into a dict.
+    Supports FREQ, INTERVAL, COUNT, UNTIL, BYDAY (with ordinals such as 1MO or -1FR for
+    monthly rules), BYMONTHDAY and BYMONTH. Raises ValueError for anything else.
+    """
+    if rule.upper().startswith("RRULE:"):
+        rule = rule[len("RRULE:"):]
+    parts = dict(part.split("=", 1) for part in rule.strip().split(";") if part)
+    parts = {k.upper(): v.upper() for k, v in parts.items()}
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Unsupported recurrence frequency: {freq}")
+    parsed = {"freq": freq, "interval": int(parts.pop("INTERVAL", 1)), "count": None, "until": None,
+              "byday": [], "bymonthday": [], "bymonth": []}
+    if "COUNT" in parts:
+        parsed["count"] = int(parts.pop("COUNT"))
+    if "UNTIL" in parts:
+        parsed["until"] = _parse_rfc5545_time(parts.pop("UNTIL"))
+    if "BYDAY" in parts:
+        for day in parts.pop("BYDAY").split(","):
+            ordinal, weekday = day[:-2], day[-2:]
+            if weekday not in WEEKDAYS:
+                raise ValueError(f"Unsupported BYDAY value: {day}")
+            ordinal = int(ordinal) if ordinal else None
+            if ordinal is not None and not 1 <= abs(ordinal) <= 53:
+                raise ValueError(f"Unsupported BYDAY value: {day}")
+            parsed["byday"].append((ordinal, WEEKDAYS[weekday]))
+    if "BYMONTHDAY" in parts:
+        parsed["bymonthday"] = [int(d) for d in parts.pop("BYMONTHDAY").split(",")]
+        if any(not 1 <= abs(d) <= 31 for d in parsed["bymonthday"]):
+            raise ValueError("BYMONTHDAY values must be between 1 and 31 (or -31 and -1)")
+    if "BYMONTH" in parts:
+        parsed["bymonth"] = [int(m) for m in parts.pop("BYMONTH").split(",")]
+        if any(not 1 <= m <= 12 for m in parsed["bymonth"]):
+            raise ValueError("BYMONTH values must be between 1 and 12")
+    if parsed["freq"] in ("DAILY", "WEEKLY") and any(ordinal is not None for ordinal, _ in parsed["byday"]):
+        raise ValueError(f"BYDAY ordinals are not allowed with FREQ={parsed['freq']}")
+    parts.pop("WKST", None)
+    if parts:
+        raise ValueError(f"Unsupported recurrence rule parts: {', '.join(sorted(parts))}")
+    if parsed["interval"] < 1:
+        raise ValueError("INTERVAL must be at least 1")
+    return parsed
+
+
+def _parse_rfc5545_time(value: str, time_zone: Optional[str] = None) -> float:
+    """UTC epoch seconds for an RFC 5545 DATE or DATE-TIME (20250101, 20250101T090000, ...Z)."""
+    value = value.strip()
+    if len(value) == 8:
+        parsed = datetime.strptime(value, "%Y%m%d")
+    else:
+        parsed = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return parsed.replace(tzinfo=timezone.utc).timestamp()
+    return parsed.replace(tzinfo=ZoneInfo(time_zone or DEFAULT_TIME_ZONE)).timestamp()
+
+
+def _exdates(lines: List[str], time_zone: str) -> set:
+    """Epoch seconds excluded by EXDATE lines (EXDATE;TZID=...:20250101T090000,...)."""
+    excluded = set()
+    for line in lines:
+        if not line.upper().startswith("EXDATE"):
+            continue
+        params, _, values = line.partition(":")
+        zone = time_zone
+        for param in params.split(";")[1:]:
+            if param.upper().startswith("TZID="):
+                zone = param.split("=", 1)[1]
+        excluded.update(_parse_rfc5545_time(v, zone) for v in values.split(",") if v)
+    return excluded
+
+
+def _month_days(year: int, month: int, rule: Dict, first: date) -> List[int]:
+    """
+    Days of a month matched by a MONTHLY/YEARLY rule, in order. With both BYMONTHDAY
+    and BYDAY, BYDAY filters the month days (e.g. Friday the 13th), as RFC 5545 says.
+    """
+    last_day = calendar.monthrange(year, month)[1]
+    month_days = set()
+    for day in rule["bymonthday"]:
+        day = day if day > 0 else last_day + day + 1
+        if 1 <= day <= last_day:
+            month_days.add(day)
+    weekday_days = set()
+    for ordinal, weekday in rule["byday"]:
+        matching = [d for d in range(1, last_day + 1) if date(year, month, d).weekday() == weekday]
+        if ordinal is None:
+            weekday_days.update(matching)
+        elif -len(matching) <= ordinal <= len(matching) and ordinal != 0:
+            weekday_days.add(matching[ordinal - 1 if ordinal > 0 else ordinal])
+    if rule["bymonthday"] and rule["byday"]:
+        days = month_days & weekday_days
+    else:
+        days = month_days | weekday_days
+    if not rule["bymonthday"] and not rule["byday"] and first.day <= last_day:
+        days.add(first.day)
+    return sorted(days)
+
+
+def _candidate_dates(rule: Dict, first: date, last: date) -> Iterator[date]:
+    """
+    Dates the rule produces from `first` to `last`, in order (before COUNT/UNTIL are
+    applied). The walk stops at `last` even when the rule matches nothing, e.g.
+    BYMONTH=2;BYMONTHDAY=30.
+    """
+    interval = rule["interval"]
+    if rule["freq"] == "DAILY":
+        weekdays = {weekday for _, weekday in rule["byday"]}  # BYDAY filters the days, e.g. weekdays only
+        day = first
+        while day <= last:
+            if (not rule["bymonth"] or day.month in rule["bymonth"]) and (not weekdays or day.weekday() in weekdays):
+                yield day
+            day += timedelta(days=interval)
+    elif rule["freq"] == "WEEKLY":
+        weekdays = sorted({weekday for _, weekday in rule["byday"]}) or [first.weekday()]
+        week_start = first - timedelta(days=first.weekday())
+        while week_start <= last:
+            for weekday in weekdays:
+                day = week_start + timedelta(days=weekday)
+                if first <= day <= last:
+                    yield day
+            week_start += timedelta(weeks=interval)
+    elif rule["freq"] == "MONTHLY":
+        year, month = first.year, first.month
+        while date(year, month, 1) <= last:
+            if not rule["bymonth"] or month in rule["bymonth"]:
+                for day in _month_days(year, month, rule, first):
+                    candidate = date(year, month, day)
+                    if first <= candidate <= last:
+                        yield candidate
+            month += interval
+            year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    else:  # YEARLY
+        year = first.year
+        while year <= last.year:
+            for month in rule["bymonth"] or [first.month]:
+                for day in _month_days(year, month, rule, first):
+                    candidate = date(year, month, day)
+                    if first <= candidate <= last:
+                        yield candidate
+            year += interval
+
+
+def occurrence_starts(event: Dict, window_start: Optional[float] = None,
+                      window_end: Optional[float] = None) -> List[float]:
+    """
+    Start times (UTC epoch seconds) of a recurring event's occurrences that begin
+    before `window_end` and end after `window_start`. Occurrences keep their local
+    wall-clock time across DST changes, like Google Calendar's own expansion.
+    Without `window_end` the series is expanded for RECURRENCE_HORIZON_DAYS.
+    """
+    lines = normalize_recurrence(event.get("recurrence")) or []
+    rules = [parse_rrule(line) for line in lines if line.upper().startswith("RRULE")]
+    start, end = event["start"], event["end"]
+    time_zone = start.get("timeZone") or DEFAULT_TIME_ZONE
+    zone = ZoneInfo(time_zone)
+    if start.get("dateTime"):
+        first = parse_datetime(start["dateTime"], time_zone).astimezone(zone)
+    else:
+        first = datetime.fromisoformat(start["date"]).replace(tzinfo=zone)
+    end_at = parse_datetime(end.get("dateTime") or end["date"], time_zone)
+    duration = end_at.timestamp() - first.timestamp()
+    if not rules:
+        return [first.timestamp()]
+
+    if window_end is None:
+        window_end = first.timestamp() + RECURRENCE_HORIZON_DAYS * 86400
+    window_start = float("-inf") if window_start is None else window_start
+    excluded = _exdates(lines, time_zone)
+    starts = set()
+    for rule in rules:
+        stop = window_end if rule["until"] is None else min(window_end, rule["until"])
+        last = datetime.fromtimestamp(stop, zone).date()
+        produced = 0
+        for day in _candidate_dates(rule, first.date(), last):
+            if produced >= MAX_OCCURRENCES:
+                break
+            occurrence = datetime(day.year, day.month, day.day, first.hour, first.minute, first.second, tzinfo=zone)
+            timestamp = occurrence.timestamp()
+            if rule["until"] is not None and timestamp > rule["until"]:
+                break
+            if rule["count"] is not None and produced >= rule["count"]:
+                break
+            produced += 1
+            if timestamp >= window_end:
+                break
+            if timestamp + duration > window_start and timestamp not in excluded:
+                starts.add(timestamp)
+    return sorted(starts)
+
+
+def expand_event(event: Dict, window_start: Optional[float] = None, window_end: Optional[float] = None) -> List[Dict]:
+    """
+    Expands a recurring event into single occurrences in the window (see
+    occurrence_starts), shaped like the instances the Calendar API returns for
+    singleEvents=true: no "recurrence", concrete start/end, "recurringEventId",
+    and IDs of the form <series id>_<UTC start>. Events without a recurrence are
+    returned unchanged, as a one-item list.
+    """
+    if not event.get("recurrence"):
+        return [event]
+    start, end = event["start"], event["end"]
+    time_zone = start.get("timeZone") or DEFAULT_TIME_ZONE
+    all_day = not start.get("dateTime")
+    duration = parse_datetime(end.get("dateTime") or end["date"], time_zone).timestamp() \
+        - parse_datetime(start.get("dateTime") or start["date"], time_zone).timestamp()
+    zone = ZoneInfo(time_zone)
+    instances = []
+    for timestamp in occurrence_starts(event, window_start, window_end):
+        begins = datetime.fromtimestamp(timestamp, tz=zone)
+        ends = datetime.fromtimestamp(timestamp + duration, tz=zone)
+        instance = {k: v for k, v in event.items() if k not in ("recurrence", "id", "htmlLink")}
+        if all_day:
+            instance["start"] = {"date": begins.date().isoformat()}
+            instance["end"] = {"date": ends.date().isoformat()}
+            suffix = begins.strftime("%Y%m%d")
+        else:
+            instance["start"] = {"dateTime": begins.isoformat(), "timeZone": time_zone}
+            instance["end"] = {"dateTime": ends.isoformat(), "timeZone": time_zone}
+            suffix = datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        if event.get("id"):
+            instance["id"] = f"{event['id']}_{suffix}"
+            instance["recurringEventId"] = event["id"]
+            instance["originalStartTime"] = dict(instance["start"])
+        instances.append(instance)
+    return instances
+
+
+def test_expand_event():
+    """Checks a weekday habit, a Friday-the-13th rule and a rule that matches no date."""
+    def event(rule):
+        return {"id": "habit", "recurrence": [rule],
+                "start": {"dateTime": "2030-03-04T07:00:00", "timeZone": DEFAULT_TIME_ZONE},
+                "end": {"dateTime": "2030-03-04T07:30:00", "timeZone": DEFAULT_TIME_ZONE}}
+
+    weekdays = expand_event(event("RRULE:FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR;COUNT=7"))
+    days = [datetime.fromisoformat(i["start"]["dateTime"]).date() for i in weekdays]
+    assert [d.weekday() for d in days] == [0, 1, 2, 3, 4, 0, 1], days  # Mon 2030-03-04 .. Tue 2030-03-12
+    two_years = datetime(2032, 3, 4, tzinfo=timezone.utc).timestamp()
+    friday_13th = expand_event(event("RRULE:FREQ=MONTHLY;BYDAY=FR;BYMONTHDAY=13;COUNT=2"), window_end=two_years)
+    days = [datetime.fromisoformat(i["start"]["dateTime"]).date() for i in friday_13th]
+    assert all(d.day == 13 and d.weekday() == 4 for d in days) and len(days) == 2, days
+    assert occurrence_starts(event("RRULE:FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=30")) == []
+    print("✅ expand_event handles BYDAY filters and rules without occurrences")
@@ -1,58 +1,171 @@
-from openai import OpenAI
-from typing import Optional
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional
+from utils import load_environment
+
+if TYPE_CHECKING:
+  from openai import OpenAI  # imported on first research call
+
+RESEARCH_CACHE_FILE = os.getenv("RESEARCH_CACHE_FILE", "research_cache.json")
+RESEARCH_CACHE_TTL = float(os.getenv("RESEARCH_CACHE_TTL", str(24 * 3600)))  # seconds
+RESEARCH_MAX_WORKERS = int(os.getenv("RESEARCH_MAX_WORKERS", "4"))
+
+_client = None
+_client_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+_in_flight = {}  # cache key -> Future shared by concurrent identical queries
+_in_flight_lock = threading.Lock()
+
+def get_openai_client() -> "OpenAI":
+  """Returns the shared OpenAI client (one connection pool for every research call)."""
+  global _client
+  with _client_lock:
+    if _client is None:
+      from openai import OpenAI
+      load_environment()
+      _client = OpenAI()
+    return _client
+
+def _cache_key(query: str) -> str:
+  return hashlib.sha256(" ".join(query.lower().split()).encode("utf-8")).hexdigest()
+
+def _load_cache() -> dict:
+  global _cache
+  if _cache is None:
+    _cache = {}
+    if os.path.exists(RESEARCH_CACHE_FILE):
+      try:
+        with open(RESEARCH_CACHE_FILE, "r", encoding="utf-8") as f:
+          _cache = json.load(f)
+      except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable research cache: {e}")
+  return _cache
+
+def _cache_get(key: str) -> Optional[str]:
+  with _cache_lock:
+    entry = _load_cache().get(key)
+    if entry and time.time() < entry["expires_at"]:
+      return entry["result"]
+  return None
+
+def _cache_put(key: str, query: str, result: str, ttl: float):
+  with _cache_lock:
+    cache = _load_cache()
+    now = time.time()
+    for stale in [k for k, e in cache.items() if e["expires_at"] <= now]:
+      del cache[stale]
+    cache[key] = {"query": query, "result": result, "expires_at": now + ttl}
+    tmp_filename = f"{RESEARCH_CACHE_FILE}.tmp"
+    with open(tmp_filename, "w", encoding="utf-8") as f:
+      json.dump(cache, f)
+    os.replace(tmp_filename, RESEARCH_CACHE_FILE)
+
+def _research_upstream(query: str) -> str:
+  #query = "find papers combining differential privacy and Machine Learning"
+  response = get_openai_client().responses.create(
+      model="gpt-5",
+      input=[
+          {
+              "role": "system",
+              "content": [
+                  {"type": "input_text", "text": "You are a Research Assistant AI. Your task is to gather relevant, factual, and actionable information about a user-provided goal. You act as the information collector and summarizer for another AI that will generate questions and create a schedule based on your output."}
+              ],
+          },
+          {
+              "role": "user",
+              "content": [
+                  {"type": "input_text", "text": query}
+              ],
+          },
+      ],
+      tools=[
+          {
+              "type": "web_search_preview",
+              "user_location": {
+                  "type": "approximate",
+                  "country": "US",
+                  "region": "WA",
+                  "city": "Seattle"
+              },
+              "search_context_size": "low"
+          }
+      ],
+      store=False
+  )
+  return response.output_text
+
 def research_online(query: str) -> Optional[str]:
   """
     Performs an online research task using GPT-5 with web search preview.
-    
+
     This function acts as a research assistant for an agent. It:
     - Accepts a vague goal or research query.
     - Uses GPT-5 with web search to gather relevant, factual, and actionable information.
     - Summarizes the findings in clear text for downstream agents to process.
-    
+
+    Results are cached on disk for RESEARCH_CACHE_TTL seconds, and identical
+    queries issued concurrently share a single upstream call.
+
     Parameters:
     -----------
     query : str
         A user-provided goal or topic to research.
-    
+
     Returns:
     --------
     str or None
         A concise summary of the research findings. Returns None if the call fails.
     """
+  key = _cache_key(query)
+  cached = _cache_get(key)
+  if cached is not None:
+    return cached
+
+  with _in_flight_lock:
+    future = _in_flight.get(key)
+    owner = future is None
+    if owner:
+      future = Future()
+      _in_flight[key] = future
+  if not owner:
+    return future.result()
+
+  result = None
   try:
-    client = OpenAI()
-    #query = "find papers combining differential privacy and Machine Learning"
-    response = client.responses.create(
-        model="gpt-5",
-        input=[
-            {
-                "role": "system",
-                "content": [
-                    {"type": "input_text", "text": "You are a Research Assistant AI. Your task is to gather relevant, factual, and actionable information about a user-provided goal. You act as the information collector and summarizer for another AI that will generate questions and create a schedule based on your output."}
-                ],
-            },
-            {
-                "role": "user",
-                "content": [
-                    {"type": "input_text", "text": query}
-                ],
-            },
-        ],
-        tools=[
-            {
-                "type": "web_search_preview",
-                "user_location": {
-                    "type": "approximate",
-                    "country": "US",
-                    "region": "WA",
-                    "city": "Seattle"
-                },
-                "search_context_size": "low"
-            }
-        ],
-        store=False
-    )
-    return response.output_text
+    result = _research_upstream(query)
+    if result:
+      _cache_put(key, query, result, RESEARCH_CACHE_TTL)
   except Exception as e:
       print(f"Error during research_online: {str(e)}")
-      return None
+  finally:
+    with _in_flight_lock:
+      del _in_flight[key]
+    future.set_result(result)
+  return result
+
+def research_many(queries: list[str]) -> dict[str, Optional[str]]:
+  """
+    Researches several goals or topics at once, in parallel.
+
+    Use this instead of calling research_online once per goal.
+
+    Parameters:
+    -----------
+    queries : list[str]
+        The goals or topics to research.
+
+    Returns:
+    --------
+    dict[str, str or None]
+        Research findings keyed by query (None for queries that failed).
+    """
+  unique = list(dict.fromkeys(queries))
+  if not unique:
+    return {}
+  with ThreadPoolExecutor(max_workers=min(RESEARCH_MAX_WORKERS, len(unique))) as executor:
+    return dict(zip(unique, executor.map(research_online, unique)))
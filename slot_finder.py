@@ -0,0 +1,304 @@
+import time
+import random
+import bisect
+from datetime import datetime, timedelta
+from typing import Annotated, Dict, List, Optional
+from zoneinfo import ZoneInfo
+from utils import DEFAULT_TIME_ZONE, epoch_to_iso, event_time_to_epoch, parse_datetime, to_epoch
+
+# Local hours (start, end) for preferred times of day
+TIMES_OF_DAY = {
+    "morning": (8, 12),
+    "afternoon": (12, 17),
+    "evening": (17, 22),
+}
+DEFAULT_CONSTRAINTS = {
+    "start": None,               # ISO start of the horizon (default: now)
+    "horizon_days": 14,
+    "day_start": "08:00",        # nothing is placed before this local time...
+    "day_end": "23:00",          # ...or after this one ("bed by 11pm")
+    "days": None,                # allowed weekdays, e.g. ["MO", "TU", "WE", "TH", "FR"]
+    "buffer_minutes": 10,        # kept free around existing commitments
+    "slot_minutes": 15,          # blocks start on this grid
+    "max_minutes_per_day": None, # cap on placed minutes per day
+    "time_zone": DEFAULT_TIME_ZONE,
+}
+WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+# Scores are compared lexicographically-by-weight: a day later costs 1,
+# missing the preferred time of day costs 3, a second session of the same task on one day 1000.
+_DAY_COST = 1.0
+_PREFERENCE_COST = 3.0
+_SAME_DAY_COST = 1000.0
+
+
+def _clock(value: str) -> tuple:
+    hour, _, minute = value.partition(":")
+    return int(hour), int(minute or 0)
+
+
+def _interval(item) -> Optional[tuple]:
+    """(start, end) epochs from a busy range ({"start": iso, "end": iso}) or a calendar event."""
+    try:
+        start, end = item["start"], item["end"]
+        start = event_time_to_epoch(start) if isinstance(start, dict) else to_epoch(start)
+        end = event_time_to_epoch(end) if isinstance(end, dict) else to_epoch(end)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return (start, end) if end > start else None
+
+
+def _free_intervals(busy: List[tuple], settings: Dict, horizon_start: float) -> List[List[float]]:
+    """Allowed daily windows over the horizon minus (buffered) busy time, sorted, as [start, end] pairs."""
+    zone = ZoneInfo(settings["time_zone"])
+    first_day = datetime.fromtimestamp(horizon_start, zone).date()
+    day_start, day_end = _clock(settings["day_start"]), _clock(settings["day_end"])
+    allowed = {WEEKDAYS.index(d.upper()) for d in settings["days"]} if settings["days"] else set(range(7))
+    windows = []
+    for offset in range(settings["horizon_days"]):
+        day = first_day + timedelta(days=offset)
+        if day.weekday() not in allowed:
+            continue
+        start = datetime(day.year, day.month, day.day, *day_start, tzinfo=zone).timestamp()
+        end = datetime(day.year, day.month, day.day, *day_end, tzinfo=zone).timestamp()
+        start = max(start, horizon_start)
+        if end > start:
+            windows.append((start, end))
+
+    buffer = settings["buffer_minutes"] * 60
+    merged = []
+    for start, end in sorted((s - buffer, e + buffer) for s, e in busy):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    free, b = [], 0
+    for start, end in windows:  # two-pointer sweep: both lists are sorted
+        while b < len(merged) and merged[b][1] <= start:
+            b += 1
+        cursor, i = start, b
+        while i < len(merged) and merged[i][0] < end:
+            if merged[i][0] > cursor:
+                free.append([cursor, merged[i][0]])
+            cursor = max(cursor, merged[i][1])
+            i += 1
+        if cursor < end:
+            free.append([cursor, end])
+    return free
+
+
+def _sessions(tasks: List[Dict], settings: Dict, horizon_start: float, horizon_end: float) -> List[Dict]:
+    """One entry per block to place, most urgent first (earliest deadline, then priority, then longest)."""
+    sessions = []
+    for index, task in enumerate(tasks):
+        duration = float(task.get("duration_minutes") or 60) * 60
+        deadline = horizon_end
+        if task.get("due_at"):
+            deadline = min(deadline, to_epoch(task["due_at"], settings["time_zone"]))
+        earliest = horizon_start
+        if task.get("earliest"):
+            earliest = max(earliest, to_epoch(task["earliest"], settings["time_zone"]))
+        for session in range(max(1, int(task.get("sessions") or 1))):
+            sessions.append({
+                "task": index,
+                "session": session,
+                "duration": duration,
+                "earliest": earliest,
+                "deadline": deadline,
+                "preferred": (task.get("preferred") or "").lower() or None,
+                "priority": int(task.get("priority") or 0),
+            })
+    sessions.sort(key=lambda s: (s["deadline"], -s["priority"], -s["duration"], s["task"], s["session"]))
+    return sessions
+
+
+def find_slots(
+    tasks: Annotated[list[dict], "Blocks to place: {summary, duration_minutes, sessions, due_at, earliest, "
+                                 "preferred ('morning'|'afternoon'|'evening'), priority, description, location}"],
+    busy_intervals: Annotated[Optional[list[dict]], "Busy ranges ({start, end}) or calendar events; "
+                                                    "default: read with get_busy_intervals"] = None,
+    constraints: Annotated[Optional[dict], "Optional: start, horizon_days, day_start, day_end ('23:00' = bed by 11pm), "
+                                           "days, buffer_minutes, slot_minutes, max_minutes_per_day, time_zone"] = None,
+) -> dict:
+    """
+    Places goal and study blocks into free time deterministically, without guessing.
+
+    Tasks are handled most urgent first (earliest `due_at`, e.g. a Canvas assignment's
+    due date, then priority, then length) and each block goes to the best free slot:
+    as early as possible, inside its preferred time of day when it can be, never two
+    sessions of one task on the same day if avoidable, never outside day_start-day_end
+    or the allowed days, and never within buffer_minutes of an existing commitment.
+
+    Returns:
+    - {"events": calendar JSON events (summary, description, location, start, end) ready for
+       send_events_batch, "unplaced": [{"summary", "session", "reason"}], "stats": {...}}
+    """
+    started = time.perf_counter()
+    settings = {**DEFAULT_CONSTRAINTS, **{k: v for k, v in (constraints or {}).items() if v is not None}}
+    zone = ZoneInfo(settings["time_zone"])
+    horizon_start = to_epoch(settings["start"], settings["time_zone"]) if settings["start"] else time.time()
+    horizon_end = horizon_start + settings["horizon_days"] * 86400
+
+    if busy_intervals is None:
+        from google_calendar_tool import get_busy_intervals
+        response = get_busy_intervals(["primary"], epoch_to_iso(horizon_start), epoch_to_iso(horizon_end))
+        if isinstance(response, str):
+            return {"events": [], "unplaced": [], "error": response}
+        busy_intervals = response["busy"]
+    busy = [i for i in map(_interval, busy_intervals) if i is not None]
+
+    free = _free_intervals(busy, settings, horizon_start)
+    first_day = datetime.fromtimestamp(horizon_start, zone).date()
+    grid = settings["slot_minutes"] * 60
+    daily_cap = settings["max_minutes_per_day"] * 60 if settings["max_minutes_per_day"] else None
+    placed_per_day: Dict = {}   # local date -> seconds placed
+    task_days: Dict = {}        # task index -> set of local dates used
+    events, unplaced = [], []
+
+    for session in _sessions(tasks, settings, horizon_start, horizon_end):
+        duration, preferred = session["duration"], session["preferred"]
+        latest_start = session["deadline"] - duration
+        best = None  # (score, start, index)
+        ends = [interval[1] for interval in free]
+        i = bisect.bisect_right(ends, session["earliest"])
+        while i < len(free):
+            start, end = free[i]
+            if start > latest_start:
+                break
+            if min(end, session["deadline"]) - max(start, session["earliest"]) < duration:
+                i += 1
+                continue  # too short, whatever the alignment
+            local = datetime.fromtimestamp(start, zone)
+            day_cost = (local.date() - first_day).days * _DAY_COST
+            if best is not None and day_cost >= best[0]:
+                break  # every later slot costs at least as much
+            candidates = [max(start, session["earliest"])]
+            if preferred in TIMES_OF_DAY:
+                window = TIMES_OF_DAY[preferred][0]
+                preferred_start = local.replace(hour=window, minute=0, second=0, microsecond=0).timestamp()
+                if preferred_start > candidates[0]:
+                    candidates.append(preferred_start)
+            for candidate in candidates:
+                candidate = -(-candidate // grid) * grid  # round up to the slot grid
+                if candidate + duration > min(end, session["deadline"]):
+                    continue
+                begins = datetime.fromtimestamp(candidate, zone)
+                day = begins.date()
+                if daily_cap is not None and placed_per_day.get(day, 0) + duration > daily_cap:
+                    continue
+                score = (day - first_day).days * _DAY_COST
+                if preferred in TIMES_OF_DAY:
+                    low, high = TIMES_OF_DAY[preferred]
+                    finishes = datetime.fromtimestamp(candidate + duration, zone)
+                    if begins.hour < low or finishes.hour + finishes.minute / 60 > high or finishes.date() != day:
+                        score += _PREFERENCE_COST
+                if day in task_days.get(session["task"], ()):
+                    score += _SAME_DAY_COST
+                if best is None or score < best[0]:
+                    best = (score, candidate, i)
+            i += 1
+
+        task = tasks[session["task"]]
+        if best is None:
+            reason = "no free slot before the deadline" if task.get("due_at") else "no free slot in the horizon"
+            unplaced.append({"summary": task.get("summary"), "session": session["session"], "reason": reason})
+            continue
+        _, begin, index = best
+        finish = begin + duration
+        start, end = free.pop(index)
+        free[index:index] = [piece for piece in ([start, begin], [finish, end]) if piece[1] > piece[0]]
+        day = datetime.fromtimestamp(begin, zone).date()
+        placed_per_day[day] = placed_per_day.get(day, 0) + duration
+        task_days.setdefault(session["task"], set()).add(day)
+        events.append({
+            "summary": task.get("summary") or "Focus block",
+            "description": task.get("description") or "",
+            "location": task.get("location") or "",
+            "start": {"dateTime": epoch_to_iso(begin, settings["time_zone"]), "timeZone": settings["time_zone"]},
+            "end": {"dateTime": epoch_to_iso(finish, settings["time_zone"]), "timeZone": settings["time_zone"]},
+        })
+
+    events.sort(key=lambda e: e["start"]["dateTime"])
+    return {
+        "events": events,
+        "unplaced": unplaced,
+        "stats": {
+            "placed": len(events),
+            "unplaced": len(unplaced),
+            "busy_intervals": len(busy),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        },
+    }
+
+
+def test_find_slots(horizon_days: int = 14):
+    """
+    Places tasks around two weeks of weekday classes and checks every hard rule:
+    all blocks placed, no overlap with (buffered) busy time or other blocks, inside
+    day_start-day_end, before each deadline, one session per task per day. Then
+    checks a preferred time of day, max_minutes_per_day, allowed days and a
+    deadline that cannot be met.
+    """
+    rng = random.Random(7)
+    zone_name = DEFAULT_TIME_ZONE
+    zone = ZoneInfo(zone_name)
+    base = parse_datetime("2030-03-04T00:00:00", zone_name).timestamp()  # a Monday
+    start_iso = epoch_to_iso(base)
+    busy = []
+    for day in range(horizon_days):
+        if day % 7 < 5:
+            for begin, end in ((9, 12), (13, 17)):
+                busy.append({"start": epoch_to_iso(base + day * 86400 + begin * 3600),
+                             "end": epoch_to_iso(base + day * 86400 + end * 3600)})
+    tasks = []
+    for i in range(12):
+        task = {"summary": f"task {i}", "duration_minutes": rng.choice([30, 60, 90, 120]),
+                "sessions": rng.choice([1, 2, 3]), "preferred": rng.choice([None, "morning", "afternoon", "evening"])}
+        if i % 3 == 0:
+            task["due_at"] = epoch_to_iso(base + rng.randrange(4, horizon_days) * 86400)
+        tasks.append(task)
+    constraints = {"start": start_iso, "horizon_days": horizon_days, "day_end": "23:00"}
+
+    result = find_slots(tasks, busy, constraints)
+
+    expected = sum(t["sessions"] for t in tasks)
+    assert not result["unplaced"] and len(result["events"]) == expected, result["unplaced"]
+    buffer = DEFAULT_CONSTRAINTS["buffer_minutes"] * 60
+    busy_intervals = sorted(_interval(b) for b in busy)
+    placed = sorted((to_epoch(e["start"]["dateTime"]), to_epoch(e["end"]["dateTime"]), e["summary"]) for e in result["events"])
+    for (start, end, _), (next_start, _, _) in zip(placed, placed[1:]):
+        assert end <= next_start, "blocks overlap"
+    due = {t["summary"]: to_epoch(t["due_at"]) for t in tasks if t.get("due_at")}
+    days_used = set()
+    for start, end, summary in placed:
+        assert all(end + buffer <= s or start >= e + buffer for s, e in busy_intervals), f"{summary} hits busy time"
+        local_end = datetime.fromtimestamp(end, zone)
+        assert datetime.fromtimestamp(start, zone).hour >= 8 and (local_end.hour, local_end.minute) <= (23, 0)
+        assert summary not in due or end <= due[summary], f"{summary} misses its deadline"
+        day = (summary, datetime.fromtimestamp(start, zone).date())
+        assert day not in days_used, f"{summary} has two sessions on one day"
+        days_used.add(day)
+
+    def local_starts(found):
+        return [parse_datetime(e["start"]["dateTime"], zone_name).astimezone(zone) for e in found["events"]]
+
+    afternoon = find_slots([{"summary": "read", "duration_minutes": 60, "preferred": "afternoon"}], [], constraints)
+    (begins,) = local_starts(afternoon)
+    assert 12 <= begins.hour and begins.hour + 1 <= 17, begins
+
+    capped = find_slots([{"summary": f"long {i}", "duration_minutes": 120} for i in range(3)], [],
+                        {**constraints, "max_minutes_per_day": 120})
+    assert len({b.date() for b in local_starts(capped)}) == 3, capped["events"]
+
+    weekend = find_slots([{"summary": "hike", "duration_minutes": 90, "sessions": 2}], [],
+                         {**constraints, "days": ["SA", "SU"]})
+    assert [b.weekday() for b in local_starts(weekend)] == [5, 6], weekend["events"]
+
+    late = find_slots([{"summary": "essay", "duration_minutes": 120, "due_at": epoch_to_iso(base + 9 * 3600)}], [],
+                      constraints)
+    assert not late["events"] and late["unplaced"][0]["reason"] == "no free slot before the deadline", late
+
+    stats = result["stats"]
+    print(f"✅ {stats['placed']} blocks placed around {len(busy)} busy intervals over {horizon_days} days "
+          f"in {stats['elapsed_ms']} ms; preference, daily cap, allowed days and deadline checks passed")
@@ -1,29 +1,102 @@
-from flask import Flask, request, jsonify
-import logging, os
-from interpreter import Interpreter
+from flask import Flask, Response, request, jsonify
+import hmac, logging, os
+from utils import load_environment
+load_environment()  # before anything below reads its settings
+
+from interpreter_pool import InterpreterPool
+from jobs import ChunkBuffer, JobQueue, QueueFullError, JOB_WORKERS
+from tracing import get_tracer
+from user_context import get_user, use_user
+from webhook_outbox import get_webhook_outbox
 
 llm_config = {
     "model": "gpt-4",
     "api_key": os.getenv("OPENAI_API_KEY", "dummy_key"),
 }
 
+MAX_LONG_POLL_SECONDS = 30
+
 logging.getLogger("werkzeug").setLevel(logging.ERROR)
 app = Flask(__name__)
+# Headless: runs never block on stdin; the approval policy answers for the user instead
+interpreter_pool = InterpreterPool(llm_config=llm_config, size=JOB_WORKERS, background=True, headless=True)
+chunks = ChunkBuffer()
+
+def run_interpret(text: str):
+    with interpreter_pool.acquire() as agent:
+        result = agent.interpret(text)
+    return getattr(result, "summary", result)
+
+job_queue = JobQueue(run_interpret, max_workers=JOB_WORKERS)
+get_webhook_outbox()  # resume delivering events left in the outbox by a previous run
+
+def resolve_user(payload: dict):
+    """
+    Returns (user, error). Requests without a user_id run with the server's own
+    credentials; a user_id must be in the user directory (USERS_FILE), and must
+    bring the user's api_key in the X-Api-Key header when one is configured.
+    """
+    user_id = payload.get("user_id")
+    if user_id is None:
+        return None, None
+    user = get_user(user_id)
+    if user is None:
+        return None, "unknown user"
+    if user.api_key and not hmac.compare_digest(request.headers.get("X-Api-Key", ""), user.api_key):
+        return None, "invalid api key"
+    return user, None
 
 @app.post("/stream")
 def stream():
+    """
+    Accepts {"session_id", "token", "last", "user_id"}. Chunks are buffered per
+    user and session; the final chunk (last=true) queues the full text as a job
+    that runs with that user's credentials, and returns the job ID.
+    """
     payload = request.get_json(force=True, silent=True) or {}
+    user, error = resolve_user(payload)
+    if error:
+        return jsonify({"ok": False, "error": error}), 403
+    session_id = str(payload.get("session_id", "default"))
     token = payload.get("token", "")
     last = payload.get("last", False)
 
     # Print incoming chunks for debug
     print(token, end="", flush=True)
-    
-    #print("\n--- end of message ---", flush=True)
-    print("I am finished...")
-    agent = Interpreter(llm_config=llm_config)
-    result = agent.interpret(token)  # token must contain the FULL text
-    return jsonify({"ok": True, "result": result})
-    
+
+    owner = user.user_id if user else "default"
+    buffered = chunks.append(f"{owner}/{session_id}", token)
+    if not last:
+        return jsonify({"ok": True, "session_id": session_id, "buffered": buffered})
+
+    text = chunks.pop(f"{owner}/{session_id}")
+    try:
+        with use_user(user):
+            job_id = job_queue.submit(text, owner=owner)
+    except QueueFullError as e:
+        return jsonify({"ok": False, "error": str(e)}), 503
+    return jsonify({"ok": True, "session_id": session_id, "job_id": job_id}), 202
+
+@app.get("/jobs/<job_id>")
+def job_status(job_id):
+    """Job status and result. `?wait=N` long-polls up to N seconds for completion."""
+    wait = min(request.args.get("wait", 0, type=float), MAX_LONG_POLL_SECONDS)
+    job = job_queue.wait(job_id, timeout=wait)
+    if job is None:
+        return jsonify({"ok": False, "error": "unknown job"}), 404
+    return jsonify({"ok": True, **job})
+
+@app.get("/metrics")
+def metrics():
+    return jsonify({
+        "pool": interpreter_pool.metrics(),
+        "jobs": job_queue.stats(),
+        "webhook_outbox": get_webhook_outbox().metrics(),
+    })
+
+@app.get("/metrics/prometheus")
+def prometheus_metrics():
+    return Response(get_tracer().prometheus_text(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=5001, debug=False)
\ No newline at end of file
+    app.run(host="127.0.0.1", port=5001, debug=False, threaded=True)
@@ -0,0 +1,292 @@
+import os
+import re
+import json
+import time
+import uuid
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+from urllib.parse import urlsplit
+
+TRACE_FILE = os.getenv("TRACE_FILE", "trace.jsonl")
+TRACING_ENABLED = os.getenv("TRACING", "1") != "0"
+TRACE_FLUSH_EVERY = 100  # spans buffered before the JSONL file is flushed
+# The JSONL file is rotated to <TRACE_FILE>.1 (one backup kept) once it reaches this size
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Path segments that are IDs rather than endpoint names: anything with a digit
+# (API versions such as v3 aside), an email-style calendar ID, or a long opaque token.
+_ID_SEGMENT = re.compile(r"(?!v\d+$)(.*\d.*|.*(@|%40).*|[A-Za-z0-9_\-]{20,})")
+
+_run_id: ContextVar[Optional[str]] = ContextVar("trace_run_id", default=None)
+_round: ContextVar[int] = ContextVar("trace_round", default=0)
+
+
+def _usage_totals(agent) -> tuple:
+    """(prompt_tokens, completion_tokens) used so far by an agent's model client."""
+    summary = getattr(getattr(agent, "client", None), "actual_usage_summary", None) or {}
+    prompt = completion = 0
+    for usage in summary.values():
+        if isinstance(usage, dict):
+            prompt += usage.get("prompt_tokens", 0)
+            completion += usage.get("completion_tokens", 0)
+    return prompt, completion
+
+
+def http_span_name(method: str, url: str) -> str:
+    """
+    Span name for an HTTP request: method, host and path with IDs replaced by
+    {id} (e.g. "GET canvas.example/api/v1/courses/{id}/assignments"), so names,
+    and the metric labels built from them, stay bounded.
+    """
+    parts = urlsplit(url)
+    path = "/".join("{id}" if _ID_SEGMENT.fullmatch(segment) else segment for segment in parts.path.split("/"))
+    return f"{method} {parts.netloc}{path}"
+
+
+def _size(payload: Any) -> int:
+    if payload is None:
+        return 0
+    if isinstance(payload, (str, bytes)):
+        return len(payload)
+    try:
+        return len(json.dumps(payload, default=str))
+    except (TypeError, ValueError):
+        return len(str(payload))
+
+
+class Tracer:
+    """
+    Records timing spans for Interpreter runs: agent turns, speaker selection,
+    tool calls and HTTP requests.
+
+    Each span carries wall time, run ID, round number, payload sizes and (for
+    agent turns) prompt/completion tokens. Spans are appended to a JSONL file,
+    rotated at TRACE_MAX_BYTES, and aggregated in memory for a Prometheus-style
+    text summary.
+    """
+
+    def __init__(self, path: Optional[str] = TRACE_FILE, enabled: bool = TRACING_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_bytes = 0
+        self._unflushed = 0
+        self._totals = {}  # (kind, name) -> aggregated counters
+        self._turns = threading.local()  # per-thread state for open agent turns
+
+    # -- recording ---------------------------------------------------------
+
+    def record(self, kind: str, name: str, seconds: float, **attrs):
+        """Records one finished span."""
+        if not self.enabled:
+            return
+        span = {
+            "ts": time.time(),
+            "run_id": _run_id.get(),
+            "round": _round.get(),
+            "kind": kind,
+            "name": name,
+            "seconds": round(seconds, 6),
+            **attrs,
+        }
+        with self._lock:
+            totals = self._totals.setdefault((kind, name), {
+                "count": 0, "seconds": 0.0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "bytes": 0,
+            })
+            totals["count"] += 1
+            totals["seconds"] += seconds
+            totals["errors"] += 1 if attrs.get("error") else 0
+            totals["prompt_tokens"] += attrs.get("prompt_tokens", 0)
+            totals["completion_tokens"] += attrs.get("completion_tokens", 0)
+            totals["bytes"] += attrs.get("request_bytes", 0) + attrs.get("response_bytes", 0)
+            if self.path:
+                line = json.dumps(span, default=str) + "\n"
+                if self._file is not None and self._file_bytes + len(line) > TRACE_MAX_BYTES:
+                    self._rotate()
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                    self._file_bytes = self._file.tell()
+                self._file.write(line)
+                self._file_bytes += len(line)
+                self._unflushed += 1
+                if self._unflushed >= TRACE_FLUSH_EVERY:
+                    self._file.flush()
+                    self._unflushed = 0
+
+    def _rotate(self):
+        """Moves the full JSONL file to <path>.1, replacing the previous backup. Caller holds the lock."""
+        self._file.close()
+        self._file = None
+        self._unflushed = 0
+        os.replace(self.path, f"{self.path}.1")
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attrs):
+        """Times the enclosed block. The yielded dict can be filled with extra attributes."""
+        if not self.enabled:
+            yield attrs
+            return
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except Exception as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(kind, name, time.perf_counter() - started, **attrs)
+
+    @contextmanager
+    def run(self, name: str = "interpret", **attrs):
+        """Starts a traced run: every span inside shares its run ID and round counter."""
+        run_token = _run_id.set(uuid.uuid4().hex[:12])
+        round_token = _round.set(0)
+        self._turns.last_send = None
+        self._turns.tool_seconds = 0.0
+        try:
+            with self.span("run", name, **attrs) as span_attrs:
+                yield span_attrs
+                span_attrs["rounds"] = _round.get()
+        finally:
+            _run_id.reset(run_token)
+            _round.reset(round_token)
+            self.flush()
+
+    def reset(self):
+        """Clears the aggregated counters (the JSONL file is left as is)."""
+        with self._lock:
+            self._totals = {}
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._unflushed = 0
+
+    # -- instrumentation ---------------------------------------------------
+
+    def trace_tool(self, func: Callable) -> Callable:
+        """Wraps a tool function so each call is recorded; the signature is preserved for autogen."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            attrs = {"request_bytes": _size(kwargs or args)}
+            try:
+                result = func(*args, **kwargs)
+                attrs["response_bytes"] = _size(result)
+                return result
+            except Exception as e:
+                attrs["error"] = type(e).__name__
+                raise
+            finally:
+                seconds = time.perf_counter() - started
+                self._turns.tool_seconds = getattr(self._turns, "tool_seconds", 0.0) + seconds
+                self.record("tool", func.__name__, seconds, **attrs)
+        return wrapper
+
+    def instrument_agent(self, agent):
+        """Records a span per agent turn, plus the speaker-selection gap before it."""
+        def turn_started(agent, messages):
+            now = time.perf_counter()
+            last_send = getattr(self._turns, "last_send", None)
+            if last_send is not None:
+                # Time between the previous turn and this one, minus tools run in between,
+                # is the group manager choosing the next speaker.
+                gap = now - last_send - getattr(self._turns, "tool_seconds", 0.0)
+                self.record("speaker_selection", agent.name, max(gap, 0.0))
+            _round.set(_round.get() + 1)
+            self._turns.started = now
+            self._turns.usage = _usage_totals(agent)
+            self._turns.request_bytes = _size(messages)
+
+        def turn_finished(sender, message, recipient, silent):
+            started = getattr(self._turns, "started", None)
+            if started is not None:
+                now = time.perf_counter()
+                prompt_before, completion_before = self._turns.usage
+                prompt_after, completion_after = _usage_totals(sender)
+                self.record(
+                    "agent_turn", sender.name, now - started,
+                    prompt_tokens=prompt_after - prompt_before,
+                    completion_tokens=completion_after - completion_before,
+                    request_bytes=self._turns.request_bytes,
+                    response_bytes=_size(message),
+                )
+                self._turns.started = None
+                self._turns.last_send = now
+                self._turns.tool_seconds = 0.0
+            return message
+
+        if self.enabled:
+            agent.register_hook("update_agent_state", turn_started)
+            agent.register_hook("process_message_before_send", turn_finished)
+
+    def requests_hook(self, response, *args, **kwargs):
+        """`requests` response hook: records one span per HTTP request."""
+        request = response.request
+        self.record(
+            "http", http_span_name(request.method, response.url), response.elapsed.total_seconds(),
+            status=response.status_code,
+            request_bytes=_size(request.body),
+            response_bytes=len(response.content) if response.content else 0,
+        )
+        return response
+
+    def instrument_httplib2(self, http):
+        """Wraps an httplib2.Http (as used by googleapiclient) so each request is recorded."""
+        original = http.request
+
+        @functools.wraps(original)
+        def request(uri, method="GET", body=None, *args, **kwargs):
+            with self.span("http", http_span_name(method, uri), request_bytes=_size(body)) as attrs:
+                response, content = original(uri, method, body, *args, **kwargs)
+                attrs["status"] = response.status
+                attrs["response_bytes"] = len(content) if content else 0
+                return response, content
+
+        http.request = request
+        return http
+
+    # -- reporting ---------------------------------------------------------
+
+    def summary(self) -> dict:
+        """Aggregated counters keyed by "kind/name"."""
+        with self._lock:
+            return {f"{kind}/{name}": dict(totals) for (kind, name), totals in self._totals.items()}
+
+    def prometheus_text(self) -> str:
+        """The aggregated counters in Prometheus text exposition format."""
+        lines = []
+        metrics = (
+            ("adulter_span_seconds_total", "seconds", "Total wall time spent in spans."),
+            ("adulter_span_count_total", "count", "Number of spans recorded."),
+            ("adulter_span_errors_total", "errors", "Spans that raised an error."),
+            ("adulter_prompt_tokens_total", "prompt_tokens", "Prompt tokens used by agent turns."),
+            ("adulter_completion_tokens_total", "completion_tokens", "Completion tokens used by agent turns."),
+            ("adulter_payload_bytes_total", "bytes", "Request plus response payload bytes."),
+        )
+        with self._lock:
+            totals = list(self._totals.items())
+        for metric, field, help_text in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for (kind, name), values in totals:
+                escaped = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{metric}{{kind="{kind}",name="{escaped}"}} {values[field]}')
+        return "\n".join(lines) + "\n"
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Returns the process-wide tracer (configured by TRACE_FILE and TRACING=0/1)."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
@@ -0,0 +1,122 @@
+import os
+import re
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from utils import load_environment
+
+USERS_FILE = os.getenv("USERS_FILE", "users.json")
+
+# Settings a user can override; anything else is always read from the environment.
+USER_SETTINGS = (
+    "GOOGLE_REFRESH_TOKEN",
+    "GOOGLE_CLIENT_ID",
+    "GOOGLE_CLIENT_SECRET",
+    "CANVAS_API_URL",
+    "CANVAS_API_TOKEN",
+    "WEBHOOK_API_URL",
+)
+
+
+class UserContext:
+    """
+    One user's credentials for the calendar, Canvas and webhook tools.
+
+    `settings` holds per-user values for USER_SETTINGS (e.g. {"CANVAS_API_TOKEN": ...});
+    missing ones fall back to the process environment. `approval` optionally
+    overrides the service's approval limits for this user's runs (see
+    approval.ApprovalPolicy), and `api_key`, when set, must accompany the
+    user's requests to the service.
+    """
+
+    def __init__(self, user_id: str, settings: Optional[Dict[str, str]] = None, approval: Optional[Dict] = None,
+                 api_key: Optional[str] = None):
+        self.user_id = str(user_id)
+        self.settings = {k: v for k, v in (settings or {}).items() if k in USER_SETTINGS and v}
+        self.approval = approval
+        self.api_key = api_key
+
+    @property
+    def key(self) -> str:
+        """Filesystem- and cache-safe form of the user ID."""
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", self.user_id)
+
+    def __repr__(self):
+        return f"UserContext({self.user_id!r}, settings={sorted(self.settings)})"
+
+
+_current_user: ContextVar[Optional[UserContext]] = ContextVar("current_user", default=None)
+_users = None
+_users_lock = threading.Lock()
+
+
+def current_user() -> Optional[UserContext]:
+    """The user the current run acts for, or None in single-user mode."""
+    return _current_user.get()
+
+
+@contextmanager
+def use_user(user: Optional[UserContext]):
+    """
+    Runs the enclosed code on behalf of `user`. The user follows the call into
+    tools (and into JobQueue workers, which copy the submitter's context).
+    """
+    token = _current_user.set(user)
+    try:
+        yield user
+    finally:
+        _current_user.reset(token)
+
+
+def get_setting(name: str) -> Optional[str]:
+    """Reads a credential for the current user, falling back to the environment."""
+    user = _current_user.get()
+    if user is not None and name in user.settings:
+        return user.settings[name]
+    load_environment()
+    return os.getenv(name)
+
+
+def user_key() -> Optional[str]:
+    """Cache key for per-user clients and stores; None in single-user mode."""
+    user = _current_user.get()
+    return user.key if user is not None else None
+
+
+def user_path(path: str) -> str:
+    """
+    Per-user variant of a local data file, e.g. calendar_mirror.db ->
+    calendar_mirror.alice.db, so users never read each other's cached data.
+    """
+    key = user_key()
+    if key is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{key}{ext}"
+
+
+def load_users(path: str = USERS_FILE) -> Dict[str, UserContext]:
+    """
+    Reads the user directory: a JSON object mapping user IDs to
+    {"settings": {...}, "approval": {...}, "api_key": "..."}.
+    Returns {} if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    return {
+        str(user_id): UserContext(user_id, entry.get("settings"), entry.get("approval"), entry.get("api_key"))
+        for user_id, entry in entries.items()
+    }
+
+
+def get_user(user_id: str) -> Optional[UserContext]:
+    """Looks a user up in the user directory (loaded once per process)."""
+    global _users
+    with _users_lock:
+        if _users is None:
+            _users = load_users()
+        return _users.get(str(user_id))
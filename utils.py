@@ -18,7 +18,25 @@ def get_goals(file_path: str = "goals.txt") -> list[str]:
     except FileNotFoundError:
         print(f"⚠️ File not found: {file_path}")
     return goals
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+DEFAULT_TIME_ZONE = "America/Los_Angeles"  # the agents assume Pacific time unless told otherwise
+
+_environment_loaded = False
+
+def load_environment():
+    """
+    Loads variables from .env into os.environ, once per process.
+    Entry points call this at startup and tools call it before reading
+    credentials, so importing a module never touches the filesystem.
+    """
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _environment_loaded = True
 
 def get_todays_date() -> str:
     """
@@ -26,3 +44,32 @@ def get_todays_date() -> str:
     Useful for scheduling tools and setting default time ranges.
     """
     return datetime.now().strftime("%Y-%m-%d")
+
+def parse_datetime(value: str, time_zone: Optional[str] = None) -> datetime:
+    """
+    Parses an ISO 8601 / RFC3339 date or datetime into a timezone-aware datetime.
+    Values without an offset are interpreted in `time_zone` (default Pacific).
+    """
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=ZoneInfo(time_zone or DEFAULT_TIME_ZONE))
+    return parsed
+
+def to_epoch(value: str, time_zone: Optional[str] = None) -> float:
+    """
+    Converts an ISO 8601 / RFC3339 date or datetime to UTC epoch seconds.
+    """
+    return parse_datetime(value, time_zone).timestamp()
+
+def event_time_to_epoch(when: dict) -> float:
+    """
+    Converts a Google Calendar start/end object ({"dateTime"} or {"date"},
+    optionally with "timeZone") to UTC epoch seconds.
+    """
+    return to_epoch(when.get("dateTime") or when["date"], when.get("timeZone"))
+
+def epoch_to_iso(timestamp: float, time_zone: Optional[str] = None) -> str:
+    """
+    Formats UTC epoch seconds as an ISO 8601 datetime in `time_zone` (default Pacific).
+    """
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).astimezone(ZoneInfo(time_zone or DEFAULT_TIME_ZONE)).isoformat()
@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tracing import get_tracer
+
+OUTBOX_DB_FILE = os.getenv("WEBHOOK_OUTBOX_DB", "webhook_outbox.db")
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "1"))  # >1 POSTs a JSON list of events
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "5"))
+WEBHOOK_BACKOFF_BASE = 1.0  # seconds; doubled per failed attempt, with jitter
+WEBHOOK_BACKOFF_MAX = 300.0
+DELIVERED_RETENTION_SECONDS = 7 * 24 * 3600
+# A delivered event sent again within this window is a duplicate (e.g. a model retry);
+# after it, it is a deliberate resend and goes out under a new idempotency key.
+WEBHOOK_DEDUPE_SECONDS = float(os.getenv("WEBHOOK_DEDUPE_SECONDS", "3600"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    delivered_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+def idempotency_key(url: str, event: Dict) -> str:
+    """Stable key for an event: the same event sent twice (e.g. a model retry) gets the same key."""
+    canonical = json.dumps(event, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{url}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+class WebhookOutbox:
+    """
+    Durable outbox for webhook deliveries.
+
+    Events are written to SQLite and delivered by one background sender thread
+    over a pooled keep-alive session. Every request carries an Idempotency-Key
+    header so receivers can dedupe. With batch_size > 1, due events for the same
+    URL are POSTed together as a JSON list (each item has an "idempotency_key").
+    Failed deliveries (network errors, 429, 5xx) are retried with exponential
+    backoff; other 4xx responses, or running out of attempts, mark the event dead.
+    """
+
+    def __init__(self, path: str = OUTBOX_DB_FILE, batch_size: int = WEBHOOK_BATCH_SIZE,
+                 max_attempts: int = WEBHOOK_MAX_ATTEMPTS, timeout: float = WEBHOOK_TIMEOUT,
+                 session: Optional[requests.Session] = None):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._session = session or self._new_session()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._latencies = deque(maxlen=1000)  # enqueue -> delivered, seconds
+        self._counters = {"enqueued": 0, "duplicates": 0, "requeued": 0, "delivered": 0, "retries": 0, "dead_lettered": 0,
+                          "requests": 0}
+
+    @staticmethod
+    def _new_session() -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.hooks["response"].append(get_tracer().requests_hook)
+        return session
+
+    # -- producer side -----------------------------------------------------
+
+    def enqueue(self, url: str, event: Dict) -> tuple:
+        """
+        Appends an event to the outbox and wakes the sender. Returns (idempotency_key, status):
+
+        - "queued": new event
+        - "pending": already waiting for delivery (duplicate)
+        - "delivered": delivered within WEBHOOK_DEDUPE_SECONDS (duplicate, not sent again)
+        - "requeued": an earlier copy was dead-lettered; it is retried from scratch
+
+        A delivered event sent again after WEBHOOK_DEDUPE_SECONDS is queued as new,
+        under the next key in its chain, so receivers do not drop it as a replay.
+        """
+        key = idempotency_key(url, event)
+        now = time.time()
+        with self._lock:
+            while True:
+                row = self._conn.execute(
+                    "SELECT id, status, delivered_at FROM outbox WHERE idempotency_key = ?", (key,)
+                ).fetchone()
+                if row is None or row[1] != "delivered" or now - row[2] < WEBHOOK_DEDUPE_SECONDS:
+                    break
+                key = hashlib.sha256(f"{key}\nresend".encode("utf-8")).hexdigest()
+
+            if row is None:
+                self._conn.execute(
+                    "INSERT INTO outbox (idempotency_key, url, payload, created_at, next_attempt_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, url, json.dumps(event), now, now),
+                )
+                status = "queued"
+            elif row[1] == "dead":
+                self._conn.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = 0, created_at = ?, next_attempt_at = ?, "
+                    "last_error = NULL WHERE id = ?",
+                    (now, now, row[0]),
+                )
+                status = "requeued"
+            else:
+                status = row[1]
+            self._conn.commit()
+            self._counters[{"queued": "enqueued", "requeued": "requeued"}.get(status, "duplicates")] += 1
+        self._wake.set()
+        return key, status
+
+    # -- sender ------------------------------------------------------------
+
+    def start(self):
+        """Starts the background sender (idempotent)."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="webhook-outbox", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                delay = self.deliver_due()
+            except Exception as e:
+                print(f"⚠️ Webhook outbox sender error: {e}")
+                delay = WEBHOOK_BACKOFF_BASE
+            if delay > 0:
+                self._wake.wait(min(delay, 30.0))
+                self._wake.clear()
+
+    def _due(self, now: float) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, idempotency_key, url, payload, attempts, created_at FROM outbox "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (now, self.batch_size * 10),
+            ).fetchall()
+
+    def _next_due_in(self, now: float) -> float:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'"
+            ).fetchone()
+        return max(0.0, row[0] - now) if row and row[0] is not None else 30.0
+
+    def deliver_due(self) -> float:
+        """
+        Delivers everything currently due. Returns how long the sender can sleep
+        before the next pending event is due (0 when more work is already due).
+        """
+        now = time.time()
+        rows = self._due(now)
+        if not rows:
+            self._purge_delivered(now)
+            return self._next_due_in(now)
+
+        by_url = {}
+        for row in rows:
+            by_url.setdefault(row[2], []).append(row)
+        for url, url_rows in by_url.items():
+            for i in range(0, len(url_rows), self.batch_size):
+                self._deliver(url, url_rows[i:i + self.batch_size])
+        return 0.0
+
+    def _deliver(self, url: str, rows: List[tuple]):
+        if len(rows) == 1:
+            body = json.loads(rows[0][3])
+            key = rows[0][1]
+        else:
+            body = [{**json.loads(row[3]), "idempotency_key": row[1]} for row in rows]
+            key = hashlib.sha256("".join(row[1] for row in rows).encode("utf-8")).hexdigest()
+
+        error, retryable = None, True
+        with self._lock:
+            self._counters["requests"] += 1
+        try:
+            response = self._session.post(url, json=body, timeout=self.timeout, headers={"Idempotency-Key": key})
+            if response.status_code < 300:
+                self._mark_delivered(rows)
+                return
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            retryable = response.status_code == 429 or response.status_code >= 500
+        except requests.RequestException as e:
+            error = str(e)
+        self._mark_failed(rows, error, retryable)
+
+    def _mark_delivered(self, rows: List[tuple]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outbox SET status = 'delivered', delivered_at = ?, attempts = attempts + 1, last_error = NULL "
+                "WHERE id = ?",
+                [(now, row[0]) for row in rows],
+            )
+            self._conn.commit()
+            self._counters["delivered"] += len(rows)
+            self._latencies.extend(now - row[5] for row in rows)
+
+    def _mark_failed(self, rows: List[tuple], error: str, retryable: bool):
+        now = time.time()
+        updates = []
+        for row_id, _, _, _, attempts, _ in rows:
+            attempts += 1
+            if not retryable or attempts >= self.max_attempts:
+                updates.append(("dead", attempts, now, error, row_id))
+            else:
+                delay = min(WEBHOOK_BACKOFF_MAX, WEBHOOK_BACKOFF_BASE * 2 ** (attempts - 1))
+                updates.append(("pending", attempts, now + delay * random.uniform(0.5, 1.0), error, row_id))
+        with self._lock:
+            for update in updates:
+                self._counters["dead_lettered" if update[0] == "dead" else "retries"] += 1
+            self._conn.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                updates,
+            )
+            self._conn.commit()
+        print(f"⚠️ Webhook delivery failed for {len(rows)} event(s): {error}")
+
+    def _purge_delivered(self, now: float):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM outbox WHERE status = 'delivered' AND delivered_at < ?",
+                (now - DELIVERED_RETENTION_SECONDS,),
+            )
+            self._conn.commit()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Waits until nothing is due (pending events in backoff are left). Returns True if drained."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                due = self._conn.execute(
+                    "SELECT COUNT(*) FROM outbox WHERE status = 'pending' AND next_attempt_at <= ?", (time.time(),)
+                ).fetchone()[0]
+            if not due:
+                return True
+            self._wake.set()
+            time.sleep(0.05)
+        return False
+
+    # -- metrics -----------------------------------------------------------
+
+    def metrics(self) -> Dict:
+        """Queue depth, dead letters, oldest pending age and delivery latency (enqueue -> delivered)."""
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+            oldest = self._conn.execute("SELECT MIN(created_at) FROM outbox WHERE status = 'pending'").fetchone()[0]
+            latencies = sorted(self._latencies)
+            counters = dict(self._counters)
+
+        def percentile(pct):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(pct / 100 * len(latencies)))], 3)
+
+        return {
+            "queue_depth": counts.get("pending", 0),
+            "dead": counts.get("dead", 0),
+            "oldest_pending_seconds": round(now - oldest, 1) if oldest else 0.0,
+            "delivery_latency_p50": percentile(50),
+            "delivery_latency_p95": percentile(95),
+            **counters,
+        }
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._conn.close()
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_webhook_outbox() -> WebhookOutbox:
+    """Returns the process-wide outbox, starting its sender on first use."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = WebhookOutbox()
+            _outbox.start()
+        return _outbox
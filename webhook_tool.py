@@ -1,5 +1,7 @@
-import os
-import requests
+from webhook_outbox import get_webhook_outbox
+from user_context import get_setting
+
+
 def send_event_to_webhook(
     summary: str,
     description: str,  # <-- new field
@@ -8,7 +10,13 @@ def send_event_to_webhook(
     end: dict
 ) -> str:
     """
-    Sends a calendar event JSON to the webhook endpoint and returns the server's response.
+    Queues a calendar event JSON for delivery to the webhook endpoint.
+
+    The event is written to a durable local outbox and delivered in the background
+    (with retries and an idempotency key), so this returns as soon as it is queued.
+    Sending the same event again while it is queued, or soon after it was
+    delivered, does not deliver it twice; an event whose earlier delivery
+    failed for good is queued again.
 
     Parameters:
     ----------
@@ -23,8 +31,7 @@ def send_event_to_webhook(
     Returns:
     -------
     str
-        A message indicating whether the event was successfully sent,
-        including the response text from the webhook or an error description.
+        A message indicating whether the event was queued, or an error description.
         If successful, include 'Success!' in the message.
     """
     event = {
@@ -36,13 +43,20 @@ def send_event_to_webhook(
     }
     
     try:
-        API_URL = os.getenv("WEBHOOK_API_URL")
+        API_URL = get_setting("WEBHOOK_API_URL")  # the current user's endpoint in service mode
     except Exception as e:
         return f"Failed to retrieve webhook from environment variables: {str(e)}"
     if not API_URL:
         return "Webhook API URL not set in environment variables."
     try:
-        response = requests.post(API_URL, json=event, timeout=5)
-        return f"Success! Webhook responded with: {response.text}"
-    except requests.RequestException as e:
-        return f"Failed to send event: {str(e)}"
+        key, status = get_webhook_outbox().enqueue(API_URL, event)
+    except Exception as e:
+        return f"Failed to queue event: {str(e)}"
+    if status == "pending":
+        return f"Success! This event was already queued for the webhook (idempotency key {key[:12]})."
+    if status == "delivered":
+        return f"Success! This event was already delivered to the webhook (idempotency key {key[:12]})."
+    if status == "requeued":
+        return (f"Success! An earlier delivery of this event failed; it was queued again "
+                f"(idempotency key {key[:12]}).")
+    return f"Success! Event queued for webhook delivery (idempotency key {key[:12]})."